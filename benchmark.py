@@ -0,0 +1,454 @@
+import os
+import sys
+import atexit
+import shutil
+import time
+import tempfile
+import threading
+from datetime import datetime, timedelta
+import davisbase
+
+
+def fresh_db(page_size=None):
+    path = tempfile.mkdtemp(prefix='davisbase_bench_')
+    atexit.register(shutil.rmtree, path, True)
+    davisbase.close_all_files()
+    os.chdir(path)
+    davisbase.init(page_size)
+    return path
+
+def bench_insert_cost(num_rows=5000, step=500):
+    fresh_db()
+    davisbase.read_input("CREATE TABLE BENCH ( A INT, B TEXT, C DOUBLE );")
+    print("{:>10} {:>12} {:>16} {:>12}".format("rows", "us/insert", "bytes written/ins", "file KB"))
+    i = 0
+    while i < num_rows:
+        writes_before = davisbase.BUFFER_STATS['writes']
+        start = time.perf_counter()
+        for j in range(i, i+step):
+            davisbase.read_input("INSERT INTO BENCH ( A, B, C ) VALUES ( {}, ROW{}, {}.25 );".format(j, j, j))
+        elapsed = time.perf_counter() - start
+        written = (davisbase.BUFFER_STATS['writes'] - writes_before)*davisbase.SIZE_OF_PAGE
+        i += step
+        print("{:>10} {:>12.1f} {:>16.1f} {:>12.1f}".format(i, 1e6*elapsed/step, written/step, os.path.getsize('bench.tbl')/1024))
+
+def bench_append(num_rows=1000000, batch=1000):
+    fresh_db()
+    davisbase.read_input("CREATE TABLE BENCH ( A INT, B TEXT, C DOUBLE );")
+    schema, _ = davisbase.catalog_schema('bench')
+    report_every = max(batch, num_rows//10)
+    start = time.perf_counter()
+    window_start = start
+    for i in range(num_rows):
+        davisbase.tab_append_tuple('bench', schema, [i, 'ROW{}'.format(i), i+0.25])
+        if (i+1)%batch==0:
+            davisbase.flush_pgs()
+        if (i+1)%report_every==0:
+            now = time.perf_counter()
+            print("{:>10} rows {:>12.0f} rows/sec".format(i+1, report_every/(now-window_start)))
+            window_start = now
+    davisbase.flush_pgs()
+    elapsed = time.perf_counter() - start
+    print("total: {} rows in {:.1f}s, {:.0f} rows/sec".format(num_rows, elapsed, num_rows/elapsed))
+
+def bench_create_index(num_rows=20000):
+    fresh_db()
+    davisbase.read_input("CREATE TABLE BENCH ( A INT, B TEXT, C DOUBLE );")
+    schema, _ = davisbase.catalog_schema('bench')
+    for i in range(num_rows):
+        davisbase.tab_append_tuple('bench', schema, [(i*7919)%num_rows, 'ROW{}'.format(i), i+0.25])
+    davisbase.flush_pgs()
+    start = time.perf_counter()
+    davisbase.read_input("CREATE INDEX ON BENCH ( A );")
+    bulk = time.perf_counter() - start
+    print("bulk build:       {:>8.2f}s {:>6} pages".format(bulk, davisbase.count_pgs('bench_a.ndx')))
+    davisbase.init_file('bench_c', False)
+    start = time.perf_counter()
+    for tuple in davisbase.mmap_scan_tuples('bench.tbl'):
+        davisbase.index_insert('bench', 'c', 'DOUBLE', tuple['data'][2], tuple['rowid'])
+    davisbase.flush_pgs()
+    incremental = time.perf_counter() - start
+    print("row-by-row build: {:>8.2f}s {:>6} pages".format(incremental, davisbase.count_pgs('bench_c.ndx')))
+
+def bench_page_size(num_rows=20000):
+    print("{:>10} {:>14} {:>14} {:>14} {:>8}".format("page size", "insert rows/s", "scan rows/s", "lookup us", "pages"))
+    for page_size in [512, 1024, 4096, 16384, 65536]:
+        fresh_db(page_size)
+        davisbase.read_input("CREATE TABLE BENCH ( A INT, B TEXT, C DOUBLE );")
+        schema, _ = davisbase.catalog_schema('bench')
+        start = time.perf_counter()
+        for i in range(num_rows):
+            davisbase.tab_append_tuple('bench', schema, [i, 'ROW{}'.format(i), i+0.25])
+        davisbase.flush_pgs()
+        insert = num_rows/(time.perf_counter() - start)
+        start = time.perf_counter()
+        scanned = sum(1 for tuple in davisbase.mmap_scan_tuples('bench.tbl'))
+        scan = scanned/(time.perf_counter() - start)
+        start = time.perf_counter()
+        for rowid in range(1, num_rows+1, max(1, num_rows//1000)):
+            davisbase.tab_tuple_given_rowid('bench.tbl', rowid)
+        lookup = 1e6*(time.perf_counter() - start)/len(range(1, num_rows+1, max(1, num_rows//1000)))
+        print("{:>10} {:>14.0f} {:>14.0f} {:>14.1f} {:>8}".format(page_size, insert, scan, lookup, davisbase.count_pgs('bench.tbl')))
+
+def bench_wal(num_rows=5000, num_threads=8):
+    for mode, async_commit, threads in [('durable', False, 1), ('durable', False, num_threads), ('async', True, 1)]:
+        conn = davisbase.Connection(fresh_db())
+        davisbase.WAL_ASYNC_COMMIT = async_commit
+        conn.execute("CREATE TABLE BENCH ( A INT PRIMARY KEY, B TEXT, C DOUBLE );")
+        syncs_before = davisbase.BUFFER_STATS['syncs']
+        start = time.perf_counter()
+        workers = [threading.Thread(target=wal_inserts, args=(conn, range(t, num_rows, threads))) for t in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        davisbase.sync_wal()
+        elapsed = time.perf_counter() - start
+        syncs = davisbase.BUFFER_STATS['syncs'] - syncs_before
+        assert conn.execute("SELECT COUNT(*) FROM BENCH;").fetchall()==[[num_rows]]
+        print("{:>8} x{:<3}: {} committed statements in {:.2f}s, {:.0f} rows/sec, {} fsyncs ({:.1f} statements per fsync)".format(mode, threads, num_rows, elapsed, num_rows/elapsed, syncs, num_rows/max(1, syncs)))
+    davisbase.WAL_ASYNC_COMMIT = False
+
+def wal_inserts(conn, keys):
+    for i in keys:
+        conn.execute("INSERT INTO BENCH ( A, B, C ) VALUES ( ?, ?, ? );", (i, 'ROW{}'.format(i), i+0.25))
+
+def bench_transaction(num_rows=2000):
+    print("{:>12} {:>12} {:>14} {:>8}".format("mode", "rows/sec", "page writes", "pages"))
+    for mode in ['autocommit', 'transaction']:
+        fresh_db()
+        davisbase.read_input("CREATE TABLE BENCH ( A INT PRIMARY KEY, B TEXT, C DOUBLE );")
+        writes_before = davisbase.BUFFER_STATS['writes']
+        start = time.perf_counter()
+        if mode=='transaction':
+            davisbase.read_input("BEGIN;")
+        for i in range(num_rows):
+            davisbase.read_input("INSERT INTO BENCH ( A, B, C ) VALUES ( {}, ROW{}, {}.25 );".format(i, i, i))
+        if mode=='transaction':
+            davisbase.read_input("COMMIT;")
+        elapsed = time.perf_counter() - start
+        pages = davisbase.count_pgs('bench.tbl')+davisbase.count_pgs('bench_a.ndx')
+        print("{:>12} {:>12.0f} {:>14} {:>8}".format(mode, num_rows/elapsed, davisbase.BUFFER_STATS['writes']-writes_before, pages))
+
+def per_field_result_to_values(query_result):
+    num_columns = query_result[0]
+    datatypes = query_result[1:1+num_columns]
+    temp = query_result[1+num_columns:]
+    i = 0
+    values = []
+    for datatype1 in datatypes:
+        element_size = davisbase.get_datatype1_size(datatype1)
+        values.append(davisbase.datatype_byte_to_val(datatype1, temp[i:i+element_size]))
+        i += element_size
+    return values
+
+def per_field_values_to_result(schema, value_list):
+    datatypes = davisbase.schema_to_int(schema, value_list)
+    byte_string = b''
+    for val, datatype1 in zip(value_list, datatypes):
+        byte_string += davisbase.val_datatype_to_byte(val, datatype1)
+    return byte_string, datatypes
+
+def bench_codec(num_rows=100000):
+    schemas = {
+        'int,double': (['INT', 'DOUBLE'], lambda i: [i, i+0.25]),
+        'int,text,double': (['INT', 'TEXT', 'DOUBLE'], lambda i: [i, 'ROW{}'.format(i%1000), i+0.25]),
+        'int,date,text,int,double': (['INT', 'DATE', 'TEXT', 'INT', 'DOUBLE'], lambda i: [i, datetime(2020, 1, 1+i%28), 'ROW{}'.format(i%1000), i*3, i+0.5]),
+        'mixed with nulls': (['INT', 'TEXT', 'DOUBLE', 'DATE', 'SMALLINT'], lambda i: [i, None if i%2 else 'ROW', i+0.5, None, i%100]),
+    }
+    print("{:>26} {:>16} {:>16} {:>16} {:>16}".format("schema", "old decode/s", "new decode/s", "old encode/s", "new encode/s"))
+    for name, (schema, make_row) in schemas.items():
+        rows = [make_row(i) for i in range(num_rows)]
+        records = []
+        for row in rows:
+            body, datatypes = per_field_values_to_result(schema, row)
+            records.append(bytes([len(datatypes)])+bytes(datatypes)+body)
+        for record in records[:1000]:
+            assert(per_field_result_to_values(record)==davisbase.tab_result_to_values(record))
+        rates = []
+        for decode in [per_field_result_to_values, davisbase.tab_result_to_values]:
+            start = time.perf_counter()
+            for record in records:
+                decode(record)
+            rates.append(num_rows/(time.perf_counter() - start))
+        for encode in [per_field_values_to_result, davisbase.tab_values_to_result]:
+            start = time.perf_counter()
+            for row in rows:
+                encode(schema, row)
+            rates.append(num_rows/(time.perf_counter() - start))
+        print("{:>26} {:>16.0f} {:>16.0f} {:>16.0f} {:>16.0f}".format(name, *rates))
+
+def bench_projection(num_rows=20000, num_columns=20):
+    fresh_db()
+    names = ['C{}'.format(i) for i in range(num_columns)]
+    davisbase.read_input("CREATE TABLE WIDE ( {} );".format(", ".join("{} {}".format(name, ['INT', 'TEXT', 'DOUBLE', 'DATE'][i%4]) for i, name in enumerate(names))))
+    schema, _ = davisbase.catalog_schema('wide')
+    makers = [lambda i: i, lambda i: 'ROW{}'.format(i), lambda i: i+0.5, lambda i: datetime(2020, 1, 1+i%28)]
+    for i in range(num_rows):
+        davisbase.tab_append_tuple('wide', schema, [makers[j%4](i) for j in range(num_columns)])
+    davisbase.flush_pgs()
+    threshold = num_rows - num_rows//100
+    start = time.perf_counter()
+    matched = [tuple for tuple in davisbase.mmap_scan_tuples('wide.tbl') if tuple['data'][0] > threshold]
+    full = time.perf_counter() - start
+    print("full decode then filter: {:>8.3f}s".format(full))
+    for label, batch_scan in [("predicate column first:", False), ("numpy batch predicate:", True)]:
+        if batch_scan and davisbase.np is None:
+            continue
+        davisbase.BATCH_SCAN = batch_scan
+        start = time.perf_counter()
+        rows = list(davisbase.where("SELECT C1, C2 FROM WIDE WHERE C0 > {};".format(threshold))[2])
+        pushed = time.perf_counter() - start
+        assert(rows==[[tuple['data'][1], tuple['data'][2]] for tuple in matched])
+        print("{:<24} {:>8.3f}s ({:.1f}x)".format(label, pushed, full/pushed))
+    davisbase.BATCH_SCAN = True
+
+def bench_batch_scan(num_rows=1000000):
+    fresh_db(4096)
+    davisbase.read_input("CREATE TABLE BENCH ( A INT, B DOUBLE );")
+    schema, _ = davisbase.catalog_schema('bench')
+    for i in range(num_rows):
+        davisbase.tab_append_tuple('bench', schema, [(i*7919)%num_rows, i+0.25])
+        if (i+1)%10000==0:
+            davisbase.flush_pgs()
+    davisbase.flush_pgs()
+    print("{:>28} {:>10} {:>12} {:>12}".format("query", "matches", "row-wise s", "batch s"))
+    for query in ["SELECT * FROM BENCH WHERE A < {};".format(num_rows//100), "SELECT A FROM BENCH WHERE B >= {};".format(num_rows//2), "SELECT B FROM BENCH WHERE A = 42;"]:
+        timings = []
+        for batch in [False, True]:
+            davisbase.BATCH_SCAN = batch
+            start = time.perf_counter()
+            rows = list(davisbase.where(query)[2])
+            timings.append(time.perf_counter() - start)
+        davisbase.BATCH_SCAN = True
+        print("{:>28} {:>10} {:>12.3f} {:>12.3f}".format(query[7:-1], len(rows), *timings))
+    if davisbase.np is None:
+        print("numpy is not installed, both runs used the row-wise scan")
+
+def bench_limit(num_rows=200000, page_rows=100):
+    fresh_db()
+    davisbase.read_input("CREATE TABLE BENCH ( A INT, B TEXT, C DOUBLE );")
+    schema, _ = davisbase.catalog_schema('bench')
+    print("{:>10} {:>16} {:>16} {:>20}".format("rows", "first row ms", "LIMIT 10 ms", "keyset page ms"))
+    for i in range(num_rows):
+        davisbase.tab_append_tuple('bench', schema, [i, 'ROW{}'.format(i), i+0.25])
+        if (i+1)%(num_rows//4)==0:
+            davisbase.flush_pgs()
+            start = time.perf_counter()
+            davisbase.select_cursor("SELECT * FROM BENCH;").fetchone()
+            first = time.perf_counter() - start
+            start = time.perf_counter()
+            davisbase.select_cursor("SELECT * FROM BENCH WHERE A >= 0 LIMIT 10;").fetchall()
+            limited = time.perf_counter() - start
+            start = time.perf_counter()
+            last, pages = max(0, min((i+1)//2, i+1-20*page_rows)), 0
+            while pages < 20:
+                rows = davisbase.select_cursor("SELECT ROWID, A FROM BENCH WHERE ROWID > {} LIMIT {};".format(last, page_rows)).fetchall()
+                if len(rows)==0:
+                    break
+                last, pages = rows[-1][0], pages+1
+            keyset = (time.perf_counter() - start)/max(1, pages)
+            print("{:>10} {:>16.3f} {:>16.3f} {:>20.3f}".format(i+1, 1e3*first, 1e3*limited, 1e3*keyset))
+
+def bench_prepared(num_rows=5000):
+    path = fresh_db()
+    conn = davisbase.connect(path)
+    conn.execute("CREATE TABLE BENCH ( A INT, B TEXT, C DOUBLE );")
+    print("{:>34} {:>12}".format("statement", "us/call"))
+    start = time.perf_counter()
+    for i in range(num_rows):
+        davisbase.read_input("INSERT INTO BENCH ( A, B, C ) VALUES ( {}, ROW{}, {}.25 );".format(i, i, i))
+    print("{:>34} {:>12.1f}".format("read_input INSERT", 1e6*(time.perf_counter() - start)/num_rows))
+    start = time.perf_counter()
+    for i in range(num_rows):
+        conn.execute("INSERT INTO BENCH ( A, B, C ) VALUES ( ?, ?, ? );", (i, 'ROW{}'.format(i), i+0.25))
+    print("{:>34} {:>12.1f}".format("execute INSERT with ?", 1e6*(time.perf_counter() - start)/num_rows))
+    start = time.perf_counter()
+    conn.executemany("INSERT INTO BENCH ( A, B, C ) VALUES ( ?, ?, ? );", [(i, 'ROW{}'.format(i), i+0.25) for i in range(num_rows)])
+    print("{:>34} {:>12.1f}".format("executemany INSERT", 1e6*(time.perf_counter() - start)/num_rows))
+    lookups = range(1, 3*num_rows, 3)
+    start = time.perf_counter()
+    for rowid in lookups:
+        list(davisbase.where("SELECT A, B FROM BENCH WHERE ROWID = {};".format(rowid))[2])
+    print("{:>34} {:>12.1f}".format("where() rowid lookup", 1e6*(time.perf_counter() - start)/len(lookups)))
+    start = time.perf_counter()
+    for rowid in lookups:
+        conn.execute("SELECT A, B FROM BENCH WHERE ROWID = ?;", (rowid,)).fetchall()
+    print("{:>34} {:>12.1f}".format("execute rowid lookup with ?", 1e6*(time.perf_counter() - start)/len(lookups)))
+    print("plan cache: {}".format(davisbase.PLAN_STATS))
+
+def bench_parse(repeat=2000):
+    fresh_db()
+    davisbase.read_input("CREATE TABLE BENCH ( A INT PRIMARY KEY, B TEXT, C DOUBLE );")
+    statements = [
+        "SELECT A, B FROM BENCH WHERE C >= 12.5 LIMIT 10;",
+        "INSERT INTO BENCH ( A, B, C ) VALUES ( 1, ROW1, 1.25 );",
+        "CREATE TABLE T2 ( A INT PRIMARY KEY, B TEXT NOT NULL, C DATE );",
+    ]
+    try:
+        import sqlparse
+    except ImportError:
+        sqlparse = None
+    print("{:>58} {:>12} {:>12} {:>12}".format("statement", "sqlparse us", "parse us", "cached us"))
+    for statement in statements:
+        timings = []
+        if sqlparse is not None:
+            start = time.perf_counter()
+            for i in range(repeat):
+                sqlparse.parse(statement)
+            timings.append("{:.1f}".format(1e6*(time.perf_counter() - start)/repeat))
+        else:
+            timings.append("-")
+        start = time.perf_counter()
+        for i in range(repeat):
+            davisbase.parse_sql(davisbase.tokenize_sql(statement))
+        timings.append("{:.1f}".format(1e6*(time.perf_counter() - start)/repeat))
+        davisbase.prepare(statement)
+        start = time.perf_counter()
+        for i in range(repeat):
+            davisbase.prepare(statement)
+        timings.append("{:.1f}".format(1e6*(time.perf_counter() - start)/repeat))
+        print("{:>58} {:>12} {:>12} {:>12}".format(statement, *timings))
+
+def per_row_date_scan(tab_name, column, oper, value):
+    schema, _ = davisbase.catalog_schema(tab_name)
+    column_list = davisbase.get_col_names_from_catalog(tab_name)
+    index = column_list.index(column)
+    matched = []
+    for tuple in davisbase.mmap_scan_tuples(tab_name+'.tbl'):
+        operand2 = davisbase.to_python(column_list[1:], schema, column, value)
+        operand1 = tuple['data'][index-1]
+        if operand1 is not None and davisbase.get_operator_fn(oper)(operand1, operand2):
+            matched.append(tuple)
+    return matched
+
+def bench_predicate(num_rows=100000):
+    fresh_db(4096)
+    davisbase.read_input("CREATE TABLE BENCH ( A INT, B TEXT, D DATE, C DOUBLE );")
+    schema, _ = davisbase.catalog_schema('bench')
+    for i in range(num_rows):
+        davisbase.tab_append_tuple('bench', schema, [i, 'ROW{}'.format(i%100), datetime(2000, 1, 1)+timedelta(days=i%7300), i+0.25])
+    davisbase.flush_pgs()
+    print("{:>64} {:>10} {:>12}".format("scan", "matches", "rows/sec"))
+    start = time.perf_counter()
+    matched = per_row_date_scan('bench', 'd', '>=', '2019-06-01')
+    print("{:>64} {:>10} {:>12.0f}".format("per-row literal conversion: D >= 2019-06-01", len(matched), num_rows/(time.perf_counter() - start)))
+    for where in ["D >= 2019-06-01", "D BETWEEN 2010-01-01 AND 2010-12-31", "D >= 2019-06-01 AND (B IN ('ROW1', 'ROW2') OR A < 100)", "NOT D < 2019-06-01 AND C IS NOT NULL"]:
+        for batch in [False, True]:
+            davisbase.BATCH_SCAN = batch
+            start = time.perf_counter()
+            matches = sum(1 for row in davisbase.where("SELECT A FROM BENCH WHERE {};".format(where))[2])
+            label = "compiled{}: {}".format(" + batch" if batch else "", where)
+            print("{:>64} {:>10} {:>12.0f}".format(label, matches, num_rows/(time.perf_counter() - start)))
+    davisbase.BATCH_SCAN = True
+
+def bench_aggregate(num_rows=200000):
+    fresh_db(4096)
+    davisbase.read_input("CREATE TABLE BENCH ( A INT, B TEXT, C DOUBLE );")
+    schema, _ = davisbase.catalog_schema('bench')
+    for i in range(num_rows):
+        davisbase.tab_append_tuple('bench', schema, [(i*7919)%num_rows, 'ROW{}'.format(i%100), i+0.25])
+    davisbase.flush_pgs()
+    davisbase.read_input("CREATE INDEX ON BENCH ( A );")
+    start = time.perf_counter()
+    tuples = list(davisbase.mmap_scan_tuples('bench.tbl'))
+    groups = {}
+    for tuple in tuples:
+        groups.setdefault(tuple['data'][1], []).append(tuple['data'][2])
+    expected = [(key, len(values), sum(values)/len(values)) for key, values in groups.items()]
+    print("{:>52} {:>10.4f}s".format("materialize then group in Python", time.perf_counter() - start))
+    for statement in ["SELECT B, COUNT(*), AVG(C) FROM BENCH GROUP BY B;", "SELECT COUNT(*) FROM BENCH WHERE ROWID > 0;",
+                      "SELECT COUNT(*) FROM BENCH;", "SELECT MIN(C), MAX(C) FROM BENCH;", "SELECT MIN(A), MAX(A) FROM BENCH;"]:
+        start = time.perf_counter()
+        rows = list(davisbase.where(statement)[2])
+        print("{:>52} {:>10.4f}s".format(statement, time.perf_counter() - start))
+    got = dict((row[0], row) for row in davisbase.where("SELECT B, COUNT(*), AVG(C) FROM BENCH GROUP BY B;")[2])
+    assert(len(got)==len(expected))
+    for key, count, average in expected:
+        assert(got[key][1]==count and abs(got[key][2]-average)<=1e-9*max(1.0, abs(average)))
+
+def bench_order_by(num_rows=200000, run_items=20000):
+    fresh_db(4096)
+    davisbase.read_input("CREATE TABLE BENCH ( A INT, B TEXT, C DOUBLE );")
+    schema, _ = davisbase.catalog_schema('bench')
+    for i in range(num_rows):
+        davisbase.tab_append_tuple('bench', schema, [(i*7919)%num_rows, 'ROW{}'.format(i%100), ((i*104729)%num_rows)+0.25])
+    davisbase.flush_pgs()
+    davisbase.read_input("CREATE INDEX ON BENCH ( A );")
+    davisbase.SORT_BUFFER_ITEMS = run_items
+    print("{:>48} {:>10} {:>10}".format("statement", "first row", "total"))
+    start = time.perf_counter()
+    rows = sorted(([tuple['rowid']]+tuple['data'] for tuple in davisbase.mmap_scan_tuples('bench.tbl')), key=lambda row: row[3])[:10]
+    elapsed = time.perf_counter() - start
+    print("{:>48} {:>9.4f}s {:>9.4f}s".format("materialize and sort in Python, LIMIT 10", elapsed, elapsed))
+    for statement in ["SELECT * FROM BENCH ORDER BY C LIMIT 10;", "SELECT * FROM BENCH ORDER BY C;",
+                      "SELECT * FROM BENCH ORDER BY A LIMIT 10;", "SELECT * FROM BENCH ORDER BY A DESC LIMIT 10;"]:
+        start = time.perf_counter()
+        rows = davisbase.where(statement)[2]
+        next(rows)
+        first = time.perf_counter() - start
+        for row in rows:
+            pass
+        print("{:>48} {:>9.4f}s {:>9.4f}s".format(statement, first, time.perf_counter() - start))
+
+def bench_join(num_orders=200000, num_customers=20000):
+    fresh_db(4096)
+    davisbase.read_input("CREATE TABLE CUSTOMERS ( ID INT, NAME TEXT );")
+    davisbase.read_input("CREATE TABLE ORDERS ( CUSTOMER INT, TOTAL DOUBLE );")
+    davisbase.read_input("CREATE TABLE VIP ( CUSTOMER INT );")
+    customers, _ = davisbase.catalog_schema('customers')
+    orders, _ = davisbase.catalog_schema('orders')
+    vip, _ = davisbase.catalog_schema('vip')
+    for i in range(num_customers):
+        davisbase.tab_append_tuple('customers', customers, [i, 'CUSTOMER{}'.format(i)])
+    for i in range(num_orders):
+        davisbase.tab_append_tuple('orders', orders, [(i*7919)%num_customers, i+0.25])
+    for i in range(0, num_customers, num_customers//20):
+        davisbase.tab_append_tuple('vip', vip, [i])
+    davisbase.flush_pgs()
+    start = time.perf_counter()
+    names = dict((tuple['data'][0], tuple['data'][1]) for tuple in davisbase.mmap_scan_tuples('customers.tbl'))
+    matched = sum(1 for tuple in davisbase.mmap_scan_tuples('orders.tbl') if tuple['data'][0] in names)
+    print("{:>72} {:>8} {:>9.4f}s".format("dump both tables and join in Python", matched, time.perf_counter() - start))
+    statements = ["SELECT name, total FROM orders JOIN customers ON customer = id;",
+                  "SELECT vip.customer, total FROM vip JOIN orders ON vip.customer = orders.customer;"]
+    for indexed in [False, True]:
+        if indexed:
+            davisbase.read_input("CREATE INDEX ON ORDERS ( CUSTOMER );")
+        for statement in statements:
+            stats = dict(davisbase.JOIN_STATS)
+            start = time.perf_counter()
+            matched = sum(1 for row in davisbase.where(statement)[2])
+            elapsed = time.perf_counter() - start
+            method = [key for key in sorted(stats) if davisbase.JOIN_STATS[key]!=stats[key]]
+            print("{:>72} {:>8} {:>9.4f}s {}".format(statement, matched, elapsed, ",".join(method)))
+    davisbase.JOIN_BUFFER_ITEMS = num_customers//4
+    start = time.perf_counter()
+    matched = sum(1 for row in davisbase.where(statements[0])[2])
+    print("{:>72} {:>8} {:>9.4f}s grace".format("JOIN_BUFFER_ITEMS={}: ".format(davisbase.JOIN_BUFFER_ITEMS)+statements[0][:40], matched, time.perf_counter() - start))
+
+
+BENCHMARKS = {
+    'insert': bench_insert_cost,
+    'append': bench_append,
+    'create_index': bench_create_index,
+    'page_size': bench_page_size,
+    'wal': bench_wal,
+    'transaction': bench_transaction,
+    'codec': bench_codec,
+    'projection': bench_projection,
+    'batch_scan': bench_batch_scan,
+    'limit': bench_limit,
+    'prepared': bench_prepared,
+    'parse': bench_parse,
+    'predicate': bench_predicate,
+    'aggregate': bench_aggregate,
+    'order_by': bench_order_by,
+    'join': bench_join,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print("usage: python benchmark.py [{}] [args...]".format("|".join(sorted(BENCHMARKS))))
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]](*[int(arg) for arg in sys.argv[2:]])
@@ -4,8 +4,21 @@ import sys
 import operator
 import re
 import pdb
+import mmap
+import zlib
+import atexit
+import threading
+import heapq
+import pickle
+import itertools
+import tempfile
+import weakref
 from datetime import datetime, time
-import sqlparse
+from collections import OrderedDict
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 SIZE_OF_PAGE = 512
@@ -14,41 +27,260 @@ if BYTE_ORDER=='big':
     endian = '>'
 elif BYTE_ORDER=='little':
     endian = '<'
+FILE_HEADER_SIZE = 64
+FILE_MAGIC = b'DAVISDB\x00'
+FILE_HEADER_FORMAT = endian+'8siiiii'
+FILE_HEADER_FIELDS = ['max_rowid', 'rightmost_leaf', 'page_size', 'free_pg_head', 'free_pg_count']
+MIN_PAGE_SIZE = 512
+MAX_PAGE_SIZE = 65536
+FILE_HEADERS = {}
+CATALOG_VERSION = 0
+CATALOG_CACHE = {'version':-1, 'tables':{}}
+DIRTY_HEADERS = set()
+BUFFER_POOL_BYTES = 4*1024*1024
+INDEX_FILL_FACTOR = 0.9
+MIN_FILL_FACTOR = 0.25
+SORT_BUFFER_ITEMS = 100000
+SORT_RUN_CHUNK = 1000
+JOIN_BUFFER_ITEMS = 100000
+JOIN_STATS = {'hash':0, 'grace':0, 'index':0}
+RECORD_CODECS = OrderedDict()
+RECORD_CODEC_CACHE_SIZE = 4096
+BATCH_SCAN = True
+BATCH_MIN_ROWS = 8
+PLAN_CACHE = OrderedDict()
+PLAN_CACHE_SIZE = 256
+PLAN_STATS = {'hits':0, 'misses':0}
+SQL_TOKEN = re.compile(r"\s*(?:('(?:[^']|'')*')|(<=|>=|<>|!=|=|<|>)|([(),;*?])|([^\s(),;*?=<>!']+))")
+SQL_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*$")
+SQL_COLUMN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$")
+SQL_AGGREGATES = ["COUNT", "SUM", "AVG", "MIN", "MAX"]
+SQL_DATATYPES = ["TINYINT", "SMALLINT", "INT", "BIGINT", "LONG", "FLOAT", "DOUBLE", "YEAR", "TIME", "DATETIME", "DATE", "TEXT"]
+BATCH_DTYPES = {1:'u1', 2:endian+'i2', 3:endian+'i4', 4:endian+'i8', 5:endian+'f4', 6:endian+'f8', 8:'u1', 10:'>i8', 11:'>i8'}
+BUFFER_POOL = OrderedDict()
+DIRTY_PGS = set()
+OPEN_FILES = {}
+MMAPS = {}
+RETIRED_MMAPS = {}
+CURSORS = weakref.WeakSet()
+BUFFER_STATS = {'hits':0, 'misses':0, 'evictions':0, 'writes':0, 'syncs':0, 'checkpoints':0}
+WAL_FNAME = 'davisbase.wal'
+WAL_RECORD_FORMAT = endian+'BHiII'
+WAL_RECORD_SIZE = struct.calcsize(WAL_RECORD_FORMAT)
+WAL_PAGE = 1
+WAL_HEADER = 2
+WAL_COMMIT = 3
+WAL_GROUP_COMMIT_DELAY = 0
+WAL_ASYNC_COMMIT = False
+WAL_CHECKPOINT_BYTES = 4*1024*1024
+WAL_APPEND_BYTES = 256*1024
+WAL_PENDING = {}
+WAL_PGS = {}
+WAL_HEADERS = {}
+WAL_STATE = {'fd':None, 'path':None, 'size':0, 'lsn':0, 'synced_lsn':0, 'unsynced':False, 'writer':None}
+SPILL = {'file':None, 'size':0}
+TRANSACTION = {'active':False, 'file_sizes':{}}
+STATEMENT = {'active':False, 'pgs':{}, 'headers':{}, 'file_sizes':{}, 'new_files':[]}
+WAL_LOCK = threading.RLock()
+WAL_COMMITTED = threading.Event()
+WAL_SYNCED = threading.Condition(WAL_LOCK)
+WAL_STOP = threading.Event()
+
+class DatabaseError(Exception):
+    pass
+
+class ProgrammingError(DatabaseError):
+    pass
+
+class OperationalError(DatabaseError):
+    pass
 
 def read_input(cmd_input):
+    with ENGINE_LOCK:
+        begin_statement()
+        try:
+            output = run_cmd(cmd_input)
+        except DatabaseError as e:
+            rollback_statement()
+            print(e)
+            return None
+        except:
+            rollback_statement()
+            raise
+        end_statement()
+        if not TRANSACTION['active']:
+            flush_pgs()
+    return output
+
+def run_cmd(cmd_input):
     if len(cmd_input)==0:
-        pass
+        return None
     elif cmd_input[-1]!=";":
         return cmd_input
-    elif cmd_input.lower() == "help;":
-        print_help()
-    elif cmd_input.lower() == "show tables;":
-        show_tabs()
-    elif cmd_input[0:len("drop table ")].lower() == "drop table ":
-        drop_tab(cmd_input)
-    elif cmd_input[0:len("insert ")].lower() == "insert ":
-        insert_into(cmd_input)
-    elif cmd_input[0:len("create table ")].lower() == "create table ":
-        create_tab(cmd_input)
-    elif cmd_input[0:len("select ")].lower() == "select ":
-        tab_name, cells = where(cmd_input)
-        if tab_name==None:
-            return
-        tuple_print(tab_name, cells)
+    plan = prepare(cmd_input)
+    if plan['num_params']>0:
+        print("Parameters (?) can only be bound through the Python API.")
         return None
-    elif cmd_input.lower() == "exit;":
+    elif plan['kind']=='exit':
         return True
-    else:
-        print("Command \"{}\" not recognized".format(cmd_input))
+    cursor = execute_plan(Cursor(), plan, ())
+    if plan['kind']=='select':
+        tuple_print(cursor.columns, plan['types'], cursor.rows)
+    return None
+
+
+def begin_transaction():
+    if TRANSACTION['active']:
+        raise OperationalError("A transaction is already in progress.")
+    flush_pgs()
+    TRANSACTION['active'] = True
+    TRANSACTION['file_sizes'] = {}
+    return None
+
+def commit_transaction():
+    if not TRANSACTION['active']:
+        raise OperationalError("No transaction in progress.")
+    flush_pgs()
+    TRANSACTION['active'] = False
+    TRANSACTION['file_sizes'] = {}
+    return None
+
+def rollback_transaction():
+    if not TRANSACTION['active']:
+        raise OperationalError("No transaction in progress.")
+    file_sizes = dict(STATEMENT['file_sizes'])
+    file_sizes.update(TRANSACTION['file_sizes'])
+    discard_uncommitted(file_sizes)
+    TRANSACTION['active'] = False
+    TRANSACTION['file_sizes'] = {}
+    return None
+
+def discard_uncommitted(file_sizes):
+    if len(file_sizes)!=0:
+        materialize_cursors()
+    discarded = set(DIRTY_PGS) | set(WAL_PENDING)
+    for fname, file_size in file_sizes.items():
+        first_new_pg = (file_size-FILE_HEADER_SIZE)//SIZE_OF_PAGE
+        discarded.update(key for key in BUFFER_POOL if key[0]==fname and key[1]>=first_new_pg)
+    for key in discarded:
+        BUFFER_POOL.pop(key, None)
+    DIRTY_PGS.clear()
+    clear_spill()
+    for fname in DIRTY_HEADERS:
+        FILE_HEADERS.pop(fname, None)
+    DIRTY_HEADERS.clear()
+    truncate_files(file_sizes)
+    clear_statement_log()
+    bump_catalog_version()
+    return None
+
+def truncate_files(file_sizes):
+    for fname, file_size in file_sizes.items():
+        if os.path.exists(fname) and unmap_file(fname):
+            os.ftruncate(pager_fd(fname), file_size)
+    return None
 
+def begin_statement():
+    clear_statement_log()
+    STATEMENT['active'] = True
+    return None
+
+def end_statement():
+    clear_statement_log()
+    STATEMENT['active'] = False
+    return None
 
-def init():
+def clear_statement_log():
+    STATEMENT['pgs'] = {}
+    STATEMENT['headers'] = {}
+    STATEMENT['file_sizes'] = {}
+    STATEMENT['new_files'] = []
+    return None
+
+def rollback_statement():
+    if len(STATEMENT['file_sizes'])!=0:
+        materialize_cursors()
+    for key, (pg, offset) in STATEMENT['pgs'].items():
+        BUFFER_POOL.pop(key, None)
+        DIRTY_PGS.discard(key)
+        WAL_PENDING.pop(key, None)
+        if pg is not None:
+            BUFFER_POOL[key] = pg
+            DIRTY_PGS.add(key)
+        elif offset is not None:
+            WAL_PENDING[key] = offset
+    for fname, (was_dirty, header) in STATEMENT['headers'].items():
+        if was_dirty:
+            FILE_HEADERS[fname] = header
+            DIRTY_HEADERS.add(fname)
+        else:
+            FILE_HEADERS.pop(fname, None)
+            DIRTY_HEADERS.discard(fname)
+    for fname, file_size in STATEMENT['file_sizes'].items():
+        first_new_pg = (file_size-FILE_HEADER_SIZE)//SIZE_OF_PAGE
+        for key in [key for key in BUFFER_POOL if key[0]==fname and key[1]>=first_new_pg]:
+            del BUFFER_POOL[key]
+            DIRTY_PGS.discard(key)
+        for key in [key for key in WAL_PENDING if key[0]==fname and key[1]>=first_new_pg]:
+            del WAL_PENDING[key]
+        if TRANSACTION['file_sizes'].get(fname)==file_size:
+            del TRANSACTION['file_sizes'][fname]
+    truncate_files(STATEMENT['file_sizes'])
+    for fname in STATEMENT['new_files']:
+        if os.path.exists(fname):
+            remove_file(fname)
+    end_statement()
+    evict_pgs()
+    bump_catalog_version()
+    return None
+
+def log_pg_change(key):
+    if STATEMENT['active'] and key not in STATEMENT['pgs']:
+        if key in DIRTY_PGS:
+            STATEMENT['pgs'][key] = (BUFFER_POOL[key], None)
+        else:
+            STATEMENT['pgs'][key] = (None, WAL_PENDING.get(key))
+    return None
+
+def log_header_change(fname):
+    if STATEMENT['active'] and fname not in STATEMENT['headers']:
+        STATEMENT['headers'][fname] = (fname in DIRTY_HEADERS, dict(read_file_header(fname)))
+    return None
+
+def set_page_size(page_size):
+    global SIZE_OF_PAGE
+    if page_size<MIN_PAGE_SIZE or page_size>MAX_PAGE_SIZE or page_size&(page_size-1)!=0:
+        raise ValueError("Page size must be a power of two between {} and {}".format(MIN_PAGE_SIZE, MAX_PAGE_SIZE))
+    SIZE_OF_PAGE = page_size
+    return None
+
+def close_all_files():
+    if TRANSACTION['active']:
+        rollback_transaction()
+    flush_pgs()
+    close_wal()
+    close_spill()
+    for fname in set(OPEN_FILES) | set(MMAPS) | set(FILE_HEADERS):
+        discard_pgs(fname)
+        unmap_file(fname)
+    pager_close()
+    bump_catalog_version()
+    return None
+
+def init(page_size=None):
+    close_all_files()
+    replay_wal()
     if os.path.exists('davisbase_columns.tbl'):
-        pass
+        db_page_size = unpack_file_header('davisbase_columns.tbl')['page_size']
+        if page_size is not None and page_size!=db_page_size:
+            raise ValueError("Database was created with {} byte pages".format(db_page_size))
+        set_page_size(db_page_size)
     else:
+        if page_size is not None:
+            set_page_size(page_size)
         init_file('davisbase_columns', True)
         fname = "davisbase_columns.tbl"
-        davisbase_columns_schema = ['TEXT', 'TEXT', 'TEXT', 'TINYINT', 'TEXT', 'TEXT', 'TEXT']
+        davisbase_columns_schema = ['TEXT', 'TEXT', 'TEXT', 'SMALLINT', 'TEXT', 'TEXT', 'TEXT']
 
         davisbase_columns_tuples = [["davisbase_tables", "rowid", "INT", 1, "NO", 'NO', 'NO' ],
                 ["davisbase_tables", "tab_name", "TEXT", 2, "NO", 'NO', 'NO' ],
@@ -56,17 +288,13 @@ def init():
                 ["davisbase_columns", "tab_name", "TEXT", 2, "NO", 'NO', 'NO' ],
                 ["davisbase_columns", "column_name", "TEXT", 3, "NO", 'NO', 'NO' ],
                 ["davisbase_columns", "data_type", "TEXT", 4, "NO", 'NO', 'NO' ],
-                ["davisbase_columns", "ordinal_position", "TINYINT", 5, "NO", 'NO', 'NO' ],
+                ["davisbase_columns", "ordinal_position", "SMALLINT", 5, "NO", 'NO', 'NO' ],
                 ["davisbase_columns", "is_nullable", "TEXT", 6, "NO", 'NO', 'NO' ],
               ["davisbase_columns", "unique", "TEXT", 7, "NO", 'NO', 'NO' ],
               ["davisbase_columns", "primary_key", "TEXT", 8, "NO", 'NO', 'NO' ]]
 
-        for i, tuple in enumerate(davisbase_columns_tuples):
-            tuple = tab_create_tuple(davisbase_columns_schema, tuple, False, left_child_pg=None,  rowid=i+1)
-            try:
-                pg_insert_tuple(fname, 0, tuple)
-            except:
-                tab_leaf_split_pg(fname, 0, tuple)
+        for tuple in davisbase_columns_tuples:
+            tab_append_tuple('davisbase_columns', davisbase_columns_schema, tuple)
 
     if os.path.exists('davisbase_tables.tbl'):
         pass
@@ -77,29 +305,25 @@ def init():
 
         cells = [["davisbase_tables"],
                 ["davisbase_columns"]]
-        for i, tuple in enumerate(cells):
-            tuple = tab_create_tuple(davisbase_tables_schema, tuple, False, left_child_pg=None,  rowid=i+1)
-            try:
-                pg_insert_tuple(fname, 0, tuple)
-            except:
-                print("cell_size:",len(tuple))
-                fbytes = load_file(fname)
-                print("Remaining space in pg:", pg_available_bytes(fbytes, 0))
+        for tuple in cells:
+            tab_append_tuple('davisbase_tables', davisbase_tables_schema, tuple)
+    flush_pgs()
 
 
 def print_help():
-    print("DavisBase supported commands: (lowercase is all acceptable) \n1: SHOW TABLES;\n2: CREATE TABLE ...;\n3: DROP TABLE ...;\n4: INSERT INTO ...;\n5: SELECT ...;\n6: EXIT;")
+    print("DavisBase supported commands: (lowercase is all acceptable) \n1: SHOW TABLES;\n2: CREATE TABLE ...;\n3: CREATE INDEX ON ... ( ... );\n4: DROP TABLE ...;\n5: INSERT INTO ...;\n6: SELECT ... FROM ... [[LEFT] JOIN ... ON ... = ...] [WHERE ...] [GROUP BY ...] [ORDER BY ... [DESC]] [LIMIT n [OFFSET m]];\n7: BEGIN; / COMMIT; / ROLLBACK;\n8: VACUUM ...;\n9: EXIT;")
     return None
 
-def init_file(tab_name, is_tab, is_interior=False, right_child=0):
+def init_file(tab_name, is_tab, is_interior=False, right_child=-1):
     if is_tab:
         ftype = ".tbl"
     else:
         ftype = '.ndx'
     if os.path.exists(tab_name+ftype):
-        os.remove(tab_name+ftype)
+        remove_file(tab_name+ftype)
     with open(tab_name+ftype, 'w+') as f:
         pass
+    write_file_header(tab_name+ftype, {'max_rowid':0, 'rightmost_leaf':0, 'page_size':SIZE_OF_PAGE, 'free_pg_head':0, 'free_pg_count':0})
     write_new_pg(tab_name, is_tab, is_interior, right_child, -1)
     return None
 
@@ -110,7 +334,7 @@ def init_indexes(column_dictionary):
     columns = list(column_dictionary[tab_name].values())
     for col in col_names:
         if column_dictionary[tab_name][col]['primary_key']=='YES':
-            index_name = tab_name+'_'+col
+            index_name = tab_name.lower()+'_'+col.lower()
             init_file(index_name, False)
     return None
 
@@ -138,23 +362,36 @@ def write_new_pg(tab_name, is_tab, is_interior, right_sib_right_child, parent):
         ftype = ".tbl"
     else:
         ftype = '.ndx'
-    file_size = os.path.getsize(tab_name + ftype)
-    with open(tab_name + ftype, 'ab') as f:
-        newpg = bytearray(SIZE_OF_PAGE*b'\x00')
-        if is_tab and is_interior:
-            newpg[0:1] = b'\x05'
-        elif is_tab and is_leaf:
-            newpg[0:1] = b'\x0d'
-        elif is_index and is_interior:
-            newpg[0:1] = b'\x02'
-        elif is_index and is_leaf:
-            newpg[0:1] = b'\x0a'
-        else:
-             raise ValueError("Page must be table/index")
-        newpg[2:16] = struct.pack(endian+'hhii2x', 0, SIZE_OF_PAGE, right_sib_right_child, parent)
-        f.write(newpg)
-        assert(file_size%SIZE_OF_PAGE==0)
-        return int(file_size/SIZE_OF_PAGE)
+    file_size = pager_file_size(tab_name + ftype) - FILE_HEADER_SIZE
+    newpg = bytearray(SIZE_OF_PAGE*b'\x00')
+    if is_tab and is_interior:
+        newpg[0:1] = b'\x05'
+    elif is_tab and is_leaf:
+        newpg[0:1] = b'\x0d'
+    elif is_index and is_interior:
+        newpg[0:1] = b'\x02'
+    elif is_index and is_leaf:
+        newpg[0:1] = b'\x0a'
+    else:
+         raise ValueError("Page must be table/index")
+    set_pg_offset(newpg, 4, SIZE_OF_PAGE)
+    newpg[6:14] = struct.pack(endian+'ii', right_sib_right_child, parent)
+    assert(file_size%SIZE_OF_PAGE==0)
+    if file_size!=0:
+        pg_num = pop_free_pg(tab_name + ftype)
+        if pg_num is not None:
+            save_pg(tab_name + ftype, pg_num, newpg)
+            return pg_num
+    if TRANSACTION['active']:
+        TRANSACTION['file_sizes'].setdefault(tab_name + ftype, FILE_HEADER_SIZE+file_size)
+    if STATEMENT['active']:
+        STATEMENT['file_sizes'].setdefault(tab_name + ftype, FILE_HEADER_SIZE+file_size)
+    if file_size==0:
+        pager_write(tab_name + ftype, FILE_HEADER_SIZE, newpg)
+    else:
+        pager_write(tab_name + ftype, FILE_HEADER_SIZE+file_size, bytes(SIZE_OF_PAGE))
+        save_pg(tab_name + ftype, file_size//SIZE_OF_PAGE, newpg)
+    return int(file_size/SIZE_OF_PAGE)
 
 def datatype_to_int(datatype):
     datatype = datatype.lower()
@@ -243,34 +480,100 @@ def datatype_byte_to_val(datatype1, byte_str):
     if datatype1==9:
         return byte_to_time(byte_str)
     elif datatype1>=12:
-        return byte_str.decode("utf-8")
+        return str(byte_str, "utf-8")
     else:
          raise ValueError("datatype_byte error ")
 
 
 def tab_values_to_result(schema, value_list):
     datatypes = schema_to_int(schema, value_list)
-    byte_string = b''
-    for val, datatype1 in zip(value_list, datatypes):
-        byte_val = val_datatype_to_byte(val, datatype1)
-
-        byte_string += byte_val
-    return byte_string, datatypes
+    return encode_record(record_codec(bytes(datatypes)), value_list), datatypes
 
 
 def tab_result_to_values(query_result):
     num_columns = query_result[0]
-    temp = query_result[1:]
-    datatypes =  temp[:num_columns]
-    temp = temp[num_columns:]
-    i = 0
+    codec = record_codec(bytes(query_result[1:1+num_columns]))
+    assert(codec['decoder'].size==len(query_result)-1-num_columns)
+    return decode_record(codec, query_result, 1+num_columns)
+
+def record_codec(datatypes):
+    codec = RECORD_CODECS.get(datatypes)
+    if codec is None:
+        codec = compile_record_codec(datatypes)
+        if len(RECORD_CODECS)>=RECORD_CODEC_CACHE_SIZE:
+            RECORD_CODECS.popitem(last=False)
+        RECORD_CODECS[datatypes] = codec
+    return codec
+
+def compile_record_codec(datatypes):
+    encode_fmt = endian
+    decode_fmt = endian
+    slots = []
+    pre = []
+    post = []
+    fields = []
+    field_offset = 0
+    for col, datatype1 in enumerate(datatypes):
+        if datatype1==0:
+            fields.append(None)
+            continue
+        encode_code, decode_code, to_field, from_field = serial_type_codec(datatype1)
+        if to_field is not None:
+            pre.append((len(slots), to_field))
+        if from_field is not None:
+            post.append((len(slots), from_field))
+        field_struct = struct.Struct(endian+decode_code)
+        fields.append((field_struct, field_offset, from_field))
+        field_offset += field_struct.size
+        encode_fmt += encode_code
+        decode_fmt += decode_code
+        slots.append(col)
+    return {'encoder':struct.Struct(encode_fmt), 'decoder':struct.Struct(decode_fmt), 'slots':slots, 'pre':pre, 'post':post, 'fields':fields, 'num_columns':len(datatypes)}
+
+def serial_type_codec(datatype1):
+    if datatype1==1:
+        return 'b', 'B', None, None
+    elif datatype1==8:
+        return 'b', 'B', lambda val: val-2000, lambda val: val+2000
+    elif datatype1 in [2,3,4,5,6]:
+        return int_to_fstring(datatype1), int_to_fstring(datatype1), None, None
+    elif datatype1 in [10,11]:
+        return '8s', '8s', date_to_bytes, bytes_to_dates
+    elif datatype1==9:
+        return '4s', '4s', time_to_byte, byte_to_time
+    elif datatype1>=12:
+        text_code = '{}s'.format(datatype1-12)
+        return text_code, text_code, lambda val: val.encode('ascii'), lambda val: str(val, 'utf-8')
+    else:
+        raise ValueError("datatype issue")
+
+def encode_record(codec, value_list):
+    values = [value_list[col] for col in codec['slots']]
+    for slot, convert in codec['pre']:
+        values[slot] = convert(values[slot])
+    return codec['encoder'].pack(*values)
+
+def decode_record(codec, buf, offset):
+    values = list(codec['decoder'].unpack_from(buf, offset))
+    for slot, convert in codec['post']:
+        values[slot] = convert(values[slot])
+    if len(codec['slots'])==codec['num_columns']:
+        return values
+    row = [None]*codec['num_columns']
+    for col, val in zip(codec['slots'], values):
+        row[col] = val
+    return row
+
+def decode_record_columns(codec, buf, offset, cols):
     values = []
-    for datatype1 in datatypes:
-        element_size = get_datatype1_size(datatype1)
-        byte_str = temp[i:i+element_size]
-        values.append(datatype_byte_to_val(datatype1, byte_str))
-        i+=element_size
-    assert(i==len(temp))
+    for col in cols:
+        field = codec['fields'][col]
+        if field is None:
+            values.append(None)
+            continue
+        field_struct, field_offset, from_field = field
+        val = field_struct.unpack_from(buf, offset+field_offset)[0]
+        values.append(val if from_field is None else from_field(val))
     return values
 
 def index_datatype_value_rowids_to_result(index_datatype, index_value, rowid_list):
@@ -289,13 +592,8 @@ def index_result_to_values(query_result):
     element_size = get_datatype1_size(ind_datatype)
     ind_byte_str = query_result[2:2+element_size]
     ind_value = datatype_byte_to_val(ind_datatype, ind_byte_str)
-    bin_rowid_list  = query_result[2+element_size:]
-    i=0
-    j = len(bin_rowid_list)
-    rowid_values = []
-    while(i<j):
-        rowid_values.append(struct.unpack(endian+'i', bin_rowid_list[i:i+4])[0])
-        i+=4
+    num_rowids = (len(query_result)-2-element_size)//4
+    rowid_values = list(struct.unpack_from(endian+'{}i'.format(num_rowids), query_result, 2+element_size))
     return ind_value, rowid_values
 
 def tab_create_tuple(schema, value_list, is_interior, left_child_pg=None,  rowid=None):
@@ -314,7 +612,7 @@ def tab_create_tuple(schema, value_list, is_interior, left_child_pg=None,  rowid
         query_result_body, datatypes  = tab_values_to_result(schema, value_list)
         query_result_header = bytes([len(datatypes)]) + bytes(datatypes)
         cell_result = query_result_header + query_result_body
-        cell_header = struct.pack(endian+'hi', len(cell_result), rowid)
+        cell_header = struct.pack(endian+'Hi', len(cell_result), rowid)
         tuple = cell_header + cell_result
 
     return tuple
@@ -343,7 +641,7 @@ def tab_read_tuple(tuple, is_interior):
         cell_header = struct.unpack(endian+'ii', tuple[0:8])
         res = {'left_child_pg':cell_header[0],'rowid':cell_header[1]}
     elif is_leaf:
-        cell_header = struct.unpack(endian+'hi', tuple[0:6])
+        cell_header = struct.unpack(endian+'Hi', tuple[0:6])
         query_result = tuple[6:]
         values = tab_result_to_values(query_result)
         res = {'bytes':cell_header[0]+6, 'rowid':cell_header[1],"data":values}
@@ -353,6 +651,23 @@ def tab_read_tuple(tuple, is_interior):
     res['cell_binary'] = tuple
     return res
 
+def tab_cell_rowid(cell):
+    return struct.unpack_from(endian+'i', cell, 2)[0]
+
+def tab_cell_column(cell, col):
+    num_columns = cell[6]
+    field = record_codec(bytes(cell[7:7+num_columns]))['fields'][col]
+    if field is None:
+        return None
+    field_struct, field_offset, from_field = field
+    val = field_struct.unpack_from(cell, 7+num_columns+field_offset)[0]
+    return val if from_field is None else from_field(val)
+
+def tab_cell_columns(cell, cols):
+    num_columns = cell[6]
+    codec = record_codec(bytes(cell[7:7+num_columns]))
+    return decode_record_columns(codec, cell, 7+num_columns, cols)
+
 def index_read_tuple(tuple, is_interior):
     result=dict()
     if  is_interior:
@@ -373,24 +688,397 @@ def index_read_tuple(tuple, is_interior):
     return result
 
 
+def set_buffer_pool_size(num_bytes):
+    global BUFFER_POOL_BYTES
+    BUFFER_POOL_BYTES = num_bytes
+    evict_pgs()
+    return None
+
+def buffer_pool_stats():
+    stats = dict(BUFFER_STATS)
+    stats['cached_pgs'] = len(BUFFER_POOL)
+    stats['dirty_pgs'] = len(DIRTY_PGS)
+    stats['spilled_pgs'] = len(WAL_PENDING)
+    stats['wal_pgs'] = len(WAL_PGS)
+    stats['capacity_pgs'] = max(1, BUFFER_POOL_BYTES//SIZE_OF_PAGE)
+    return stats
+
+def pager_fd(fname):
+    fd = OPEN_FILES.get(fname)
+    if fd is None:
+        fd = os.open(fname, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+        OPEN_FILES[fname] = fd
+    return fd
+
+def pager_close(fname=None):
+    if fname is None:
+        fnames = list(OPEN_FILES.keys())
+    else:
+        fnames = [fname]
+    for fname in fnames:
+        fd = OPEN_FILES.pop(fname, None)
+        if fd is not None:
+            os.close(fd)
+    return None
+
+def pager_file_size(fname):
+    return os.fstat(pager_fd(fname)).st_size
+
+def pager_read(fname, offset, size):
+    fd = pager_fd(fname)
+    if hasattr(os, 'pread'):
+        return os.pread(fd, size, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+def pager_write(fname, offset, data):
+    fd = pager_fd(fname)
+    if hasattr(os, 'pwrite'):
+        written = os.pwrite(fd, data, offset)
+    else:
+        os.lseek(fd, offset, os.SEEK_SET)
+        written = os.write(fd, data)
+    assert(written==len(data))
+    return None
+
+def remove_file(fname):
+    checkpoint_wal()
+    discard_pgs(fname)
+    unmap_file(fname)
+    pager_close(fname)
+    os.remove(fname)
+    return None
+
+def pager_sync(fname):
+    os.fsync(pager_fd(fname))
+    return None
+
+def read_pg_from_disk(fname, pg_num):
+    pg = unwritten_pg(fname, pg_num)
+    if pg is None:
+        pg = pager_read(fname, FILE_HEADER_SIZE+pg_num*SIZE_OF_PAGE, SIZE_OF_PAGE)
+    assert(len(pg)==SIZE_OF_PAGE)
+    return pg
+
+def unwritten_pgs(fname):
+    with WAL_LOCK:
+        pgs = dict((key[1], read_wal_pg(offset)) for key, offset in WAL_PGS.items() if key[0]==fname)
+    for key, offset in WAL_PENDING.items():
+        if key[0]==fname:
+            pgs[key[1]] = read_spilled_pg(offset)
+    for key in DIRTY_PGS:
+        if key[0]==fname:
+            pgs[key[1]] = BUFFER_POOL[key]
+    return pgs
+
+def unwritten_pg(fname, pg_num):
+    key = (fname, pg_num)
+    if key in DIRTY_PGS:
+        return BUFFER_POOL[key]
+    if key in WAL_PENDING:
+        return read_spilled_pg(WAL_PENDING[key])
+    with WAL_LOCK:
+        offset = WAL_PGS.get(key)
+        if offset is None:
+            return None
+        return read_wal_pg(offset)
+
+def spill_pg(key, pg):
+    offset = WAL_PENDING.get(key)
+    if offset is None or STATEMENT['pgs'].get(key, (None, None))[1]==offset:
+        offset = SPILL['size']
+        SPILL['size'] += SIZE_OF_PAGE
+    if SPILL['file'] is None:
+        SPILL['file'] = tempfile.TemporaryFile()
+    SPILL['file'].seek(offset)
+    SPILL['file'].write(pg)
+    WAL_PENDING[key] = offset
+    return None
+
+def read_spilled_pg(offset):
+    SPILL['file'].seek(offset)
+    return SPILL['file'].read(SIZE_OF_PAGE)
+
+def clear_spill():
+    WAL_PENDING.clear()
+    if SPILL['size']!=0:
+        SPILL['file'].seek(0)
+        SPILL['file'].truncate()
+        SPILL['size'] = 0
+    return None
+
+def close_spill():
+    clear_spill()
+    if SPILL['file'] is not None:
+        SPILL['file'].close()
+        SPILL['file'] = None
+    return None
+
+def get_pg(fname, pg_num):
+    key = (fname, pg_num)
+    frame = BUFFER_POOL.get(key)
+    if frame is None:
+        BUFFER_STATS['misses']+=1
+        frame = read_pg_from_disk(fname, pg_num)
+        BUFFER_POOL[key] = frame
+        evict_pgs()
+    else:
+        BUFFER_STATS['hits']+=1
+        BUFFER_POOL.move_to_end(key)
+    return bytearray(frame)
+
+def evict_pgs():
+    capacity = max(1, BUFFER_POOL_BYTES//SIZE_OF_PAGE)
+    while len(BUFFER_POOL)>capacity:
+        key = next(iter(BUFFER_POOL))
+        if key in DIRTY_PGS:
+            spill_pg(key, BUFFER_POOL[key])
+            DIRTY_PGS.discard(key)
+        del BUFFER_POOL[key]
+        BUFFER_STATS['evictions']+=1
+    return None
+
 def save_pg(fname, pg_num, new_pg_data):
     assert(len(new_pg_data)==SIZE_OF_PAGE)
-    foffset = pg_num*SIZE_OF_PAGE
-    foffset_end = (pg_num+1)*SIZE_OF_PAGE
-    fbytes = load_file(fname)
-    fbytes = bytearray(fbytes)
-    fbytes[foffset:foffset_end] = new_pg_data
-    with open(fname, 'r+b') as f:
-        f.seek(0)
-        pg = f.write(fbytes)
+    key = (fname, pg_num)
+    log_pg_change(key)
+    BUFFER_POOL[key] = bytes(new_pg_data)
+    BUFFER_POOL.move_to_end(key)
+    DIRTY_PGS.add(key)
+    evict_pgs()
+    return None
+
+def pack_file_header(header):
+    values = [header[field] for field in FILE_HEADER_FIELDS]
+    raw = struct.pack(FILE_HEADER_FORMAT, FILE_MAGIC, *values)
+    return raw.ljust(FILE_HEADER_SIZE, b'\x00')
+
+def unpack_file_header(fname):
+    raw = WAL_HEADERS.get(fname)
+    if raw is None:
+        raw = pager_read(fname, 0, FILE_HEADER_SIZE)
+    values = struct.unpack_from(FILE_HEADER_FORMAT, raw)
+    if values[0]!=FILE_MAGIC:
+        raise ValueError("{} is not a DavisBase file".format(fname))
+    return dict(zip(FILE_HEADER_FIELDS, values[1:]))
+
+def read_file_header(fname):
+    header = FILE_HEADERS.get(fname)
+    if header is None:
+        header = unpack_file_header(fname)
+        if header['page_size']!=SIZE_OF_PAGE:
+            raise ValueError("{} uses {} byte pages but the database uses {}".format(fname, header['page_size'], SIZE_OF_PAGE))
+        FILE_HEADERS[fname] = header
+    return header
+
+def write_file_header(fname, header):
+    FILE_HEADERS[fname] = header
+    pager_write(fname, 0, pack_file_header(header))
+    DIRTY_HEADERS.discard(fname)
+    return None
+
+def update_file_header(fname, **fields):
+    log_header_change(fname)
+    read_file_header(fname).update(fields)
+    DIRTY_HEADERS.add(fname)
+    return None
+
+def flush_pgs():
+    headers = dict((fname, pack_file_header(FILE_HEADERS[fname])) for fname in DIRTY_HEADERS)
+    keys = sorted(set(WAL_PENDING) | DIRTY_PGS)
+    if len(headers)==0 and len(keys)==0:
+        return None
+    records = [wal_record(WAL_HEADER, fname, 0, raw) for fname, raw in headers.items()]
+    records_size = sum(len(record) for record in records)
+    chunk = {}
+    offsets = {}
+    with WAL_LOCK:
+        for key in keys:
+            if key in DIRTY_PGS:
+                pg = BUFFER_POOL[key]
+            else:
+                pg = read_spilled_pg(WAL_PENDING[key])
+            chunk[key] = records_size+WAL_RECORD_SIZE+len(key[0].encode('utf-8'))
+            records.append(wal_record(WAL_PAGE, key[0], key[1], pg))
+            records_size += len(records[-1])
+            if records_size>=WAL_APPEND_BYTES:
+                wal_offset = wal_append(b''.join(records))
+                offsets.update((key, wal_offset+offset) for key, offset in chunk.items())
+                chunk = {}
+                records = []
+                records_size = 0
+        records.append(wal_record(WAL_COMMIT, '', 0, b''))
+        wal_offset = wal_append(b''.join(records))
+        offsets.update((key, wal_offset+offset) for key, offset in chunk.items())
+        WAL_HEADERS.update(headers)
+        WAL_PGS.update(offsets)
+        lsn = WAL_STATE['lsn']
+    BUFFER_STATS['writes']+=len(keys)
+    clear_spill()
+    DIRTY_PGS.clear()
+    DIRTY_HEADERS.clear()
+    clear_statement_log()
+    start_wal_writer()
+    WAL_COMMITTED.set()
+    if not WAL_ASYNC_COMMIT and not ENGINE_LOCK.defer_sync(lsn):
+        wait_for_wal_sync(lsn)
+    return None
+
+def wait_for_wal_sync(lsn):
+    with WAL_SYNCED:
+        while WAL_STATE['synced_lsn']<lsn:
+            WAL_SYNCED.wait()
     return None
 
+def wal_record(kind, fname, pg_num, payload):
+    name = fname.encode('utf-8')
+    fields = struct.pack(endian+'BHiI', kind, len(name), pg_num, len(payload))
+    crc = zlib.crc32(fields+name+payload)
+    return struct.pack(WAL_RECORD_FORMAT, kind, len(name), pg_num, len(payload), crc)+name+payload
+
+def wal_append(data):
+    if WAL_STATE['fd'] is None:
+        WAL_STATE['path'] = os.path.abspath(WAL_FNAME)
+        WAL_STATE['fd'] = os.open(WAL_STATE['path'], os.O_RDWR | os.O_CREAT | os.O_APPEND | getattr(os, 'O_BINARY', 0), 0o644)
+        WAL_STATE['size'] = os.fstat(WAL_STATE['fd']).st_size
+    offset = WAL_STATE['size']
+    written = os.write(WAL_STATE['fd'], data)
+    assert(written==len(data))
+    WAL_STATE['size'] += written
+    WAL_STATE['lsn'] += written
+    WAL_STATE['unsynced'] = True
+    return offset
+
+def read_wal_pg(offset):
+    fd = WAL_STATE['fd']
+    if hasattr(os, 'pread'):
+        return os.pread(fd, SIZE_OF_PAGE, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, SIZE_OF_PAGE)
+
+def sync_wal():
+    with WAL_LOCK:
+        fd = WAL_STATE['fd']
+        unsynced = WAL_STATE['unsynced']
+        lsn = WAL_STATE['lsn']
+        WAL_STATE['unsynced'] = False
+    if unsynced:
+        os.fsync(fd)
+        BUFFER_STATS['syncs']+=1
+    with WAL_SYNCED:
+        WAL_STATE['synced_lsn'] = max(WAL_STATE['synced_lsn'], lsn)
+        WAL_SYNCED.notify_all()
+    return None
+
+def checkpoint_wal():
+    with WAL_LOCK:
+        if len(WAL_PGS)==0 and len(WAL_HEADERS)==0:
+            return None
+        sync_wal()
+        fnames = set(WAL_HEADERS)
+        for (fname, pg_num), offset in sorted(WAL_PGS.items()):
+            pager_write(fname, FILE_HEADER_SIZE+pg_num*SIZE_OF_PAGE, read_wal_pg(offset))
+            fnames.add(fname)
+        for fname, raw in WAL_HEADERS.items():
+            pager_write(fname, 0, raw)
+        for fname in fnames:
+            pager_sync(fname)
+        os.ftruncate(WAL_STATE['fd'], 0)
+        os.fsync(WAL_STATE['fd'])
+        WAL_STATE['size'] = 0
+        WAL_PGS.clear()
+        WAL_HEADERS.clear()
+        BUFFER_STATS['checkpoints']+=1
+    return None
+
+def wal_writer():
+    while not WAL_STOP.is_set():
+        WAL_COMMITTED.wait()
+        if WAL_GROUP_COMMIT_DELAY:
+            WAL_STOP.wait(WAL_GROUP_COMMIT_DELAY)
+        WAL_COMMITTED.clear()
+        sync_wal()
+        if WAL_STATE['size']>=WAL_CHECKPOINT_BYTES:
+            checkpoint_wal()
+    return None
+
+def start_wal_writer():
+    if WAL_STATE['writer'] is None:
+        WAL_STOP.clear()
+        WAL_STATE['writer'] = threading.Thread(target=wal_writer, name='davisbase-wal')
+        WAL_STATE['writer'].daemon = True
+        WAL_STATE['writer'].start()
+    return None
+
+def stop_wal_writer():
+    writer = WAL_STATE['writer']
+    if writer is not None:
+        WAL_STOP.set()
+        WAL_COMMITTED.set()
+        writer.join()
+        WAL_STATE['writer'] = None
+        WAL_COMMITTED.clear()
+    if WAL_STATE['fd'] is not None:
+        sync_wal()
+    return None
+
+def close_wal():
+    stop_wal_writer()
+    checkpoint_wal()
+    if WAL_STATE['fd'] is not None:
+        os.close(WAL_STATE['fd'])
+        WAL_STATE['fd'] = None
+        os.remove(WAL_STATE['path'])
+    return None
+
+def replay_wal():
+    if not os.path.exists(WAL_FNAME):
+        return None
+    with open(WAL_FNAME, 'rb') as f:
+        log = f.read()
+    offset = 0
+    batch = []
+    fnames = set()
+    while offset+WAL_RECORD_SIZE<=len(log):
+        kind, name_size, pg_num, payload_size, crc = struct.unpack_from(WAL_RECORD_FORMAT, log, offset)
+        body = log[offset+WAL_RECORD_SIZE:offset+WAL_RECORD_SIZE+name_size+payload_size]
+        fields = struct.pack(endian+'BHiI', kind, name_size, pg_num, payload_size)
+        if len(body)!=name_size+payload_size or zlib.crc32(fields+body)!=crc:
+            break
+        offset += WAL_RECORD_SIZE+name_size+payload_size
+        if kind!=WAL_COMMIT:
+            batch.append((kind, body[:name_size].decode('utf-8'), pg_num, body[name_size:]))
+            continue
+        for kind, fname, pg_num, payload in batch:
+            if not os.path.exists(fname):
+                continue
+            if kind==WAL_HEADER:
+                pager_write(fname, 0, payload)
+            else:
+                pager_write(fname, FILE_HEADER_SIZE+pg_num*len(payload), payload)
+            fnames.add(fname)
+        batch = []
+    for fname in fnames:
+        pager_sync(fname)
+    pager_close()
+    os.remove(WAL_FNAME)
+    return None
+
+def discard_pgs(fname):
+    FILE_HEADERS.pop(fname, None)
+    DIRTY_HEADERS.discard(fname)
+    for key in [key for key in BUFFER_POOL if key[0]==fname]:
+        del BUFFER_POOL[key]
+        DIRTY_PGS.discard(key)
+    return None
 
-def pg_available_bytes(fbytes, pg_num):
-    pg = load_pg(fbytes, pg_num)
+def count_pgs(fname):
+    return (pager_file_size(fname)-FILE_HEADER_SIZE)//SIZE_OF_PAGE
+
+def pg_available_bytes(pg):
     number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
     bytes_from_top = 16+(2*number_tuples)
-    cell_content_start =struct.unpack(endian+'h', pg[4:6])[0]
+    cell_content_start =get_pg_offset(pg, 4)
     return  cell_content_start - bytes_from_top
 
 
@@ -414,41 +1102,41 @@ def shift_pg_content(pg, top_ind, bot_ind, steps_to_shift, up=True):
         return pg
 
 def update_array_values(pg, first_array_loc_to_change, number_tuples, steps_to_shift, up=True):
-    if steps_to_shift==0:
+    if steps_to_shift==0 or first_array_loc_to_change>=number_tuples:
         return pg
     if up:
-        for i in range(first_array_loc_to_change, number_tuples):
-            top_of_array = 16+2*i
-            bot_of_array = 16+2*(i+1)
-            prev_val = struct.unpack(endian+'h',pg[top_of_array:bot_of_array])[0]
-            pg[top_of_array:bot_of_array]=struct.pack(endian+'h', prev_val-steps_to_shift)
-    else:
-        for i in range(first_array_loc_to_change, number_tuples):
-            top_of_array = 16+2*i
-            bot_of_array = 16+2*(i+1)
-            prev_val = struct.unpack(endian+'h',pg[top_of_array:bot_of_array])[0]
-            pg[top_of_array:bot_of_array]=struct.pack(endian+'h', prev_val+steps_to_shift)
+        steps_to_shift = -steps_to_shift
+    array_format = endian+'{}H'.format(number_tuples-first_array_loc_to_change)
+    offsets = struct.unpack_from(array_format, pg, 16+2*first_array_loc_to_change)
+    struct.pack_into(array_format, pg, 16+2*first_array_loc_to_change, *[((offset or MAX_PAGE_SIZE)+steps_to_shift)%MAX_PAGE_SIZE for offset in offsets])
     return pg
 
 
+def get_pg_offset(pg, idx):
+    offset = struct.unpack(endian+'H', pg[idx:idx+2])[0]
+    if offset==0:
+        return MAX_PAGE_SIZE
+    return offset
+
+def set_pg_offset(pg, idx, offset):
+    pg[idx:idx+2] = struct.pack(endian+'H', offset%MAX_PAGE_SIZE)
+
 def get_tuple_indices(pg, cell_ind):
-    cell_top_idx = struct.unpack(endian+'h',pg[16+2*cell_ind:16+2*(cell_ind+1)])[0]
+    cell_top_idx = get_pg_offset(pg, 16+2*cell_ind)
     if cell_ind==0:
         cell_bot_idx = SIZE_OF_PAGE
     else:
-        cell_bot_idx = struct.unpack(endian+'h',pg[16+2*(cell_ind-1):16+2*(cell_ind)])[0]
+        cell_bot_idx = get_pg_offset(pg, 16+2*(cell_ind-1))
     return cell_top_idx, cell_bot_idx
 
 def pg_delete_tuple(fname, pg_num, cell_ind):
-    fbytes = load_file(fname)
-    pg = load_pg(fbytes, pg_num)
-    pg = bytearray(pg)
+    pg = get_pg(fname, pg_num)
     number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
     assert(cell_ind<=number_tuples-1)
     assert(number_tuples>=1)
     assert(cell_ind>=0)
 
-    cell_content_area_start = struct.unpack(endian+'h', pg[4:6])[0]
+    cell_content_area_start = get_pg_offset(pg, 4)
     array_end = 16+2*number_tuples
     array_idx_top = 16+2*cell_ind
     array_idx_bot = 16+2*(cell_ind+1)
@@ -459,7 +1147,7 @@ def pg_delete_tuple(fname, pg_num, cell_ind):
         cell_2_delete = pg[cell_top_loc:cell_bot_loc]
         dis2replace= len(cell_2_delete)
         pg[cell_top_loc:cell_bot_loc]=b'\x00'*dis2replace
-        pg[4:6] = struct.pack(endian+'h', cell_content_area_start+dis2replace)
+        set_pg_offset(pg, 4, cell_content_area_start+dis2replace)
         pg[16+2*(number_tuples-1):16+2*(number_tuples)]=b'\x00'*2
         pg[2:4] = struct.pack(endian+'h', number_tuples-1)
     else:
@@ -468,7 +1156,7 @@ def pg_delete_tuple(fname, pg_num, cell_ind):
         dis2replace= len(cell_2_delete)
         pg = shift_pg_content(pg, cell_content_area_start, cell_top_loc, dis2replace, up=False)
         pg = update_array_values(pg, cell_ind, number_tuples, dis2replace, up=False)
-        pg[4:6] = struct.pack(endian+'h', cell_content_area_start+dis2replace)
+        set_pg_offset(pg, 4, cell_content_area_start+dis2replace)
         pg = shift_pg_content(pg, array_idx_bot, array_end, 2, up=True)
         pg[2:4] = struct.pack(endian+'h', number_tuples-1)
     save_pg(fname, pg_num, pg)
@@ -477,20 +1165,18 @@ def pg_delete_tuple(fname, pg_num, cell_ind):
 
 
 def pg_update_tuple(fname, pg_num, cell_ind, tuple):
-    fbytes = load_file(fname)
-    pg = load_pg(fbytes, pg_num)
-    pg = bytearray(pg)
+    pg = get_pg(fname, pg_num)
 
     number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
     assert(cell_ind<=number_tuples-1)
     assert(number_tuples!=0)
     assert(cell_ind>=0)
 
-    cell_content_area_start = struct.unpack(endian+'h', pg[4:6])[0]
+    cell_content_area_start = get_pg_offset(pg, 4)
     array_end = 16+2*number_tuples
     array_idx_top = 16+2*cell_ind
     array_idx_bot = 16+2*(cell_ind+1)
-    available_bytes = pg_available_bytes(fbytes, pg_num)
+    available_bytes = pg_available_bytes(pg)
     cell_top_idx, cell_bot_idx = get_tuple_indices(pg, cell_ind)
     cell_2_update = pg[cell_top_idx:cell_bot_idx]
     if len(cell_2_update)==len(tuple):
@@ -500,13 +1186,13 @@ def pg_update_tuple(fname, pg_num, cell_ind, tuple):
         assert(dis2move<=available_bytes)
         pg = shift_pg_content(pg, cell_content_area_start, cell_top_idx, dis2move, up=True)
         pg = update_array_values(pg, cell_ind, number_tuples, dis2move, up=True)
-        pg[4:6] = struct.pack(endian+'h', cell_content_area_start-dis2move)
+        set_pg_offset(pg, 4, cell_content_area_start-dis2move)
         pg[cell_top_idx-dis2move:cell_bot_idx] = tuple
     else:
         dis2move =  len(cell_2_update) - len(tuple)
         pg = shift_pg_content(pg, cell_content_area_start, cell_top_idx, dis2move, up=False)
         pg = update_array_values(pg, cell_ind, number_tuples, dis2move, up=True)
-        pg[4:6] = struct.pack(endian+'h', cell_content_area_start+dis2move)
+        set_pg_offset(pg, 4, cell_content_area_start+dis2move)
         pg[cell_top_idx+dis2move:cell_bot_idx] = tuple
     save_pg(fname, pg_num, pg)
     assert(len(pg)==SIZE_OF_PAGE)
@@ -516,11 +1202,9 @@ def update_pg_header(fname, pg_num, right_sib_right_child=None, is_interior=None
     is_tab = fname[-4:]=='.tbl'
     is_index=not is_tab
     is_leaf = not is_interior
-    fbytes = load_file(fname)
-    pg = load_pg(fbytes, pg_num)
-    pg = bytearray(pg)
+    pg = get_pg(fname, pg_num)
     if right_sib_right_child is not None:
-        assert(len(fbytes)/SIZE_OF_PAGE>=right_sib_right_child)
+        assert(count_pgs(fname)>=right_sib_right_child)
         pg[6:10] = struct.pack(endian+'i', right_sib_right_child)
     if is_interior is not None:
         if pg[0] in [5,13]:
@@ -541,9 +1225,7 @@ def update_pg_header(fname, pg_num, right_sib_right_child=None, is_interior=None
     return None
 
 def update_tuple_leftpointer(fname, pg_num, cell_ind, lpointer=None, rowid=None):
-    fbytes = load_file(fname)
-    pg = load_pg(fbytes, pg_num)
-    pg = bytearray(pg)
+    pg = get_pg(fname, pg_num)
     cell_top_idx, cell_bot_idx = get_tuple_indices(pg, cell_ind)
     if lpointer!=None:
         pg[cell_top_idx:cell_top_idx+4] = struct.pack(endian+'i', lpointer)
@@ -554,8 +1236,117 @@ def update_tuple_leftpointer(fname, pg_num, cell_ind, lpointer=None, rowid=None)
 
 
 def load_file(fname):
-    with open(fname, 'rb') as f:
-        return f.read()
+    fbytes = pager_read(fname, FILE_HEADER_SIZE, pager_file_size(fname)-FILE_HEADER_SIZE)
+    unwritten = unwritten_pgs(fname)
+    if len(unwritten)==0:
+        return fbytes
+    fbytes = bytearray(fbytes)
+    for pg_num, pg in unwritten.items():
+        fbytes[pg_num*SIZE_OF_PAGE:(pg_num+1)*SIZE_OF_PAGE] = pg
+    return bytes(fbytes)
+
+def mmap_file(fname):
+    size = pager_file_size(fname)
+    mapped = MMAPS.get(fname)
+    if mapped is None or len(mapped)!=size:
+        unmap_file(fname)
+        mapped = mmap.mmap(pager_fd(fname), size, access=mmap.ACCESS_READ)
+        MMAPS[fname] = mapped
+    return memoryview(mapped)
+
+def unmap_file(fname):
+    maps = RETIRED_MMAPS.pop(fname, [])
+    if fname in MMAPS:
+        maps.append(MMAPS.pop(fname))
+    for mapped in maps:
+        try:
+            mapped.close()
+        except BufferError:
+            RETIRED_MMAPS.setdefault(fname, []).append(mapped)
+    return fname not in RETIRED_MMAPS
+
+def materialize_cursors():
+    for cursor in list(CURSORS):
+        cursor.rows = iter(list(cursor.rows))
+    return None
+
+def mmap_scan_tuples(fname):
+    for cell in mmap_scan_cells(fname):
+        yield tab_read_tuple(cell, False)
+
+def mmap_scan_cells(fname):
+    for pg in mmap_scan_leaf_pgs(fname):
+        number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
+        for cell_ind in range(number_tuples):
+            cell_top_loc, cell_bot_loc = get_tuple_indices(pg, cell_ind)
+            yield pg[cell_top_loc:cell_bot_loc]
+
+def mmap_scan_leaf_pgs(fname):
+    view = mmap_file(fname)[FILE_HEADER_SIZE:]
+    num_pgs = len(view)//SIZE_OF_PAGE
+    pg_num = 0
+    while 0<=pg_num<num_pgs:
+        pg = unwritten_pg(fname, pg_num)
+        if pg is not None:
+            pg = memoryview(pg)
+        else:
+            pg = view[pg_num*SIZE_OF_PAGE:(pg_num+1)*SIZE_OF_PAGE]
+        if pg[0]==13:
+            yield pg
+            pg_num = struct.unpack(endian+'i', pg[6:10])[0]
+            if pg_num<=0:
+                break
+        elif pg[0]==5:
+            if struct.unpack(endian+'h', pg[2:4])[0]==0:
+                pg_num = struct.unpack(endian+'i', pg[6:10])[0]
+            else:
+                pg_num = pg_tuple_left_child(pg, 0)
+        else:
+            break
+
+def batch_scan_cells(fname, col, datatype1, oper, operand):
+    operator_fn = get_operator_fn(oper)
+    dtype = np.dtype(BATCH_DTYPES[datatype1])
+    batch_operand = operand
+    if datatype1 in [10,11]:
+        batch_operand = int(round(operand.timestamp() * 1000))
+    field_bytes = np.arange(dtype.itemsize)
+    for pg in mmap_scan_leaf_pgs(fname):
+        number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
+        if number_tuples<BATCH_MIN_ROWS:
+            for cell_ind in range(number_tuples):
+                cell_top_loc, cell_bot_loc = get_tuple_indices(pg, cell_ind)
+                cell = pg[cell_top_loc:cell_bot_loc]
+                value = tab_cell_column(cell, col)
+                if value is not None and operator_fn(value, operand):
+                    yield cell
+            continue
+        pg_bytes = np.frombuffer(pg, np.uint8)
+        cell_tops = np.frombuffer(pg, endian+'u2', number_tuples, 16).astype(np.int64)
+        num_columns = pg[cell_tops[0]+6]
+        headers = pg_bytes[(cell_tops+7)[:,None]+np.arange(num_columns)]
+        if (headers==headers[0]).all():
+            header_ids = np.zeros(number_tuples, np.int64)
+            headers = headers[:1]
+        else:
+            headers, header_ids = np.unique(headers, axis=0, return_inverse=True)
+        field_offsets = np.full(len(headers), -1, np.int64)
+        for i, header in enumerate(headers):
+            field = record_codec(header.tobytes())['fields'][col]
+            if field is not None:
+                field_offsets[i] = 7+num_columns+field[1]
+        field_offsets = field_offsets[header_ids]
+        present = np.flatnonzero(field_offsets>=0)
+        if len(present)==0:
+            continue
+        values = pg_bytes[(cell_tops[present]+field_offsets[present])[:,None]+field_bytes].view(dtype).ravel()
+        if datatype1==5:
+            values = values.astype(np.float64)
+        elif datatype1==8:
+            values = values.astype(np.int64)+2000
+        for cell_ind in present[operator_fn(values, batch_operand)]:
+            cell_top_loc, cell_bot_loc = get_tuple_indices(pg, cell_ind)
+            yield pg[cell_top_loc:cell_bot_loc]
 
 def load_pg(fbytes, pg_num):
     foffset = pg_num*SIZE_OF_PAGE
@@ -563,10 +1354,15 @@ def load_pg(fbytes, pg_num):
 
 def read_tuples_in_pg(fbytes, pg_num):
     assert(pg_num<(len(fbytes)/SIZE_OF_PAGE))
-    pg = load_pg(fbytes, pg_num)
+    return pg_to_dict(load_pg(fbytes, pg_num), pg_num)
+
+def load_tuples_in_pg(fname, pg_num):
+    return pg_to_dict(get_pg(fname, pg_num), pg_num)
+
+def pg_to_dict(pg, pg_num):
     number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
     parent_pg = struct.unpack(endian+'i', pg[10:14])[0]
-    available_bytes = pg_available_bytes(fbytes, pg_num)
+    available_bytes = pg_available_bytes(pg)
     if pg[0] in [5,13]:
         is_tab = True
     else:
@@ -583,8 +1379,8 @@ def read_tuples_in_pg(fbytes, pg_num):
         if i == 0:
             cell_bot_loc = SIZE_OF_PAGE
         else:
-            cell_bot_loc = struct.unpack(endian+'h',pg[16+2*(i-1):16+2*(i)])[0]
-        cell_top_loc = struct.unpack(endian+'h',pg[16+2*i:16+2*(i+1)])[0]
+            cell_bot_loc = get_pg_offset(pg, 16+2*(i-1))
+        cell_top_loc = get_pg_offset(pg, 16+2*i)
         tuple = pg[cell_top_loc:cell_bot_loc]
         if is_tab:
             data.append(tab_read_tuple(tuple, is_interior))
@@ -647,60 +1443,67 @@ def read_all_pgs_in_file(fname):
 
 
 def get_indexes(tab_name):
-    indexes=[]
-    for filename in os.listdir():
-        if (filename[:len(tab_name)]==tab_name) and (filename[-4:]=='.ndx'):
-            indexes.append(filename)
-    return indexes
+    entry = get_catalog(tab_name)
+    if entry['indexes'] is None:
+        indexes=[]
+        for col in entry['col_names'][1:]:
+            if os.path.exists(tab_name+'_'+col+'.ndx'):
+                indexes.append(tab_name+'_'+col+'.ndx')
+        entry['indexes'] = indexes
+    return list(entry['indexes'])
 
 
 def get_next_pg_rowid(tab_name):
-    pgs = read_all_pgs_in_file(tab_name+'.tbl')
-    final_pg_num = 0
-    while not pgs[final_pg_num]['is_leaf']:
-        final_pg_num = pgs[final_pg_num]['rightmost_child_pg']
-
-    final_pg = pgs[final_pg_num]
-    if len(pgs[0]['cells'])==0:
-        next_rowid=0
-    else:
-        rowid_sorted_tuples = sorted(final_pg['cells'], key=lambda x: x['rowid'])
-        next_rowid = rowid_sorted_tuples[-1]['rowid']
-    return final_pg['pg_number'], next_rowid + 1
-
+    header = read_file_header(tab_name+'.tbl')
+    return header['rightmost_leaf'], header['max_rowid'] + 1
 
 def get_col_names_from_catalog(tab_name):
-    schema, catalog_tuples = catalog_schema(tab_name, with_rowid=True)
-    col_names = []
-    for tuple in catalog_tuples:
-        col_names.append((tuple['data'][3],tuple['data'][1]))
-    col_names = sorted(col_names, key=lambda x: x[0])
-    return  [i[1] for i in col_names]
+    return list(get_catalog(tab_name)['col_names'])
 
 
 def catalog_schema(tab_name, with_rowid=False):
-    data = read_all_pgs_in_file('davisbase_columns.tbl')
-    all_tuples = []
-    all_data = []
-    for pg in data:
-        if not pg['is_leaf']:
-            continue
-        for tuple in pg['cells']:
+    entry = get_catalog(tab_name)
+    if with_rowid:
+        return list(entry['schema_with_rowid']), list(entry['rows'])
+    all_data = [row for row in entry['rows'] if row['data'][1].lower()!='rowid']
+    return list(entry['schema']), all_data
+
+def bump_catalog_version():
+    global CATALOG_VERSION
+    CATALOG_VERSION+=1
+    return CATALOG_VERSION
+
+def get_catalog(tab_name):
+    global CATALOG_CACHE
+    if CATALOG_CACHE['version']!=CATALOG_VERSION:
+        tabs = {}
+        for tuple in mmap_scan_tuples('davisbase_columns.tbl'):
             col_tab = tuple['data'][0].lower()
-            if col_tab==tab_name.lower():
-                col_name = tuple['data'][1].lower()
-                if col_name=='rowid' and not with_rowid:
-                    continue
-                all_tuples.append((tuple['data'][3],tuple['data'][2]))
-                all_data.append(tuple)
-    all_tuples = sorted(all_tuples, key=lambda x: x[0])
-    schema = [i[1] for i in all_tuples]
-    return schema, all_data
+            tabs.setdefault(col_tab, []).append({'rowid':tuple['rowid'], 'data':tuple['data']})
+        CATALOG_CACHE = {'version':CATALOG_VERSION, 'tables':{}}
+        for col_tab, rows in tabs.items():
+            CATALOG_CACHE['tables'][col_tab] = catalog_entry(rows)
+    entry = CATALOG_CACHE['tables'].get(tab_name.lower())
+    if entry is None:
+        entry = catalog_entry([])
+    return entry
+
+def catalog_entry(rows):
+    columns = sorted(rows, key=lambda x: x['data'][3])
+    col_names = [row['data'][1] for row in columns]
+    entry = {
+    'rows':rows,
+    'col_names':col_names,
+    'schema_with_rowid':[row['data'][2] for row in columns],
+    'schema':[row['data'][2] for row in columns if row['data'][1].lower()!='rowid'],
+    'ordinal_positions':dict((col, i+1) for i, col in enumerate(col_names)),
+    'constraints':dict((row['data'][1], {'is_nullable':row['data'][4], 'unique':row['data'][5], 'primary_key':row['data'][6]}) for row in columns),
+    'indexes':None
+    }
+    return entry
 
 def index_insert_tuple_in_pg(fname, pg_num, tuple, cell_ind):
-    fbytes = load_file(fname)
-    pg = load_pg(fbytes, pg_num)
-    pg = bytearray(pg)
+    pg = get_pg(fname, pg_num)
 
     number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
     if cell_ind == number_tuples:
@@ -709,8 +1512,8 @@ def index_insert_tuple_in_pg(fname, pg_num, tuple, cell_ind):
 
     assert(cell_ind<=number_tuples-1)
     assert(cell_ind>=0)
-    assert(len(tuple)<pg_available_bytes(fbytes, pg_num))
-    cell_content_area_start = struct.unpack(endian+'h', pg[4:6])[0]
+    assert(len(tuple)<pg_available_bytes(pg))
+    cell_content_area_start = get_pg_offset(pg, 4)
     array_end = 16+2*number_tuples
     array_idx_top = 16+2*cell_ind
     array_idx_bot = 16+2*(cell_ind+1)
@@ -719,9 +1522,9 @@ def index_insert_tuple_in_pg(fname, pg_num, tuple, cell_ind):
     dis2move= len(tuple)
     pg = shift_pg_content(pg, cell_content_area_start, cell_bot_loc, dis2move, up=True)
     pg = update_array_values(pg, cell_ind, number_tuples, dis2move, up=True)
-    pg[4:6] = struct.pack(endian+'h', cell_content_area_start-dis2move)
+    set_pg_offset(pg, 4, cell_content_area_start-dis2move)
     pg = shift_pg_content(pg, array_idx_top, array_end, 2, up=False)
-    pg[array_idx_top:array_idx_bot] = struct.pack(endian+'h', cell_bot_loc-dis2move)
+    set_pg_offset(pg, array_idx_top, cell_bot_loc-dis2move)
     pg[cell_bot_loc-dis2move:cell_bot_loc] = tuple
     pg[2:4] = struct.pack(endian+'h', number_tuples+1)
     assert(len(pg)==SIZE_OF_PAGE)
@@ -730,7 +1533,7 @@ def index_insert_tuple_in_pg(fname, pg_num, tuple, cell_ind):
 
 
 def print_it(fname, pg_format=False, limit=None, pgs=None):
-    if pgs ==None:
+    if pgs ==None and pg_format:
         pgs  =read_all_pgs_in_file(fname)
     print(fname[:-4].upper())
     if pg_format:
@@ -765,17 +1568,10 @@ def print_it(fname, pg_format=False, limit=None, pgs=None):
                         rowids.append(tuple['index_value'])
                 print(rowids)
     else:
-        rows = []
-        for pg in pgs:
-            if not pg["is_leaf"]:
-                continue
-            else:
-                for tuple in pg["cells"]:
-                    if fname[-4:]=='.tbl':
-                        rows.append([tuple['rowid']]+tuple['data'])
-                    else:
-                        rows.append([tuple['index_value'],tuple['assoc_rowids']])
-        rows = sorted(rows, key=lambda x: x[0])
+        if fname[-4:]=='.tbl':
+            rows = ([tuple['rowid']]+tuple['data'] for tuple in mmap_scan_tuples(fname))
+        else:
+            rows = ([tuple['index_value'],tuple['assoc_rowids']] for tuple in index_range_tuples(fname))
         i=1
         for row in rows:
             if limit!=None and i>limit:
@@ -784,113 +1580,279 @@ def print_it(fname, pg_format=False, limit=None, pgs=None):
             i+=1
 
 def add_rowid_to_tuple(fname, pg_num, cell_ind, rowid, tuple):
-    cell_binary = tuple['cell_binary']+struct.pack(endian+'i', rowid)
-    try:
-        pg_update_tuple(fname, pg_num, cell_ind, cell_binary)
-    except:
-        return
+    cell_binary = bytearray(tuple['cell_binary']+struct.pack(endian+'i', rowid))
+    cell_binary[0:2] = struct.pack(endian+'H', len(cell_binary)-2)
+    cell_binary[2] = len(tuple['assoc_rowids'])+1
+    pg_update_tuple(fname, pg_num, cell_ind, cell_binary)
 
 def get_all_tab_tuples(tab_name):
-    pgs  =read_all_pgs_in_file(tab_name+'.tbl')
-    cells = []
-    for pg in pgs:
-        if not pg["is_leaf"]:
-            continue
-        else:
-            for tuple in pg["cells"]:
-                cells.append(tuple)
-    return cells
+    return mmap_scan_tuples(tab_name+'.tbl')
 
-def create_tab(cmd_input):
-    col_catalog_dictionary = parse_create_tab(cmd_input)
-    tab_name = list(col_catalog_dictionary.keys())[0]
-    tab_name= tab_name.lower()
+def create_tab(stmt):
+    col_catalog_dictionary = create_tab_catalog_dictionary(stmt)
+    tab_name = stmt['table']
     if os.path.exists(tab_name+'.tbl'):
-        print("Table {} already exists.".format(tab_name))
-        return None
+        raise OperationalError("Table {} already exists.".format(tab_name))
     init_file(tab_name, True)
     catalog_add_tab(col_catalog_dictionary)
     init_indexes(col_catalog_dictionary)
+    bump_catalog_version()
     return None
 
-def create_index(cmd_input):
-    tab_name, column_name = parse_create_index(cmd_input)
-    index_name = tab_name+'_'+column_name
-    init_file(index_name, False)
+def create_index(stmt):
+    tab_name, column_name = stmt['table'], stmt['column']
+    if not os.path.exists(tab_name+'.tbl'):
+        raise OperationalError("Table {} does not exist.".format(tab_name))
+    if column_name not in get_col_names_from_catalog(tab_name)[1:]:
+        raise OperationalError("Column {} does not exist in table {}.".format(column_name, tab_name))
+    bulk_build_index(tab_name, column_name)
+    bump_catalog_version()
+    return None
+
+def bulk_build_index(tab_name, column_name, fill_factor=None):
+    if fill_factor is None:
+        fill_factor = INDEX_FILL_FACTOR
     columns = get_col_names_from_catalog(tab_name)[1:]
     schema, _ = catalog_schema(tab_name)
     ord_position =  columns.index(column_name)
     index_datatype = schema[ord_position]
-    cells = get_all_tab_tuples(tab_name)
-    for tuple in cells:
-        rowid = tuple['rowid']
-        index_value = tuple['data'][ord_position]
-        index_insert(tab_name, column_name, index_datatype, index_value, rowid)
-
-def insert_into(cmd_input):
-    tab_name, values = parse_insert_into(cmd_input)
-    tab_name = tab_name.lower()
-    violation_flag = False
-    if violation_flag:
-        print("Constraint violated for row {}".format(violating_row))
-        return None
+    entries = ((tab_cell_columns(cell, [ord_position])[0], tab_cell_rowid(cell)) for cell in mmap_scan_cells(tab_name+'.tbl'))
+    entries = (entry for entry in entries if entry[0] is not None)
+    cells = index_posting_cells(external_sort(entries), index_datatype)
+    write_index_bottom_up(tab_name+'_'+column_name, cells, fill_factor)
+
+def external_sort(items, key=None, max_items=None):
+    if max_items is None:
+        max_items = SORT_BUFFER_ITEMS
+    runs = []
+    buffer = []
+    for item in items:
+        buffer.append(item)
+        if len(buffer)>=max_items:
+            buffer.sort(key=key)
+            runs.append(spill_sorted_run(buffer))
+            buffer = []
+    buffer.sort(key=key)
+    if len(runs)==0:
+        return iter(buffer)
+    return heapq.merge(*([read_sorted_run(run) for run in runs]+[iter(buffer)]), key=key)
+
+def spill_sorted_run(items):
+    run = tempfile.TemporaryFile()
+    for i in range(0, len(items), SORT_RUN_CHUNK):
+        pickle.dump(items[i:i+SORT_RUN_CHUNK], run, pickle.HIGHEST_PROTOCOL)
+    run.seek(0)
+    return run
+
+def read_sorted_run(run):
+    try:
+        while True:
+            try:
+                chunk = pickle.load(run)
+            except EOFError:
+                return
+            for item in chunk:
+                yield item
+    finally:
+        run.close()
+
+def index_max_cell_size():
+    return (SIZE_OF_PAGE-16)//4-2
+
+def index_posting_cells(entries, index_datatype):
+    max_cell_size = index_max_cell_size()
+    for index_value, group in itertools.groupby(entries, key=lambda entry: entry[0]):
+        base_size = len(index_create_tuple(index_datatype, index_value, [], False))
+        max_rowids = max(1, min(255, (max_cell_size-base_size)//4))
+        rowids = []
+        for _, rowid in group:
+            rowids.append(rowid)
+            if len(rowids)==max_rowids:
+                yield index_create_tuple(index_datatype, index_value, rowids, False)
+                rowids = []
+        if len(rowids)!=0:
+            yield index_create_tuple(index_datatype, index_value, rowids, False)
+
+def pack_index_level(num_children, separators, budget):
+    nodes = []
+    promoted = []
+    node_children = [0]
+    node_separators = []
+    used = 0
+    for i in range(num_children-1):
+        cost = len(separators[i])+6
+        if len(node_separators)!=0 and used+cost>budget and i<=num_children-3:
+            nodes.append((node_children, node_separators))
+            promoted.append(separators[i])
+            node_children = [i+1]
+            node_separators = []
+            used = 0
+            continue
+        node_children.append(i+1)
+        node_separators.append(separators[i])
+        used += cost
+    nodes.append((node_children, node_separators))
+    return nodes, promoted
+
+def new_pg_bytes(pg_type, cells, right_sib_right_child, parent):
+    pg = bytearray(SIZE_OF_PAGE)
+    pg[0] = pg_type
+    content_start = SIZE_OF_PAGE
+    for i, cell in enumerate(cells):
+        content_start -= len(cell)
+        pg[content_start:content_start+len(cell)] = cell
+        set_pg_offset(pg, 16+2*i, content_start)
+    assert(16+2*len(cells)<=content_start)
+    pg[2:4] = struct.pack(endian+'h', len(cells))
+    set_pg_offset(pg, 4, content_start)
+    pg[6:14] = struct.pack(endian+'ii', right_sib_right_child, parent)
+    return pg
+
+def write_index_bottom_up(index_name, cells, fill_factor):
+    fname = index_name+'.ndx'
+    tmp_fname = fname+'.tmp'
+    usable = SIZE_OF_PAGE-16
+    leaf_budget = int(usable*min(1.0, max(0.5, fill_factor)))
+    interior_budget = min(leaf_budget, usable-(usable//4+6))
+    spool = tempfile.TemporaryFile()
+    leaf_sizes = []
+    separators = []
+    leaf_cells = []
+    used = 0
+    cells = iter(cells)
+    cell = next(cells, None)
+    while cell is not None:
+        next_cell = next(cells, None)
+        cost = len(cell)+2
+        if len(leaf_cells)!=0 and used+cost>leaf_budget:
+            if next_cell is None:
+                separators.append(leaf_cells.pop())
+            else:
+                separators.append(cell)
+            leaf_sizes.append(len(leaf_cells))
+            spool.write(b''.join(struct.pack(endian+'H', len(leaf_cell))+leaf_cell for leaf_cell in leaf_cells))
+            leaf_cells = []
+            used = 0
+            if next_cell is not None:
+                cell = next_cell
+                continue
+        leaf_cells.append(cell)
+        used += cost
+        cell = next_cell
+    leaf_sizes.append(len(leaf_cells))
+    spool.write(b''.join(struct.pack(endian+'H', len(leaf_cell))+leaf_cell for leaf_cell in leaf_cells))
+
+    levels = []
+    num_children = len(leaf_sizes)
+    while num_children>1:
+        nodes, separators = pack_index_level(num_children, separators, interior_budget)
+        levels.append(nodes)
+        num_children = len(nodes)
+    levels.reverse()
+    first_pg = []
+    pg_num = 0
+    for nodes in levels:
+        first_pg.append(pg_num)
+        pg_num += len(nodes)
+    first_leaf = pg_num
+    first_pg.append(first_leaf)
+
+    if STATEMENT['active']:
+        STATEMENT['new_files'].append(tmp_fname)
+    with open(tmp_fname, 'wb') as f:
+        f.write(pack_file_header({'max_rowid':0, 'rightmost_leaf':0, 'page_size':SIZE_OF_PAGE, 'free_pg_head':0, 'free_pg_count':0}))
+    parents = [-1]
+    for depth, nodes in enumerate(levels):
+        child_parents = []
+        for node_ind, (node_children, node_separators) in enumerate(nodes):
+            child_pgs = [first_pg[depth+1]+child for child in node_children]
+            child_parents.extend([first_pg[depth]+node_ind]*len(child_pgs))
+            interior_cells = [struct.pack(endian+'I', child_pg)+separator for child_pg, separator in zip(child_pgs, node_separators)]
+            pg = new_pg_bytes(0x02, interior_cells, child_pgs[-1], parents[node_ind])
+            pager_write(tmp_fname, FILE_HEADER_SIZE+(first_pg[depth]+node_ind)*SIZE_OF_PAGE, pg)
+        parents = child_parents
+    spool.seek(0)
+    for leaf_ind, num_cells in enumerate(leaf_sizes):
+        leaf_cells = []
+        for i in range(num_cells):
+            cell_size = struct.unpack(endian+'H', spool.read(2))[0]
+            leaf_cells.append(spool.read(cell_size))
+        right_sib = first_leaf+leaf_ind+1 if leaf_ind<len(leaf_sizes)-1 else -1
+        pg = new_pg_bytes(0x0a, leaf_cells, right_sib, parents[leaf_ind])
+        pager_write(tmp_fname, FILE_HEADER_SIZE+(first_leaf+leaf_ind)*SIZE_OF_PAGE, pg)
+    spool.close()
+    pager_sync(tmp_fname)
+    pager_close(tmp_fname)
+    if os.path.exists(fname):
+        remove_file(fname)
+    os.replace(tmp_fname, fname)
+    if STATEMENT['active']:
+        STATEMENT['new_files'].append(fname)
+    return None
+
+def insert_rows(tab_name, values):
     schema, all_col_data = catalog_schema(tab_name)
     col_names = get_col_names_from_catalog(tab_name)[1:]
     indexes = get_indexes(tab_name)
+    next_rowid = None
     for val in values:
-        next_pg, next_rowid = get_next_pg_rowid(tab_name)
-        tuple = tab_create_tuple(schema, val, False,  rowid=next_rowid)
-        try:
-            pg_insert_tuple(tab_name+'.tbl', next_pg, tuple)
-        except:
-            tab_leaf_split_pg(tab_name+'.tbl', next_pg, tuple)
+        next_rowid = tab_append_tuple(tab_name, schema, val)
         for filename in indexes:
             index_colname = filename[len(tab_name)+1:-4]
             i = col_names.index(index_colname.lower())
             index_datatype= schema[i]
             index_value= val[i]
             index_insert(tab_name, index_colname, index_datatype, index_value, next_rowid)
+    return next_rowid
 
 
-def drop_tab(cmd_input):
-    tab_name = parse_drop_tab(cmd_input)
-    tab_name = tab_name.lower()
+def drop_tab(stmt):
+    tab_name = stmt['table']
     if os.path.exists(tab_name+".tbl"):
-        os.remove(tab_name+".tbl")
+        indexes = get_indexes(tab_name)
+        remove_file(tab_name+".tbl")
         _, rows = catalog_schema(tab_name, with_rowid=True)
         rowids = [row['rowid'] for row in rows]
         tab_delete('davisbase_columns.tbl', rowids)
-        data = read_all_pgs_in_file('davisbase_tables.tbl')
-        for pg in data:
-            if not pg['is_leaf']:
-                continue
-            for tuple in pg['cells']:
-                if tab_name==tuple['data'][0].lower():
-                    rowids = [tuple['rowid']]
-                    break
+        rowids = [tuple['rowid'] for tuple in mmap_scan_tuples('davisbase_tables.tbl') if tuple['data'][0].lower()==tab_name]
         tab_delete('davisbase_tables.tbl', rowids)
-        for index in get_indexes(tab_name.upper()):
-            os.remove(index)
+        for index in indexes:
+            remove_file(index)
+        bump_catalog_version()
     else:
-        print("Table \"{}\" does not exist.".format(tab_name))
+        raise OperationalError("Table \"{}\" does not exist.".format(tab_name))
 
 def show_tabs():
     print_it("davisbase_tables.tbl", pg_format=False, limit=None)
     return None
 
 def index_insert(tab_name, column_name, index_datatype, index_value, rowid):
+    if index_value is None:
+        return
     fname = tab_name+'_'+column_name+'.ndx'
-    pgs = read_all_pgs_in_file(fname)
-    pg_num, cell_ind = pg_tuple_ind_given_key(pgs, index_value)
-    pg = pgs[pg_num]
-    if len(pg['cells'])!=cell_ind:
-        tuple = pg['cells'][cell_ind]
+    pg_num, cell_ind = pg_tuple_ind_given_key(fname, index_value)
+    pg = get_pg(fname, pg_num)
+    if cell_ind!=struct.unpack(endian+'h', pg[2:4])[0]:
+        tuple = index_pg_tuple(pg, cell_ind)
         if tuple['index_value']==index_value:
-            if rowid not in tuple['assoc_rowids']:
+            if rowid in tuple['assoc_rowids']:
+                return
+            if pg[0]==2:
+                pg_num = tuple['left_child_pg']
+                pg = get_pg(fname, pg_num)
+                while pg[0]==2:
+                    pg_num = pg_right_pointer(pg)
+                    pg = get_pg(fname, pg_num)
+                number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
+                cell_ind = number_tuples
+                if cell_ind!=0 and pg_tuple_key(pg, cell_ind-1)==index_value:
+                    cell_ind -= 1
+                tuple = index_pg_tuple(pg, cell_ind) if cell_ind<number_tuples else None
+            if tuple is not None and len(tuple['assoc_rowids'])<255 and tuple['cell_size']+4<=index_max_cell_size() and pg_available_bytes(pg)>=4:
                 add_rowid_to_tuple(fname, pg_num, cell_ind, rowid, tuple)
                 return
     tuple = index_create_tuple(index_datatype, index_value, [rowid], False, left_child_pg=None)
-    if pgs[pg_num]['available_bytes']/SIZE_OF_PAGE<0.5:
+    if pg_available_bytes(pg)/SIZE_OF_PAGE<0.5:
         index_leaf_split_pg(fname, pg_num, tuple, index_datatype, cell_ind)
         return
     else:
@@ -899,9 +1861,12 @@ def index_insert(tab_name, column_name, index_datatype, index_value, rowid):
         except:
             index_leaf_split_pg(fname, pg_num, tuple, index_datatype, cell_ind)
 
+def index_pg_tuple(pg, cell_ind):
+    cell_top_idx, cell_bot_idx = get_tuple_indices(pg, cell_ind)
+    return index_read_tuple(bytes(pg[cell_top_idx:cell_bot_idx]), pg[0]==2)
+
 def index_interior_split_pg(fname, split_pg_num, cell2insert, new_rightmost_pg, cell_index):
-    pgs = read_all_pgs_in_file(fname)
-    values = pgs[split_pg_num]
+    values = load_tuples_in_pg(fname, split_pg_num)
     tab_name = fname[:-4]
     parent_num = values['parent_pg']
     is_interior = not values['is_leaf']
@@ -928,7 +1893,7 @@ def index_interior_split_pg(fname, split_pg_num, cell2insert, new_rightmost_pg,
     copyoftuples = [tuple['cell_binary'] for tuple in insert_order]
     mid_tuple_binary = copyoftuples[mid_tuple]
     if parent_num==-1:
-        right_child_num = write_new_pg(tab_name, is_tab, is_interior, new_rightmost_pg, split_pg_num)
+        right_child_num = write_new_pg(tab_name, is_tab, is_interior, rightmost_child_pg_right, split_pg_num)
         left_child_num = write_new_pg(tab_name, is_tab, is_interior, rightmost_child_pg_left, split_pg_num)
         for order_tuple in insert_order[:mid_tuple+1]:
             update_pg_header(fname, order_tuple['left_child_pg'], parent=left_child_num)
@@ -941,10 +1906,9 @@ def index_interior_split_pg(fname, split_pg_num, cell2insert, new_rightmost_pg,
         pg_insert_tuple(fname, split_pg_num, mid_tuple_binary)
         update_tuple_leftpointer(fname, split_pg_num, 0, left_child_num)
         update_pg_header(fname, split_pg_num, right_sib_right_child=right_child_num)
-        print_it("tab_name_column1.ndx", pg_format=True)
         return right_child_num
     else:
-        right_sib = write_new_pg(tab_name, is_tab, is_interior, new_rightmost_pg, parent_num)
+        right_sib = write_new_pg(tab_name, is_tab, is_interior, rightmost_child_pg_right, parent_num)
         update_pg_header(fname, split_pg_num, right_sib_right_child=rightmost_child_pg_left)
         pg_delete_tuples_on_and_after(fname, split_pg_num, 0)
         for order_tuple in insert_order[:mid_tuple+1]:
@@ -954,16 +1918,17 @@ def index_interior_split_pg(fname, split_pg_num, cell2insert, new_rightmost_pg,
             update_pg_header(fname, order_tuple['left_child_pg'], parent=right_sib)
         update_pg_header(fname, values['rightmost_child_pg'], parent=right_sib)
         pg_insert_tuple(fname, right_sib, copyoftuples[mid_tuple+1:])
-        parent_pg = pgs[parent_num]
+        parent_pg = load_tuples_in_pg(fname, parent_num)
         parent_tuples = parent_pg['cells']
-        for i, tuple in enumerate(parent_tuples)-1:
-            if tuple['index_value'] >  mid_index:
+        parent_index = len(parent_tuples)
+        for i, tuple in enumerate(parent_tuples):
+            if tuple['left_child_pg']==split_pg_num:
                 parent_index = i
-                update_tuple_leftpointer(fname, parent_num, i, right_sib)
                 break
-            elif i==len(parent_tuples):
-                parent_index = len(parent_tuples)
-                update_pg_header(fname, parent_num, right_sib_right_child=right_sib)
+        if parent_index<len(parent_tuples):
+            update_tuple_leftpointer(fname, parent_num, parent_index, right_sib)
+        else:
+            update_pg_header(fname, parent_num, right_sib_right_child=right_sib)
         mid_tuple_binary = bytearray(mid_tuple_binary)
         mid_tuple_binary[0:4] = struct.pack(endian+'i', split_pg_num)
         if parent_pg['available_bytes']/SIZE_OF_PAGE<0.5:
@@ -976,8 +1941,7 @@ def index_interior_split_pg(fname, split_pg_num, cell2insert, new_rightmost_pg,
         return right_sib
 
 def index_leaf_split_pg(fname, split_pg_num, cell2insert, index_datatype, cell_index):
-    fbytes = load_file(fname)
-    values = read_tuples_in_pg(fbytes, split_pg_num)
+    values = load_tuples_in_pg(fname, split_pg_num)
     tab_name = fname[:-4]
     parent_num = values['parent_pg']
     is_interior = not values['is_leaf']
@@ -1020,17 +1984,18 @@ def index_leaf_split_pg(fname, split_pg_num, cell2insert, index_datatype, cell_i
         update_pg_header(fname, split_pg_num, right_sib_right_child=right_sib)
         pg_insert_tuple(fname, right_sib, copyoftuples[mid_tuple+1:])
         mid_tuple_binary = struct.pack(endian+'i', split_pg_num) + mid_tuple_binary
-        parent_pg = read_tuples_in_pg(fbytes, parent_num)
+        parent_pg = load_tuples_in_pg(fname, parent_num)
         parent_tuples = parent_pg['cells']
 
+        parent_index = len(parent_tuples)
         for i, tuple in enumerate(parent_tuples):
-            if tuple['index_value'] >  mid_index:
+            if tuple['left_child_pg']==split_pg_num:
                 parent_index = i
-                update_tuple_leftpointer(fname, parent_num, i, right_sib)
                 break
-            elif i==len(parent_tuples)-1:
-                parent_index = len(parent_tuples)
-                update_pg_header(fname, parent_num, right_sib_right_child=right_sib)
+        if parent_index<len(parent_tuples):
+            update_tuple_leftpointer(fname, parent_num, parent_index, right_sib)
+        else:
+            update_pg_header(fname, parent_num, right_sib_right_child=right_sib)
 
         if parent_pg['available_bytes']/SIZE_OF_PAGE<0.5:
             new_parent = index_interior_split_pg(fname, parent_num, mid_tuple_binary, right_sib,parent_index)
@@ -1040,11 +2005,6 @@ def index_leaf_split_pg(fname, split_pg_num, cell2insert, index_datatype, cell_i
                 index_insert_tuple_in_pg(fname, parent_num, mid_tuple_binary, parent_index)
             except:
                 new_parent = index_interior_split_pg(fname, parent_num, mid_tuple_binary, right_sib, parent_index)
-        try:
-            validate(fname)
-        except:
-            print("splitting",right_sib, split_pg_num)
-            assert(False)
 
 def delete(tab_name, rowid):
     pg_num, cell_ind = pg_tuple_ind_given_index_value(tab_name, rowid)
@@ -1069,59 +2029,54 @@ def delete(tab_name, rowid):
         return None
 
 def pg_insert_tuple(fname, pg_num, tuple):
-    fbytes = load_file(fname)
-    pg = load_pg(fbytes, pg_num)
-    pg = bytearray(pg)
+    pg = get_pg(fname, pg_num)
 
     if type(tuple)==list:
         cells = tuple
         for tuple in cells:
-            assert(len(tuple)<pg_available_bytes(fbytes, pg_num))
+            assert(len(tuple)<pg_available_bytes(pg))
             number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
             bytes_from_top = 16+(2*number_tuples)
-            bytes_from_bot =struct.unpack(endian+'h', pg[4:6])[0]
+            bytes_from_bot =get_pg_offset(pg, 4)
             new_start_index = bytes_from_bot - len(tuple)
             pg[new_start_index:bytes_from_bot] = tuple
-            pg[bytes_from_top:bytes_from_top+2] = struct.pack(endian+'h', new_start_index)
-            pg[4:6] = struct.pack(endian+'h', new_start_index)
+            set_pg_offset(pg, bytes_from_top, new_start_index)
+            set_pg_offset(pg, 4, new_start_index)
             pg[2:4] = struct.pack(endian+'h', number_tuples+1)
             assert(len(pg)==SIZE_OF_PAGE)
     else:
-        assert(len(tuple)<pg_available_bytes(fbytes, pg_num))
+        assert(len(tuple)<pg_available_bytes(pg))
         number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
         bytes_from_top = 16+(2*number_tuples)
-        bytes_from_bot =struct.unpack(endian+'h', pg[4:6])[0]
+        bytes_from_bot =get_pg_offset(pg, 4)
         new_start_index = bytes_from_bot - len(tuple)
         pg[new_start_index:bytes_from_bot] = tuple
-        pg[bytes_from_top:bytes_from_top+2] = struct.pack(endian+'h', new_start_index)
-        pg[4:6] = struct.pack(endian+'h', new_start_index)
+        set_pg_offset(pg, bytes_from_top, new_start_index)
+        set_pg_offset(pg, 4, new_start_index)
         pg[2:4] = struct.pack(endian+'h', number_tuples+1)
         assert(len(pg)==SIZE_OF_PAGE)
     save_pg(fname, pg_num, pg)
     return None
 
 def pg_delete_tuples_on_and_after(fname, pg_num, cell_ind):
-    fbytes = load_file(fname)
-    pg = load_pg(fbytes, pg_num)
-    pg = bytearray(pg)
+    pg = get_pg(fname, pg_num)
     number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
     assert(cell_ind<=number_tuples-1)
     assert(number_tuples>=1)
     assert(cell_ind>=0)
-    cell_content_area_start = struct.unpack(endian+'h', pg[4:6])[0]
+    cell_content_area_start = get_pg_offset(pg, 4)
     cell_top_loc, cell_bot_loc = get_tuple_indices(pg, cell_ind)
     dis = cell_bot_loc - cell_content_area_start
     pg[cell_content_area_start:cell_bot_loc] = b'\x00'*dis
     pg[16+2*cell_ind:16+2*number_tuples] = b'\x00'*2*(number_tuples-cell_ind)
     pg[2:4] = struct.pack(endian+'h', cell_ind)
-    pg[4:6] = struct.pack(endian+'h', cell_content_area_start+dis)
+    set_pg_offset(pg, 4, cell_content_area_start+dis)
     save_pg(fname, pg_num, pg)
     assert(len(pg)==SIZE_OF_PAGE)
     return (number_tuples - 1) == 0
 
 def tab_interior_split_pg(fname, split_pg_num, cell2insert, new_rightmost_pg):
-    pgs = read_all_pgs_in_file(fname)
-    values = pgs[split_pg_num]
+    values = load_tuples_in_pg(fname, split_pg_num)
 
     tab_name = fname[:-4]
     parent_num = values['parent_pg']
@@ -1160,6 +2115,7 @@ def tab_interior_split_pg(fname, split_pg_num, cell2insert, new_rightmost_pg):
         return right_child_num
 
     else:
+        parent_rightmost_child = load_tuples_in_pg(fname, parent_num)['rightmost_child_pg']
         right_sib = write_new_pg(tab_name, is_tab, is_interior, rightmost_child_pg_right, parent_num)
 
         copyoftuples=[]
@@ -1175,7 +2131,7 @@ def tab_interior_split_pg(fname, split_pg_num, cell2insert, new_rightmost_pg):
         mid_tuple_binary = tab_create_tuple([], [], True, left_child_pg=split_pg_num,  rowid=mid_rowid)
         update_pg_header(fname, split_pg_num, right_sib_right_child=rightmost_child_pg_left)
 
-        if pgs[parent_num]['rightmost_child_pg']==split_pg_num:
+        if parent_rightmost_child==split_pg_num:
             update_pg_header(fname, parent_num, right_sib_right_child=right_sib)
         try:
             pg_insert_tuple(fname, parent_num, mid_tuple_binary)
@@ -1186,8 +2142,7 @@ def tab_interior_split_pg(fname, split_pg_num, cell2insert, new_rightmost_pg):
         return right_sib
 
 def tab_leaf_split_pg(fname, split_pg_num, cell2insert):
-    fbytes = load_file(fname)
-    values = read_tuples_in_pg(fbytes, split_pg_num)
+    values = load_tuples_in_pg(fname, split_pg_num)
     tab_name = fname[:-4]
     parent_num = values['parent_pg']
     is_interior = not values['is_leaf']
@@ -1198,8 +2153,12 @@ def tab_leaf_split_pg(fname, split_pg_num, cell2insert):
     number_tuples = values['number_tuples']
     cells = values['cells']
     mid_tuple = int((number_tuples+1)/2)
-    mid_tuple_binary = cells[mid_tuple]['cell_binary']
-    mid_rowid = cells[mid_tuple]['rowid']
+    while mid_tuple<number_tuples and sum(cell['cell_size']+2 for cell in cells[mid_tuple:])+len(cell2insert)+2>SIZE_OF_PAGE-16:
+        mid_tuple += 1
+    if mid_tuple<number_tuples:
+        mid_rowid = cells[mid_tuple]['rowid']
+    else:
+        mid_rowid = tab_cell_rowid(cell2insert)
     right_sibling_pg = values['right_sibling_pg']
     if parent_num==-1:
         right_child_num = write_new_pg(tab_name, is_tab, False, -1, split_pg_num)
@@ -1217,15 +2176,19 @@ def tab_leaf_split_pg(fname, split_pg_num, cell2insert):
         pg_delete_tuples_on_and_after(fname, split_pg_num, 0)
         pg_insert_tuple(fname, split_pg_num, mid_tuple_binary)
         update_pg_header(fname, split_pg_num, right_sib_right_child=right_child_num, is_interior=True)
+        update_file_header(fname, rightmost_leaf=right_child_num)
     else:
         right_sib = write_new_pg(tab_name, is_tab, is_interior, right_sibling_pg, parent_num)
         update_pg_header(fname, split_pg_num, right_sib_right_child=right_sib)
+        if read_file_header(fname)['rightmost_leaf']==split_pg_num:
+            update_file_header(fname, rightmost_leaf=right_sib)
         copyoftuples = []
         for i in range(mid_tuple, number_tuples):
             copyoftuples.append(cells[i]['cell_binary'])
         pg_insert_tuple(fname, right_sib, copyoftuples)
         pg_insert_tuple(fname, right_sib, cell2insert)
-        pg_delete_tuples_on_and_after(fname, split_pg_num, mid_tuple)
+        if mid_tuple<number_tuples:
+            pg_delete_tuples_on_and_after(fname, split_pg_num, mid_tuple)
         update_pg_header(fname, parent_num, right_sib_right_child=right_sib)
         mid_tuple_binary = tab_create_tuple([], [], True, left_child_pg=split_pg_num,  rowid=mid_rowid)
         try:
@@ -1237,332 +2200,360 @@ def tab_leaf_split_pg(fname, split_pg_num, cell2insert):
 
 def tab_insert(tab_name, values):
     schema, all_col_data = catalog_schema(tab_name)
+    tab_append_tuple(tab_name, schema, values)
+    return None
+
+def tab_append_tuple(tab_name, schema, values):
+    fname = tab_name+'.tbl'
     next_pg, next_rowid = get_next_pg_rowid(tab_name)
     tuple = tab_create_tuple(schema, values, False,  rowid=next_rowid)
     try:
-        pg_insert_tuple(tab_name+'.tbl', next_pg, tuple)
+        pg_insert_tuple(fname, next_pg, tuple)
     except:
-        tab_leaf_split_pg(tab_name+'.tbl', next_pg, tuple)
-    return None
-
-def pg_tuple_ind_given_key(pgs, index_value):
-    pg_num=0
-    if len(pgs[pg_num]['cells'])==0:
-        return pg_num, 0
-    return get_pg_tuple_ind(pgs, index_value, pg_num)
+        tab_leaf_split_pg(fname, next_pg, tuple)
+    update_file_header(fname, max_rowid=next_rowid)
+    return next_rowid
+
+def pg_tuple_ind_given_key(fname, key, path=None):
+    pg_num = 0
+    while True:
+        pg = get_pg(fname, pg_num)
+        number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
+        if number_tuples==0:
+            return pg_num, 0
+        is_tab = pg[0] in [5,13]
+        is_interior = pg[0] in [2,5]
+        cell_ind = bisect_pg(pg, key, right=is_tab and is_interior)
+        if not is_tab and cell_ind<number_tuples and pg_tuple_key(pg, cell_ind)==key:
+            return pg_num, cell_ind
+        if not is_interior:
+            return pg_num, cell_ind
+        if path is not None:
+            path.append((pg_num, cell_ind))
+        if cell_ind==number_tuples:
+            pg_num = struct.unpack(endian+'i', pg[6:10])[0]
+        else:
+            pg_num = pg_tuple_left_child(pg, cell_ind)
+
+def leftmost_leaf_pg(fname):
+    pg_num = 0
+    pg = get_pg(fname, pg_num)
+    while pg[0] in [2,5]:
+        pg_num = pg_tuple_left_child(pg, 0)
+        pg = get_pg(fname, pg_num)
+    return pg_num
+
+def leaf_chain_cells(fname, pg_num, cell_ind=0):
+    while True:
+        pg = get_pg(fname, pg_num)
+        number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
+        for i in range(cell_ind, number_tuples):
+            cell_top_idx, cell_bot_idx = get_tuple_indices(pg, i)
+            yield pg[cell_top_idx:cell_bot_idx]
+        cell_ind = 0
+        pg_num = struct.unpack(endian+'i', pg[6:10])[0]
+        if pg_num<=0:
+            break
 
-def get_pg_tuple_ind(pgs, value, pg_num):
-    pg = pgs[pg_num]
-    is_tab= pg['is_tab']
-    is_leaf = pg['is_leaf']
-    if not is_tab:
-        for i, tuple in enumerate(pg['cells']):
-            if tuple['index_value']==value:
-                return pg_num, i
-            elif tuple['index_value'] > value:
-                if not pg['is_leaf']:
-                    return get_pg_tuple_ind(pgs, value, tuple['left_child_pg'])
-                else:
-                    return pg_num, i
-            else:
-                if pg['is_leaf'] and i+1==len(pg['cells']):
-                    return pg_num, len(pg['cells'])
-                if not pg['is_leaf'] and i+1==len(pg['cells']):
-                    return get_pg_tuple_ind(pgs, value, pg['rightmost_child_pg'])
-                else:
-                    continue
+def rowid_range_cells(fname, oper, rowid):
+    if oper in ['=', '>=']:
+        pg_num, cell_ind = pg_tuple_ind_given_key(fname, rowid)
+    elif oper=='>':
+        pg_num, cell_ind = pg_tuple_ind_given_key(fname, rowid+1)
     else:
-        for cell_ind, tuple in enumerate(pg['cells']):
-            if (tuple['rowid'] == value):
-                if is_leaf:
-                    return pg_num, cell_ind
-                else:
-                    if cell_ind+1==len(pg['cells']):
-                        return get_pg_tuple_ind(pgs, value, pg['rightmost_child_pg'])
-                    else:
-                        continue
-            elif (tuple['rowid'] > value):
-                if not is_leaf:
-                    return get_pg_tuple_ind(pgs, value, tuple['left_child_pg'])
-                else:
-                    return pg_num, cell_ind
-            elif cell_ind+1==len(pg['cells']):
-                if not is_leaf:
-                    return get_pg_tuple_ind(pgs, value, pg['rightmost_child_pg'])
+        pg_num, cell_ind = leftmost_leaf_pg(fname), 0
+    for cell in leaf_chain_cells(fname, pg_num, cell_ind):
+        cell_rowid = tab_cell_rowid(cell)
+        if oper=='=' and cell_rowid!=rowid:
+            break
+        elif oper=='<' and cell_rowid>=rowid:
+            break
+        elif oper=='<=' and cell_rowid>rowid:
+            break
+        yield cell
+
+def index_range_tuples(fname, oper=None, value=None, pg_num=0, lower=None, upper=None):
+    lo = value if oper in ['=','>','>='] else None
+    hi = value if oper in ['=','<','<='] else None
+    pg = get_pg(fname, pg_num)
+    is_interior = pg[0]==2
+    number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
+    prev_key = lower
+    for cell_ind in range(number_tuples+1 if is_interior else number_tuples):
+        if cell_ind<number_tuples:
+            key = pg_tuple_key(pg, cell_ind)
+        else:
+            key = upper
+        if is_interior:
+            if (lo is None or key is None or key>=lo) and (hi is None or prev_key is None or prev_key<=hi):
+                if cell_ind<number_tuples:
+                    child_pg = pg_tuple_left_child(pg, cell_ind)
                 else:
-                    return pg_num, len(pg['cells'])
-            else:
-                continue
-def tab_delete(fname, rowids):
-    pgs = read_all_pgs_in_file(fname)
-    for rowid in rowids:
-        pg_num=0
-        tab_delete_recursion(pgs, pg_num, rowid)
-    pg_dict_to_file(fname, pgs)
+                    child_pg = struct.unpack(endian+'i', pg[6:10])[0]
+                for tuple in index_range_tuples(fname, oper, value, child_pg, prev_key, key):
+                    yield tuple
+        if cell_ind==number_tuples:
+            break
+        if hi is not None and key>hi:
+            return
+        if oper is None or get_operator_fn(oper)(key, value):
+            cell_top_idx, cell_bot_idx = get_tuple_indices(pg, cell_ind)
+            yield index_read_tuple(pg[cell_top_idx:cell_bot_idx], is_interior)
+        prev_key = key
+
+def tab_tuple_given_rowid(fname, rowid):
+    cell = tab_cell_given_rowid(fname, rowid)
+    if cell is None:
+        return None
+    return tab_read_tuple(cell, False)
 
-def delete_from_pg_dict(pgs, pg_num, ind):
-    pg = pgs[pg_num]
-    pg['available_bytes']+=len(pg['cells'][ind]['cell_binary'])
-    pg['number_tuples']-=1
-    del pg['rowids'][ind]
-    del pg['cells'][ind]
-    return pgs
+def tab_cell_given_rowid(fname, rowid):
+    pg_num, cell_ind = pg_tuple_ind_given_key(fname, rowid)
+    pg = get_pg(fname, pg_num)
+    if cell_ind==struct.unpack(endian+'h', pg[2:4])[0] or pg_tuple_key(pg, cell_ind)!=rowid:
+        return None
+    cell_top_idx, cell_bot_idx = get_tuple_indices(pg, cell_ind)
+    return pg[cell_top_idx:cell_bot_idx]
+
+def bisect_pg(pg, key, right=False):
+    lo = 0
+    hi = struct.unpack(endian+'h', pg[2:4])[0]
+    while lo<hi:
+        mid = (lo+hi)//2
+        mid_key = pg_tuple_key(pg, mid)
+        if mid_key<key or (right and mid_key==key):
+            lo = mid+1
+        else:
+            hi = mid
+    return lo
 
-def insert_to_pg_dict(pgs, pg_num, tuple, ind):
-    pg = pgs[pg_num]
-    pg['available_bytes']-=len(tuple['cell_binary'])
-    pg['number_tuples']+=1
-    if ind==0:
-        pg['rowids'] = [tuple['rowid']] + pg['rowids']
-        pg['cells'] = [tuple] + pg['cells']
-    elif ind+1<pg['number_tuples']:
-        pg['rowids'] = pg['rowids'][:ind] + [tuple['rowid']] + pg['rowids'][ind:]
-        pg['cells'] = pg['cells'][:ind] + [tuple] + pg['cells'][ind:]
+def pg_tuple_key(pg, cell_ind):
+    cell_top_idx, cell_bot_idx = get_tuple_indices(pg, cell_ind)
+    if pg[0]==5:
+        return struct.unpack(endian+'i', pg[cell_top_idx+4:cell_top_idx+8])[0]
+    elif pg[0]==13:
+        return struct.unpack(endian+'i', pg[cell_top_idx+2:cell_top_idx+6])[0]
+    elif pg[0]==2:
+        query_result_idx = cell_top_idx+6
     else:
-        pg['rowids'].append(tuple['rowid'])
-        pg['cells'].append(tuple)
-    return pgs
+        query_result_idx = cell_top_idx+2
+    datatype1 = pg[query_result_idx+1]
+    element_size = get_datatype1_size(datatype1)
+    return datatype_byte_to_val(datatype1, pg[query_result_idx+2:query_result_idx+2+element_size])
 
-def update_tuple_bin(cell_binary, rowid=None, left_child=None):
-    cell_binary = bytearray(cell_binary)
-    if left_child!=None:
-        cell_binary[:4] = struct.pack(endian+'i', left_child)
-    if rowid!=None:
-        cell_binary[4:8] = struct.pack(endian+'i', rowid)
-    return cell_binary
-
-def fix_parent_pointer(pgs, parent_pg, id2fix, left=True):
-    pg = pgs[parent_pg]
-    for i, id in enumerate(pg['rowids']):
-        if left:
-            if id > id2fix:
-                pg['rowids'][i]=id2fix-1
-                pg['cells'][i]['cell_binary']=update_tuple_bin(pg['cells'][i]['cell_binary'], rowid=id2fix-1)
-                pg['cells'][i]['rowid']=id2fix-1
-                break
-        else:
-            if id > id2fix:
-                pg['rowids'][i-1]=id2fix
-                pg['cells'][i-1]['cell_binary']=update_tuple_bin(pg['cells'][i-1]['cell_binary'], rowid=id2fix)
-                pg['cells'][i-1]['rowid']=id2fix
-                break
+def pg_tuple_left_child(pg, cell_ind):
+    cell_top_idx, cell_bot_idx = get_tuple_indices(pg, cell_ind)
+    return struct.unpack(endian+'i', pg[cell_top_idx:cell_top_idx+4])[0]
+
+def tab_delete(fname, rowids):
+    for rowid in rowids:
+        tab_delete_rowid(fname, rowid)
     return None
 
-def steal_sibling_tuple(pgs, pg_num, left=True):
-    pg = pgs[pg_num]
-    if left:
-        left_sib = pgs[pg['left_sibling_pg']]
-        tuple = left_sib['cells'][-1]
-        insert_to_pg_dict(pgs, pg_num, tuple, 0)
-        delete_from_pg_dict(pgs, left_sib['pg_number'], left_sib['number_tuples']-1)
-        return tuple['rowid']+1
+def tab_delete_rowid(fname, rowid):
+    path = []
+    pg_num, cell_ind = pg_tuple_ind_given_key(fname, rowid, path)
+    pg = get_pg(fname, pg_num)
+    if cell_ind==struct.unpack(endian+'h', pg[2:4])[0] or pg_tuple_key(pg, cell_ind)!=rowid:
+        return False
+    pg_delete_tuple(fname, pg_num, cell_ind)
+    while len(path)!=0:
+        pg = get_pg(fname, pg_num)
+        if SIZE_OF_PAGE-16-pg_available_bytes(pg)>=MIN_FILL_FACTOR*(SIZE_OF_PAGE-16):
+            return True
+        parent_num, child_ind = path.pop()
+        if not tab_rebalance_children(fname, parent_num, max(0, child_ind-1)):
+            return True
+        pg_num = parent_num
+    collapse_root(fname)
+    return True
+
+def tab_rebalance_children(fname, parent_num, sep_ind):
+    parent = get_pg(fname, parent_num)
+    left_num = pg_child(parent, sep_ind)
+    right_num = pg_child(parent, sep_ind+1)
+    left = get_pg(fname, left_num)
+    right = get_pg(fname, right_num)
+    is_leaf = left[0]==13
+    if is_leaf:
+        cells = pg_cells(left)+pg_cells(right)
     else:
-        rsib = pgs[pg['right_sibling_pg']]
-        tuple = rsib['cells'][0]
-        insert_to_pg_dict(pgs, pg_num, tuple, pg['number_tuples'])
-        delete_from_pg_dict(pgs, rsib['pg_number'], 0)
-        return tuple['rowid']+1
-
-def try_borrowing(pgs, borrower_pg):
-    pg = pgs[borrower_pg]
-    parent = pg['parent_pg']
-    if 'left_sibling_pg' in pg:
-        left_sib = pgs[pg['left_sibling_pg']]
-        steal_size = len(left_sib['cells'][-1]['cell_binary'])
-        if left_sib['number_tuples']>2:
-            id2fix=steal_sibling_tuple(pgs, borrower_pg, left=True)
-            fix_parent_pointer(pgs, pg['parent_pg'], id2fix, left=True)
-            return None
-        else:
-            return 'left'
-    elif pg['right_sibling_pg']!=-1 and pgs[pg['right_sibling_pg']]['parent_pg']==parent:
-        rsib = pgs[pg['right_sibling_pg']]
-        steal_size = len(rsib['cells'][0]['cell_binary'])
-        if rsib['number_tuples']>2:
-            id2fix=steal_sibling_tuple(pgs, borrower_pg, left=False)
-            fix_parent_pointer(pgs, pg['parent_pg'], id2fix, left=False)
-            return None
-        else:
-            return 'right'
+        sep_tuple = tab_create_tuple([], [], True, left_child_pg=pg_right_pointer(left), rowid=pg_tuple_key(parent, sep_ind))
+        cells = pg_cells(left)+[sep_tuple]+pg_cells(right)
+    right_pointer = pg_right_pointer(right)
+    if sum(len(cell)+2 for cell in cells)<=SIZE_OF_PAGE-16:
+        rewrite_pg(fname, left_num, left[0], cells, right_pointer, parent_num)
+        if not is_leaf:
+            adopt_children(fname, left_num)
+        elif read_file_header(fname)['rightmost_leaf']==right_num:
+            update_file_header(fname, rightmost_leaf=left_num)
+        set_pg_child(fname, parent_num, sep_ind+1, left_num)
+        pg_delete_tuple(fname, parent_num, sep_ind)
+        free_pg(fname, right_num)
+        return True
+    split_ind = balanced_split_ind(cells, is_leaf)
+    if is_leaf:
+        left_cells = cells[:split_ind]
+        right_cells = cells[split_ind:]
+        left_pointer = right_num
+        new_key = tab_read_tuple(right_cells[0], False)['rowid']
     else:
-        return None
+        mid_tuple = tab_read_tuple(cells[split_ind], True)
+        left_cells = cells[:split_ind]
+        right_cells = cells[split_ind+1:]
+        left_pointer = mid_tuple['left_child_pg']
+        new_key = mid_tuple['rowid']
+    rewrite_pg(fname, left_num, left[0], left_cells, left_pointer, parent_num)
+    rewrite_pg(fname, right_num, right[0], right_cells, right_pointer, parent_num)
+    if not is_leaf:
+        adopt_children(fname, left_num)
+        adopt_children(fname, right_num)
+    update_tuple_leftpointer(fname, parent_num, sep_ind, rowid=new_key)
+    return False
+
+def balanced_split_ind(cells, is_leaf):
+    total = sum(len(cell)+2 for cell in cells)
+    used = 0
+    for split_ind, cell in enumerate(cells):
+        used += len(cell)+2
+        if 2*used>=total:
+            break
+    if is_leaf:
+        return min(max(split_ind, 1), len(cells)-1)
+    return min(max(split_ind, 1), len(cells)-2)
 
-def delete_dict(pgs, pg_num, rowid):
-    pg = pgs[pg_num]
-    if rowid in pg['rowids']:
-        ind = pg['rowids'].index(rowid)
-        pgs = delete_from_pg_dict(pgs, pg_num, ind)
-        if pg['number_tuples']<2 and pg['parent_pg']!=-1:
-            return try_borrowing(pgs, pg_num)
-        else:
-            return None
-    else:
+def collapse_root(fname):
+    root = get_pg(fname, 0)
+    if root[0] not in [2,5] or struct.unpack(endian+'h', root[2:4])[0]!=0:
         return None
+    child_num = pg_right_pointer(root)
+    child = get_pg(fname, child_num)
+    is_interior = child[0] in [2,5]
+    rewrite_pg(fname, 0, child[0], pg_cells(child), pg_right_pointer(child) if is_interior else -1, -1)
+    if is_interior:
+        adopt_children(fname, 0)
+    elif read_file_header(fname)['rightmost_leaf']==child_num:
+        update_file_header(fname, rightmost_leaf=0)
+    free_pg(fname, child_num)
+    return None
 
-def merge_children(pgs, pg_num, child_pg_num, left=True):
-    pg = pgs[pg_num]
-    pg_children = [i['left_child_pg'] for i in pgs[pg_num]['cells']]
-    child_pg = pgs[child_pg_num]
-    if left:
-        left_sib = pgs[child_pg['left_sibling_pg']]
-        id2del = pg['cells'][pg_children.index(left_sib['pg_number'])]['rowid']
-        if not left_sib['is_leaf']:
-            for tuple in left_sib['cells']:
-                pgs[tuple['left_child_pg']]['parent_pg'] = child_pg_num
-            pgs[left_sib['rightmost_child_pg']]['parent_pg'] = child_pg_num
-            mid_tuple = tab_create_tuple([], [], True, left_child_pg=left_sib['rightmost_child_pg'],  rowid=id2del)
-            left_sib['cells'] = left_sib['cells']+mid_tuple
-            left_sib['rowids'] = left_sib['rowids']+id2del
-        child_pg['cells'] = left_sib['cells']+child_pg['cells']
-        child_pg['rowids'] = left_sib['rowids']+child_pg['rowids']
-        child_pg['number_tuples'] = left_sib['number_tuples']+child_pg['number_tuples']
-        child_pg['available_bytes'] = left_sib['available_bytes']-(SIZE_OF_PAGE - child_pg['available_bytes'])
-        pgs[child_pg['right_sibling_pg']]['left_sibling_pg'] = child_pg_num
-        if 'left_child_pg' not in left_sib:
-            del child_pg['left_sibling_pg']
-        else:
-            child_pg['left_child_pg'] = left_sib['left_child_pg']
-        delete_pg_in_dictionary(pgs, left_sib['pg_number'])
-        return id2del
-    else:
-        rsib = pgs[child_pg['right_sibling_pg']]
-        id2del = pg['cells'][pg_children.index(child_pg_num)]['rowid']
-        if not rsib['is_leaf']:
-            for tuple in rsib['cells']:
-                pgs[tuple['left_child_pg']]['parent_pg'] = child_pg_num
-            pgs[rsib['rightmost_child_pg']]['parent_pg'] = child_pg_num
-            mid_tuple = tab_create_tuple([], [], True, left_child_pg=rsib['rightmost_child_pg'],  rowid=id2del)
-            child_pg['cells'] = child_pg['cells']+mid_tuple
-            child_pg['rowids'] = child_pg['rowids']+id2del
-        child_pg['cells'] = child_pg['cells'] + rsib['cells']
-        child_pg['rowids'] = child_pg['rowids'] + rsib['rowids']
-        child_pg['number_tuples'] = child_pg['number_tuples'] + rsib['number_tuples']
-        child_pg['available_bytes'] = rsib['available_bytes']-(SIZE_OF_PAGE - child_pg['available_bytes'])
-        if ['right_sibling_pg']!=-1 and 'left_sibling_pg' in child_pg:
-            pgs[child_pg['left_sibling_pg']]['right_sibling_pg'] = child_pg_num
-        child_pg['right_sibling_pg'] = rsib['right_sibling_pg']
-        i = pg_children.index(rsib['pg_number'])
-        tuple = pg['cells'][i]
-        if i+1 ==len(pgs[pg['parent_pg']]['cells']):
-            pgs[pg['parent_pg']]['rightmost_child_pg'] = child_pg['pg_number']
-        else:
-            tuple['left_child_pg'] = child_pg['pg_number']
-            tuple['cell_binary'] = update_tuple_bin(tuple['cell_binary'], left_child=child_pg['pg_number'])
-        delete_pg_in_dictionary(pgs, rsib['pg_number'])
-        return id2del
+def pg_cells(pg):
+    cells = []
+    for cell_ind in range(struct.unpack(endian+'h', pg[2:4])[0]):
+        cell_top_idx, cell_bot_idx = get_tuple_indices(pg, cell_ind)
+        cells.append(bytes(pg[cell_top_idx:cell_bot_idx]))
+    return cells
 
-def tab_delete_recursion(pgs, pg_num, rowid):
-    pg = pgs[pg_num]
-    if pg['is_leaf']:
-        return delete_dict(pgs, pg_num, rowid)
-    else:
-        for  i, tuple in enumerate(pg['cells']):
-            if tuple['rowid'] > rowid:
-                child_pg = tuple['left_child_pg']
-                merge_child = tab_delete_recursion(pgs, child_pg, rowid)
-                break
-            elif i+1 == len(pg['cells']):
-                child_pg = pg['rightmost_child_pg']
-                merge_child = tab_delete_recursion(pgs, child_pg, rowid)
-                break
-            else:
-                continue
+def pg_right_pointer(pg):
+    return struct.unpack(endian+'i', pg[6:10])[0]
 
-        if merge_child is None:
-            return None
-        elif merge_child=='left':
-            if pg['parent_pg']==-1 and pg['number_tuples']==1:
-                merge_children(pgs, pg_num, child_pg, left=True)
-                pgs[pg['rightmost_child_pg']]['parent_pg'] = -1
-                delete_pg_in_dictionary(pgs, pg_num)
-            else:
-                id2del = merge_children(pgs, pg_num, child_pg, left=True)
-                return delete_dict(pgs, pg_num, id2del)
-
-        elif merge_child=='right':
-            if pg['parent_pg']==-1 and pg['number_tuples']==1:
-                merge_children(pgs, pg_num, child_pg, left=False)
-                pgs[pg['cells'][0]['left_child_pg']]['parent_pg'] = -1
-                delete_pg_in_dictionary(pgs, pg_num)
-            else:
-                id2del = merge_children(pgs, pg_num, child_pg, left=False)
-                return delete_dict(pgs, pg_num, id2del)
-        else:
-            assert(False)
+def pg_child(pg, child_ind):
+    if child_ind==struct.unpack(endian+'h', pg[2:4])[0]:
+        return pg_right_pointer(pg)
+    return pg_tuple_left_child(pg, child_ind)
 
-def copy_pg(fname, pgs, pg_number, parent, i=None):
-    pg = pgs[pg_number]
-    tab_name = fname[:-4]
-    is_tab = pg['is_tab']
-    is_interior = not pg['is_leaf']
-    if is_interior:
-        right_sib_right_child = pg['rightmost_child_pg']
+def set_pg_child(fname, pg_num, child_ind, child_pg):
+    pg = get_pg(fname, pg_num)
+    if child_ind==struct.unpack(endian+'h', pg[2:4])[0]:
+        update_pg_header(fname, pg_num, right_sib_right_child=child_pg)
     else:
-        right_sib_right_child = pg['right_sibling_pg']
-    if i==None:
-        i=0
-    write_new_pg(tab_name, is_tab, is_interior, right_sib_right_child, parent)
-    cells = pg['cells']
-    if is_interior:
-        if cells!=sorted(cells, key=lambda x: x['left_child_pg']):
-            for tuple, scell in zip(cells, sorted(cells, key=lambda x: x['left_child_pg'])):
-                tuple['cell_binary'] = update_tuple_bin(tuple['cell_binary'], left_child=scell['left_child_pg'])
-    if pg['number_tuples']>1:
-        cells2insert = [j["cell_binary"] for j in cells]
-    else:
-        cells2insert = cells[0]['cell_binary']
-    pg_insert_tuple(fname, i, cells2insert)
-    if is_interior:
-        children = [j["left_child_pg"] for j in cells]+[pg['rightmost_child_pg']]
-        for child in children:
-            if 'deleted' not in pgs[child]:
-                i+=1
-                if children.index(child)+1==len(children):
-                    update_pg_header(fname, pg_number, right_sib_right_child=i, is_interior=is_interior, parent=parent)
-                i = copy_pg(fname, pgs, child, pg_number, i=i)
-            else:
-                continue
-    return i
-
-def delete_pg_in_dictionary(pgs, pg_number):
-    del pgs[pg_number]
-    for pg in pgs:
-        if pg['pg_number']>=pg_number:
-            pg['pg_number']-=1
-        if pg['parent_pg']!=-1:
-            if 'left_sibling_pg' in pg:
-                if pg['left_sibling_pg']>=pg_number:
-                    pg['left_sibling_pg']-=1
-            if pg['right_sibling_pg']!=-1 and 'right_sibling_pg' in pg:
-                if pg['right_sibling_pg']>=pg_number:
-                    pg['right_sibling_pg']-=1
-        if pg['parent_pg']>=pg_number:
-            pg['parent_pg']-=1
-        if not pg['is_leaf']:
-            if pg['rightmost_child_pg']>=pg_number:
-                pg['rightmost_child_pg']-=1
-            for tuple in pg['cells']:
-                if tuple['left_child_pg']>=pg_number:
-                    tuple['left_child_pg']-=1
-                    tuple['cell_binary'] = update_tuple_bin(tuple['cell_binary'], left_child=tuple['left_child_pg'])
-
-def pg_dict_to_file(fname, pgs):
-    tab_name = fname[:-4]
-    if fname[-4:]=='.tbl':
-        is_tab = True
-    else:
-        is_tab=False
-    for pg in pgs:
-        if pg['parent_pg']==-1:
-            root_node = pg['pg_number']
-            break
+        update_tuple_leftpointer(fname, pg_num, child_ind, child_pg)
+    return None
 
-    os.remove(fname)
-    with open(fname, 'w+') as f:
-        pass
-    copy_pg(fname, pgs, root_node, -1)
+def adopt_children(fname, pg_num):
+    pg = get_pg(fname, pg_num)
+    for child_ind in range(struct.unpack(endian+'h', pg[2:4])[0]+1):
+        update_pg_header(fname, pg_child(pg, child_ind), parent=pg_num)
+    return None
+
+def rewrite_pg(fname, pg_num, pg_type, cells, right_sib_right_child, parent):
+    save_pg(fname, pg_num, new_pg_bytes(pg_type, cells, right_sib_right_child, parent))
+    return None
+
+def free_pg(fname, pg_num):
+    header = read_file_header(fname)
+    pg = bytearray(SIZE_OF_PAGE)
+    pg[6:10] = struct.pack(endian+'i', header['free_pg_head'])
+    save_pg(fname, pg_num, pg)
+    update_file_header(fname, free_pg_head=pg_num, free_pg_count=header['free_pg_count']+1)
     return None
 
+def pop_free_pg(fname):
+    header = read_file_header(fname)
+    if header['free_pg_head']==0:
+        return None
+    pg_num = header['free_pg_head']
+    update_file_header(fname, free_pg_head=pg_right_pointer(get_pg(fname, pg_num)), free_pg_count=header['free_pg_count']-1)
+    return pg_num
+
+def vacuum(stmt):
+    tab_name = stmt['table']
+    if not os.path.exists(tab_name+'.tbl'):
+        raise OperationalError("Table \"{}\" does not exist.".format(tab_name))
+    for fname in [tab_name+'.tbl']+get_indexes(tab_name):
+        vacuum_file(fname)
+    return None
+
+def vacuum_file(fname):
+    num_pgs = count_pgs(fname)
+    free = sorted(set(range(num_pgs))-live_pgs(fname))
+    if len(free)==0:
+        return None
+    materialize_cursors()
+    free_set = set(free)
+    moves = {}
+    for src_pg in range(num_pgs-1, -1, -1):
+        if len(moves)==len(free) or free[len(moves)]>src_pg:
+            break
+        if src_pg not in free_set:
+            moves[src_pg] = free[len(moves)]
+    new_num_pgs = num_pgs-len(free)
+    for pg_num in range(num_pgs):
+        if pg_num in free_set:
+            continue
+        pg = get_pg(fname, pg_num)
+        relocated = relocate_pg_pointers(pg, moves)
+        if pg_num in moves or relocated!=pg:
+            save_pg(fname, moves.get(pg_num, pg_num), relocated)
+    header = read_file_header(fname)
+    update_file_header(fname, rightmost_leaf=moves.get(header['rightmost_leaf'], header['rightmost_leaf']), free_pg_head=0, free_pg_count=0)
+    flush_pgs()
+    checkpoint_wal()
+    for key in [key for key in BUFFER_POOL if key[0]==fname and key[1]>=new_num_pgs]:
+        del BUFFER_POOL[key]
+    if unmap_file(fname):
+        os.ftruncate(pager_fd(fname), FILE_HEADER_SIZE+new_num_pgs*SIZE_OF_PAGE)
+        pager_sync(fname)
+    return None
+
+def live_pgs(fname):
+    live = set()
+    pg_nums = [0]
+    while len(pg_nums)!=0:
+        pg_num = pg_nums.pop()
+        if pg_num in live:
+            continue
+        live.add(pg_num)
+        pg = get_pg(fname, pg_num)
+        if pg[0] in [2,5]:
+            pg_nums.append(pg_right_pointer(pg))
+            for cell_ind in range(struct.unpack(endian+'h', pg[2:4])[0]):
+                pg_nums.append(pg_tuple_left_child(pg, cell_ind))
+    return live
+
+def relocate_pg_pointers(pg, moves):
+    pg = bytearray(pg)
+    parent = struct.unpack(endian+'i', pg[10:14])[0]
+    pg[10:14] = struct.pack(endian+'i', moves.get(parent, parent))
+    right_pointer = pg_right_pointer(pg)
+    pg[6:10] = struct.pack(endian+'i', moves.get(right_pointer, right_pointer))
+    if pg[0] in [2,5]:
+        for cell_ind in range(struct.unpack(endian+'h', pg[2:4])[0]):
+            cell_top_idx, cell_bot_idx = get_tuple_indices(pg, cell_ind)
+            child_pg = struct.unpack(endian+'i', pg[cell_top_idx:cell_top_idx+4])[0]
+            pg[cell_top_idx:cell_top_idx+4] = struct.pack(endian+'i', moves.get(child_pg, child_pg))
+    return pg
+
 def datatype_to_python(datatype):
     datatype = datatype.lower()
     mapping = {"null":None,"tinyint":int, "smallint":int, "int":int, "bigint":int, "long":int, 'float':float, "double":float, "year":int, "time":datetime, "datetime":datetime, "date":datetime, "text":str}
@@ -1571,8 +2562,6 @@ def datatype_to_python(datatype):
 def to_python(schema_columns, schema, column, v):
     i = schema_columns.index(column)
     py = datatype_to_python(schema[i])
-    if v=='NULL':
-        return None
     if py != None:
         if schema[i].lower()=='datetime':
             try:
@@ -1594,110 +2583,325 @@ def to_python(schema_columns, schema, column, v):
     else:
         return None
 
-def extract_definitions(token_list):
-    definitions = []
-    tmp = []
-    tidx, token = token_list.token_next(1)
-    while token and not token.match(sqlparse.tokens.Punctuation, ')'):
-        tmp.append(token)
-        tidx, token = token_list.token_next(tidx, skip_ws=False)
-        if token and token.match(sqlparse.tokens.Punctuation, ','):
-            definitions.append(tmp)
-            tmp = []
-            tidx, token = token_list.token_next(tidx)
-    if tmp and isinstance(tmp[0], sqlparse.sql.Identifier):
-        definitions.append(tmp)
-    return definitions
-
-def parse_create_tab(SQL):
-    SQL = SQL.rstrip()
-    parsed = sqlparse.parse(SQL)[0]
-    tab_name = str(parsed[4])
-    _, par = parsed.token_next_by(i=sqlparse.sql.Parenthesis)
-    columns = extract_definitions(par)
-    col_list = []
-    definition_list = []
-    for column in columns:
-        definitions = ''.join(str(t) for t in column).split(',')
-        for definition in definitions:
-            d = ' '.join(str(t) for t in definition.split())
-            col_list.append(definition.split()[0])
-            definition_list.append(d)
-
+def create_tab_catalog_dictionary(stmt):
     d = {}
-    d[tab_name] = {}
+    d[stmt['table'].upper()] = {}
     c = 1
-    for col, definition in zip(col_list, definition_list):
+    for column in stmt['columns']:
         isnull = 'NO'
         isunique = 'NO'
         isprimary = 'NO'
-        definition = definition[len(col)+1:]
-        if 'NOT NULL' in definition:
+        if 'NOT NULL' in column['constraints']:
             isnull = 'YES'
-        elif 'UNIQUE' in definition:
+        elif 'UNIQUE' in column['constraints']:
             isunique = 'YES'
-        elif 'PRIMARY KEY' in definition:
+        elif 'PRIMARY KEY' in column['constraints']:
             isprimary = 'YES'
             isunique = 'YES'
             isnull = 'YES'
-        d[tab_name][col] = {"data_type" : definition.split()[0],
+        d[stmt['table'].upper()][column['name']] = {"data_type" : column['data_type'],
                               "ordinal_position" : c,
                                'is_nullable':isnull,
                                 'unique':isunique,
                                 'primary_key':isprimary}
+        c+=1
     return d
 
-def parse_insert_into(cmd_input):
-    query_match = "(?i)insert (?i)into\s+(.*?)\s*((?i)values\s(.*?)\s*)?;"
-    if re.match(query_match, cmd_input):
-        stmt = sqlparse.parse(cmd_input)[0]
-        tab_name = str(stmt.tokens[4])
-        col_names = tab_name[tab_name.find("(")+1:tab_name.find(")")]
-        column_list = [x.strip() for x in col_names.split(',')]
-        tab_name = tab_name.split()[0]
-        values = str(stmt.tokens[-2])
-        values = re.sub("\s", "", re.split(';',re.sub("(?i)values","",values))[0])
-        vals= values.replace(' ', '')
-        values = []
-        for v in vals.split('('):
-            if len(v)==0:
-                continue
-            v = v.replace('),','')
-            v = v.replace(',)','')
-            v = v.replace(')','')
-            values.append(v.split(','))
-
-        schema_col_names = get_col_names_from_catalog(tab_name)[1:]
-        schema, _ = catalog_schema(tab_name)
-        vals = []
-        for value in values:
-            temp = []
-            for col in schema_col_names:
-                if col.upper() in column_list:
-                    j = column_list.index(col.upper())
-                    v = value[j]
-                    temp.append(to_python(schema_col_names, schema, col, v))
-                else:
-                    temp.append(None)
-            vals.append(temp)
-        return tab_name, vals
+def tokenize_sql(SQL):
+    SQL = SQL.rstrip()
+    tokens = []
+    pos = 0
+    while pos<len(SQL):
+        match = SQL_TOKEN.match(SQL, pos)
+        if match is None:
+            raise ValueError("unexpected character {!r}".format(SQL[pos:].lstrip()[:1]))
+        string, op, punct, word = match.groups()
+        if string is not None:
+            tokens.append(('string', string[1:-1].replace("''", "'")))
+        elif op is not None:
+            tokens.append(('op', op))
+        elif punct is not None:
+            tokens.append(('punct', punct))
+        else:
+            tokens.append(('word', word))
+        pos = match.end()
+    return tokens
+
+def parse_sql(tokens):
+    state = {'tokens':tokens, 'pos':0, 'params':0}
+    stmt = parse_statement(state)
+    accept_punct(state, ';')
+    if state['pos']<len(tokens):
+        raise ValueError("unexpected {} after end of statement".format(describe_token(peek_token(state))))
+    stmt['num_params'] = state['params']
+    return stmt
+
+def parse_statement(state):
+    if accept_keyword(state, 'SELECT'):
+        return parse_select(state)
+    elif accept_keyword(state, 'INSERT', 'INTO'):
+        return parse_insert(state)
+    elif accept_keyword(state, 'CREATE', 'TABLE'):
+        return parse_create_table(state)
+    elif accept_keyword(state, 'CREATE', 'INDEX'):
+        return parse_create_index(state)
+    elif accept_keyword(state, 'DROP', 'TABLE'):
+        return {'type':'drop_table', 'table':parse_name(state)}
+    elif accept_keyword(state, 'VACUUM'):
+        return {'type':'vacuum', 'table':parse_name(state)}
+    elif accept_keyword(state, 'SHOW', 'TABLES'):
+        return {'type':'show_tables'}
+    elif accept_keyword(state, 'BEGIN'):
+        accept_keyword(state, 'TRANSACTION')
+        return {'type':'begin'}
+    for keyword in ['COMMIT', 'ROLLBACK', 'HELP', 'EXIT']:
+        if accept_keyword(state, keyword):
+            return {'type':keyword.lower()}
+    raise ValueError("unrecognized statement starting at {}".format(describe_token(peek_token(state))))
+
+def parse_select(state):
+    columns = [parse_select_column(state)]
+    while accept_punct(state, ','):
+        columns.append(parse_select_column(state))
+    expect_keyword(state, 'FROM')
+    stmt = {'type':'select', 'columns':columns, 'table':parse_name(state), 'joins':[], 'where':None, 'group_by':[], 'order_by':[], 'limit':None, 'offset':None}
+    while True:
+        if accept_keyword(state, 'LEFT'):
+            accept_keyword(state, 'OUTER')
+            expect_keyword(state, 'JOIN')
+            kind = 'left'
+        elif accept_keyword(state, 'INNER', 'JOIN') or accept_keyword(state, 'JOIN'):
+            kind = 'inner'
+        else:
+            break
+        join = {'kind':kind, 'table':parse_name(state)}
+        expect_keyword(state, 'ON')
+        join['left'] = parse_column(state)
+        if peek_token(state)!=('op', '='):
+            raise ValueError("JOIN ... ON only supports column = column near {}".format(describe_token(peek_token(state))))
+        state['pos']+=1
+        join['right'] = parse_column(state)
+        stmt['joins'].append(join)
+    if accept_keyword(state, 'WHERE'):
+        stmt['where'] = parse_condition(state)
+    if accept_keyword(state, 'GROUP', 'BY'):
+        stmt['group_by'].append(parse_column(state))
+        while accept_punct(state, ','):
+            stmt['group_by'].append(parse_column(state))
+    if accept_keyword(state, 'ORDER', 'BY'):
+        stmt['order_by'].append(parse_order_term(state))
+        while accept_punct(state, ','):
+            stmt['order_by'].append(parse_order_term(state))
+    if accept_keyword(state, 'LIMIT'):
+        stmt['limit'] = parse_count(state)
+    if accept_keyword(state, 'OFFSET'):
+        stmt['offset'] = parse_count(state)
+    return stmt
+
+def parse_order_term(state):
+    if peek_token(state)==('punct', '*'):
+        raise ValueError("ORDER BY needs a column")
+    term = {'column':parse_select_column(state), 'descending':False}
+    if accept_keyword(state, 'DESC'):
+        term['descending'] = True
     else:
-        print("Please enter correct query")
-        return None
+        accept_keyword(state, 'ASC')
+    return term
+
+def parse_select_column(state):
+    if accept_punct(state, '*'):
+        return '*'
+    kind, text = peek_token(state)
+    if kind=='word' and text.upper() in SQL_AGGREGATES and peek_token(state, 1)==('punct', '('):
+        state['pos']+=2
+        if accept_punct(state, '*'):
+            if text.upper()!='COUNT':
+                raise ValueError("only COUNT accepts *")
+            column = '*'
+        else:
+            column = parse_column(state)
+        expect_punct(state, ')')
+        return {'type':'aggregate', 'func':text.upper(), 'column':column}
+    return parse_column(state)
+
+def parse_condition(state):
+    args = [parse_conjunction(state)]
+    while accept_keyword(state, 'OR'):
+        args.append(parse_conjunction(state))
+    if len(args)==1:
+        return args[0]
+    return {'type':'or', 'args':args}
+
+def parse_conjunction(state):
+    args = [parse_negation(state)]
+    while accept_keyword(state, 'AND'):
+        args.append(parse_negation(state))
+    if len(args)==1:
+        return args[0]
+    return {'type':'and', 'args':args}
+
+def parse_negation(state):
+    if accept_keyword(state, 'NOT'):
+        return {'type':'not', 'arg':parse_negation(state)}
+    if accept_punct(state, '('):
+        condition = parse_condition(state)
+        expect_punct(state, ')')
+        return condition
+    return parse_predicate(state)
+
+def parse_predicate(state):
+    column = parse_column(state)
+    kind, op = peek_token(state)
+    if kind=='op':
+        state['pos']+=1
+        return {'type':'compare', 'column':column, 'op':op, 'value':parse_value(state)}
+    elif accept_keyword(state, 'IS', 'NOT', 'NULL'):
+        return {'type':'is_null', 'column':column, 'negated':True}
+    elif accept_keyword(state, 'IS', 'NULL'):
+        return {'type':'is_null', 'column':column, 'negated':False}
+    negated = accept_keyword(state, 'NOT')
+    if accept_keyword(state, 'IN'):
+        return {'type':'in', 'column':column, 'values':parse_value_list(state), 'negated':negated}
+    elif accept_keyword(state, 'BETWEEN'):
+        low = parse_value(state)
+        expect_keyword(state, 'AND')
+        return {'type':'between', 'column':column, 'low':low, 'high':parse_value(state), 'negated':negated}
+    raise ValueError("expected a comparison, IN, BETWEEN or IS NULL near {}".format(describe_token(peek_token(state))))
+
+def parse_count(state):
+    kind, text = peek_token(state)
+    if kind=='word' and text.isdigit():
+        state['pos']+=1
+        return {'type':'literal', 'text':text}
+    elif kind=='punct' and text=='?':
+        return parse_value(state)
+    raise ValueError("expected a row count near {}".format(describe_token(peek_token(state))))
+
+def parse_insert(state):
+    stmt = {'type':'insert', 'table':parse_name(state), 'columns':None, 'rows':[]}
+    if accept_punct(state, '('):
+        stmt['columns'] = parse_name_list(state)
+    expect_keyword(state, 'VALUES')
+    stmt['rows'].append(parse_value_list(state))
+    while accept_punct(state, ','):
+        stmt['rows'].append(parse_value_list(state))
+    return stmt
+
+def parse_value_list(state):
+    expect_punct(state, '(')
+    values = [parse_value(state)]
+    while accept_punct(state, ','):
+        values.append(parse_value(state))
+    expect_punct(state, ')')
+    return values
 
-def parse_drop_tab(cmd_input):
-    return cmd_input[len("drop table "):-1].lower()
-    query_match = "(?i)DROP\s+(.*?)\s*(?i)TABLE\s+[a-zA-Z]+\;"
-    if re.match(query_match, cmd_input):
-        stmt = sqlparse.parse(cmd_input)[0]
-        tabname = str(stmt.tokens[-2])
-        return tabname
-    else:
-        print("Please enter correct query")
+def parse_create_table(state):
+    stmt = {'type':'create_table', 'table':parse_name(state), 'columns':[]}
+    expect_punct(state, '(')
+    while True:
+        column = {'name':parse_name(state), 'data_type':parse_datatype(state), 'constraints':[]}
+        while True:
+            if accept_keyword(state, 'PRIMARY', 'KEY'):
+                column['constraints'].append('PRIMARY KEY')
+            elif accept_keyword(state, 'NOT', 'NULL'):
+                column['constraints'].append('NOT NULL')
+            elif accept_keyword(state, 'UNIQUE'):
+                column['constraints'].append('UNIQUE')
+            elif accept_keyword(state, 'NULL'):
+                pass
+            else:
+                break
+        stmt['columns'].append(column)
+        if not accept_punct(state, ','):
+            break
+    expect_punct(state, ')')
+    return stmt
+
+def parse_datatype(state):
+    kind, text = peek_token(state)
+    if kind!='word' or text.upper() not in SQL_DATATYPES:
+        raise ValueError("expected a data type near {}".format(describe_token(peek_token(state))))
+    state['pos']+=1
+    return text.upper()
+
+def parse_create_index(state):
+    kind, text = peek_token(state)
+    if kind=='word' and text.upper()!='ON':
+        parse_name(state)
+    expect_keyword(state, 'ON')
+    stmt = {'type':'create_index', 'table':parse_name(state)}
+    expect_punct(state, '(')
+    stmt['column'] = parse_name(state)
+    expect_punct(state, ')')
+    return stmt
+
+def parse_name_list(state):
+    names = [parse_name(state)]
+    while accept_punct(state, ','):
+        names.append(parse_name(state))
+    expect_punct(state, ')')
+    return names
+
+def parse_name(state):
+    kind, text = peek_token(state)
+    if kind!='word' or not SQL_NAME.match(text):
+        raise ValueError("expected a name near {}".format(describe_token(peek_token(state))))
+    state['pos']+=1
+    return text.lower()
+
+def parse_column(state):
+    kind, text = peek_token(state)
+    if kind!='word' or not SQL_COLUMN.match(text):
+        raise ValueError("expected a column near {}".format(describe_token(peek_token(state))))
+    state['pos']+=1
+    return text.lower()
+
+def parse_value(state):
+    kind, text = peek_token(state)
+    if kind=='punct' and text=='?':
+        state['pos']+=1
+        state['params']+=1
+        return {'type':'param', 'index':state['params']-1}
+    elif kind=='word' and text.upper()=='NULL':
+        state['pos']+=1
+        return {'type':'null'}
+    elif kind in ['word', 'string']:
+        state['pos']+=1
+        return {'type':'literal', 'text':text}
+    raise ValueError("expected a value near {}".format(describe_token(peek_token(state))))
+
+def peek_token(state, offset=0):
+    pos = state['pos']+offset
+    if pos<len(state['tokens']):
+        return state['tokens'][pos]
+    return ('end', '')
+
+def describe_token(token):
+    if token[0]=='end':
+        return "end of statement"
+    return "'{}'".format(token[1])
+
+def accept_keyword(state, *keywords):
+    for offset, keyword in enumerate(keywords):
+        kind, text = peek_token(state, offset)
+        if kind!='word' or text.upper()!=keyword:
+            return False
+    state['pos']+=len(keywords)
+    return True
+
+def expect_keyword(state, *keywords):
+    if not accept_keyword(state, *keywords):
+        raise ValueError("expected {} near {}".format(' '.join(keywords), describe_token(peek_token(state))))
+
+def accept_punct(state, punct):
+    if peek_token(state)==('punct', punct):
+        state['pos']+=1
+        return True
+    return False
 
-def create_index(cmd_input):
-    print("create index \'{}\'".format(cmd_input))
-    return None
+def expect_punct(state, punct):
+    if not accept_punct(state, punct):
+        raise ValueError("expected '{}' near {}".format(punct, describe_token(peek_token(state))))
 
 def get_operator_fn(op):
     return {
@@ -1706,48 +2910,949 @@ def get_operator_fn(op):
     '>' : operator.gt,
     '>=' : operator.ge,
     '<=' : operator.le,
+    '<>' : operator.ne,
+    '!=' : operator.ne,
     }[op]
 
-def query(cmd_input: str):
-    operator_list = ['=','>','<','>=','<=']
-    query_match = "select\s+(.*?)\s*(?i)from\s+(.*?)\s*((?i)where\s(.*?)\s*)?;"
-    if "WHERE" not in cmd_input:
-        cmd_input = cmd_input[:-1]+" WHERE ROWID > 0;"
-    stmt = sqlparse.parse(cmd_input)[0]
-    where_clause = str(stmt.tokens[-1])
-    where_clause = re.sub("\s", "", re.split(';',re.sub("(?i)where","",where_clause))[0])
-    res = [i for i in operator_list if where_clause.find(i)!=-1]
-    where_clause = re.split('>=|<=|=|>|<|\s',where_clause)
-    tabname = str(stmt.tokens[-3]).split(",")[0]
-    columns = str(stmt.tokens[2]).split(",")
-    return str(where_clause[0]),str(where_clause[1]),res[-1], tabname, columns
-
 def where(SQL):
-    operand_where, value_where, oper, tab_name, columns =  query(SQL)
-    tab_name=tab_name.lower()
+    plan = prepare(SQL)
+    if plan['kind']!='select':
+        return None, None, None
+    return run_select(plan, ())
+
+def plan_select(stmt):
+    tab_name = stmt['table']
+    tab_names = [tab_name]+[join['table'] for join in stmt['joins']]
+    for name in tab_names:
+        if not os.path.exists(name+'.tbl'):
+            raise ProgrammingError("Table {} does not exist.".format(name))
+    if len(set(tab_names))!=len(tab_names):
+        raise ProgrammingError("A table can only appear once in a join.")
+    if stmt['joins']:
+        column_list, schema = join_columns(tab_names)
+    else:
+        schema, _ = catalog_schema(tab_name)
+        column_list = get_col_names_from_catalog(tab_name)
+    resolve_columns(stmt, column_list, tab_names)
+    joins = plan_joins(stmt, column_list, schema)
+    plan = {'kind':'select', 'tab_name':tab_name, 'joins':joins, 'projection':None, 'columns':None, 'types':None, 'aggregates':None, 'group_cols':None,
+            'order_by':[], 'order_index':None, 'order_nulls':False, 'schema_columns':column_list[1:], 'schema':schema, 'predicate':None, 'driver':None, 'batch_driver':None, 'residual':True,
+            'limit':plan_value(stmt['limit'], int), 'offset':plan_value(stmt['offset'], int), 'num_params':stmt['num_params']}
+    types = ['INT']+schema
+    if stmt['group_by'] or any(type(column)==dict for column in stmt['columns']):
+        plan_aggregates(plan, stmt, column_list, types)
+    else:
+        plan['projection'] = select_projection(column_list, stmt['columns'])
+        plan['columns'] = [column_list[col] for col in plan['projection']]
+        plan['types'] = [types[col] for col in plan['projection']]
+    if stmt['where'] is not None:
+        plan['predicate'] = plan_predicate(stmt['where'], tab_name, column_list, schema)
+        if not joins:
+            plan_driver(plan)
+    if stmt['order_by']:
+        plan_order(plan, stmt, column_list)
+    return plan
+
+def join_columns(tab_names):
+    column_list = []
+    types = []
+    for tab_name in tab_names:
+        schema, _ = catalog_schema(tab_name)
+        column_list.extend('{}.{}'.format(tab_name, column) for column in get_col_names_from_catalog(tab_name))
+        types.extend(['INT']+schema)
+    return column_list, types[1:]
+
+def resolve_columns(stmt, column_list, tab_names):
+    resolve = lambda column: resolve_column(column, column_list, tab_names)
+    for i, column in enumerate(stmt['columns']):
+        if type(column)==dict:
+            if column['column']!='*':
+                column['column'] = resolve(column['column'])
+        elif column!='*':
+            stmt['columns'][i] = resolve(column)
+    for join in stmt['joins']:
+        join['left'] = resolve(join['left'])
+        join['right'] = resolve(join['right'])
+    if stmt['where'] is not None:
+        resolve_predicate_columns(stmt['where'], resolve)
+    stmt['group_by'] = [resolve(column) for column in stmt['group_by']]
+    for term in stmt['order_by']:
+        if type(term['column'])==dict:
+            if term['column']['column']!='*':
+                term['column']['column'] = resolve(term['column']['column'])
+        else:
+            term['column'] = resolve(term['column'])
+
+def resolve_predicate_columns(node, resolve):
+    if node['type'] in ['and', 'or']:
+        for arg in node['args']:
+            resolve_predicate_columns(arg, resolve)
+    elif node['type']=='not':
+        resolve_predicate_columns(node['arg'], resolve)
+    else:
+        node['column'] = resolve(node['column'])
+
+def resolve_column(column, column_list, tab_names):
+    if column in column_list:
+        return column
+    elif '.' in column:
+        tab_name, name = column.split('.')
+        if len(tab_names)==1 and tab_name==tab_names[0] and name in column_list:
+            return name
+    else:
+        matches = [name for name in column_list if name.split('.')[-1]==column]
+        if len(matches)==1:
+            return matches[0]
+        elif len(matches)>1:
+            raise ProgrammingError("Column {} is ambiguous; qualify it with a table name.".format(column))
+    raise ProgrammingError("Column {} does not exist.".format(column))
+
+def plan_joins(stmt, column_list, schema):
+    types = ['INT']+schema
+    joins = []
+    offset = len(get_col_names_from_catalog(stmt['table']))
+    for join in stmt['joins']:
+        width = len(get_col_names_from_catalog(join['table']))
+        left = column_list.index(join['left'])
+        right = column_list.index(join['right'])
+        if offset<=left<offset+width:
+            left, right = right, left
+        if not (left<offset and offset<=right<offset+width):
+            raise ProgrammingError("JOIN {} ON must compare a column of {} with a column of an earlier table.".format(join['table'], join['table']))
+        if datatype_to_python(types[left])!=datatype_to_python(types[right]):
+            probe = None
+        elif right==offset:
+            probe = 'rowid'
+        else:
+            probe = '{}_{}.ndx'.format(join['table'], column_list[right].split('.')[1])
+            if probe not in get_indexes(join['table']):
+                probe = None
+        joins.append({'table':join['table'], 'kind':join['kind'], 'left_col':left, 'right_col':right-offset, 'width':width, 'probe':probe})
+        offset += width
+    return joins
+
+def plan_driver(plan):
+    predicate = plan['predicate']
+    schema = plan['schema']
+    indexes = get_indexes(plan['tab_name'])
+    for node in predicate['args'] if predicate['type']=='and' else [predicate]:
+        if node['type']!='compare' or node['op'] not in ['=', '<', '>', '<=', '>=']:
+            continue
+        if node['col']==0 or node['index_fname'] in indexes:
+            if plan['driver'] is None or (plan['driver']['col']!=0 and node['col']==0):
+                plan['driver'] = node
+        elif datatype_to_int(schema[node['col']-1]) in BATCH_DTYPES and plan['batch_driver'] is None:
+            plan['batch_driver'] = node
+    plan['residual'] = plan['driver'] is not predicate
+
+def plan_order(plan, stmt, column_list):
+    for term in stmt['order_by']:
+        if plan['aggregates'] is not None:
+            if term['column'] not in stmt['columns']:
+                raise ProgrammingError("ORDER BY term {} must appear in the select list.".format(describe_column(term['column'])))
+            plan['order_by'].append((stmt['columns'].index(term['column']), term['descending']))
+        elif type(term['column'])==dict:
+            raise ProgrammingError("ORDER BY term {} needs GROUP BY or an aggregate select list.".format(describe_column(term['column'])))
+        elif term['column'] not in column_list:
+            raise ProgrammingError("Column {} does not exist.".format(term['column']))
+        else:
+            plan['order_by'].append((column_list.index(term['column']), term['descending']))
+    if plan['aggregates'] is not None or plan['joins'] or len(plan['order_by'])!=1:
+        return True
+    col, descending = plan['order_by'][0]
+    if col==0:
+        if not descending:
+            plan['order_by'] = []
+        return True
+    index_fname = '{}_{}.ndx'.format(plan['tab_name'], plan['schema_columns'][col-1])
+    driver = plan['driver']
+    if index_fname in get_indexes(plan['tab_name']) and (driver is None or driver['col']==col):
+        plan['order_index'] = index_fname
+        plan['order_nulls'] = not rejects_null(plan['predicate'], col)
+    return True
+
+def rejects_null(predicate, col):
+    if predicate is None:
+        return False
+    for node in predicate['args'] if predicate['type']=='and' else [predicate]:
+        if node['type'] in ['compare', 'in', 'between'] and not node.get('negated') and node['col']==col:
+            return True
+        elif node['type']=='is_null' and node['negated'] and node['col']==col:
+            return True
+    return False
+
+def describe_column(column):
+    if type(column)==dict:
+        return "{}({})".format(column['func'].lower(), column['column'])
+    return column
+
+def plan_aggregates(plan, stmt, column_list, types):
+    for column in stmt['group_by']+[column['column'] if type(column)==dict else column for column in stmt['columns']]:
+        if column=='*' and column in stmt['group_by']+stmt['columns']:
+            raise ProgrammingError("SELECT * cannot be combined with aggregates or GROUP BY.")
+        elif column!='*' and column not in column_list:
+            raise ProgrammingError("Column {} does not exist.".format(column))
+    plan['group_cols'] = [column_list.index(column) for column in stmt['group_by']]
+    plan['aggregates'] = []
+    plan['outputs'] = []
+    plan['columns'] = []
+    plan['types'] = []
+    for column in stmt['columns']:
+        if type(column)==dict:
+            col = None if column['column']=='*' else column_list.index(column['column'])
+            plan['outputs'].append(('aggregate', len(plan['aggregates'])))
+            plan['aggregates'].append((column['func'], col))
+            plan['columns'].append(describe_column(column))
+            if column['func']=='COUNT':
+                plan['types'].append('INT')
+            elif column['func']=='AVG':
+                plan['types'].append('DOUBLE')
+            else:
+                plan['types'].append(types[col])
+        elif column in stmt['group_by']:
+            plan['outputs'].append(('group', stmt['group_by'].index(column)))
+            plan['columns'].append(column)
+            plan['types'].append(types[column_list.index(column)])
+        else:
+            raise ProgrammingError("Column {} must appear in GROUP BY or inside an aggregate.".format(column))
+    return True
+
+def plan_predicate(node, tab_name, column_list, schema):
+    if node['type'] in ['and', 'or']:
+        return {'type':node['type'], 'args':[plan_predicate(arg, tab_name, column_list, schema) for arg in node['args']]}
+    elif node['type']=='not':
+        return {'type':'not', 'arg':plan_predicate(node['arg'], tab_name, column_list, schema)}
+    if node['column'] not in column_list:
+        raise ProgrammingError("Column {} does not exist.".format(node['column']))
+    col = column_list.index(node['column'])
+    if col==0:
+        convert = int
+    else:
+        convert = lambda text: to_python(column_list[1:], schema, node['column'], text)
+    planned = {'type':node['type'], 'col':col, 'column':node['column'], 'index_fname':'{}_{}.ndx'.format(tab_name, node['column'])}
+    if node['type']=='compare':
+        planned['op'] = node['op']
+        planned['value'] = plan_value(node['value'], convert)
+    elif node['type']=='in':
+        planned['values'] = [plan_value(value, convert) for value in node['values']]
+    elif node['type']=='between':
+        planned['low'] = plan_value(node['low'], convert)
+        planned['high'] = plan_value(node['high'], convert)
+    if 'negated' in node:
+        planned['negated'] = node['negated']
+    return planned
+
+def plan_insert(stmt):
+    tab_name = stmt['table']
+    if not os.path.exists(tab_name+'.tbl'):
+        raise ProgrammingError("Table {} does not exist.".format(tab_name))
+    schema_col_names = get_col_names_from_catalog(tab_name)[1:]
     schema, _ = catalog_schema(tab_name)
-    if not os.path.exists(tab_name.lower()+'.tbl'):
-        print("Table {} does not exist.".format(tab_name))
-        return None, None
-    column_list = get_col_names_from_catalog(tab_name)
-    index = column_list.index(operand_where.lower())
-    if operand_where == -1:
-        print("Please enter correct query")
-    matched_tuples = []
-    flag = False
-    for node in read_all_pgs_in_file(tab_name + ".tbl"):
-        if node['is_leaf'] :
-            for tuple in node['cells']:
-                data = tuple['data']
-                if index == 0 :
-                    operand1 = tuple['rowid']
-                    operand2 = int(value_where)
+    column_list = stmt['columns'] if stmt['columns'] is not None else schema_col_names
+    for col in column_list:
+        if col not in schema_col_names:
+            raise ProgrammingError("Column {} does not exist in table {}.".format(col, tab_name))
+    rows = []
+    for value in stmt['rows']:
+        if len(value)!=len(column_list):
+            raise ProgrammingError("Expected {} values, got {}.".format(len(column_list), len(value)))
+        row = []
+        for col in schema_col_names:
+            if col in column_list:
+                row.append(plan_value(value[column_list.index(col)], lambda text: to_python(schema_col_names, schema, col, text)))
+            else:
+                row.append(('const', None))
+        rows.append(row)
+    return {'kind':'insert', 'tab_name':tab_name, 'schema_columns':schema_col_names, 'schema':schema, 'rows':rows, 'num_params':stmt['num_params']}
+
+def plan_value(node, convert):
+    if node is None:
+        return ('const', None)
+    elif node['type']=='param':
+        return ('param', node['index'])
+    elif node['type']=='null':
+        return ('const', None)
+    return ('const', convert(node['text']))
+
+def run_select(plan, params):
+    fname = plan['tab_name']+'.tbl'
+    driver = plan['driver']
+    residual = plan['residual']
+    if plan['joins']:
+        cells = join_rows(plan)
+        residual = True
+    elif plan['order_index'] is not None:
+        col, descending = plan['order_by'][0]
+        if driver is None or descending:
+            cells = index_order_cells(fname, plan['order_index'], col, descending, plan['order_nulls'])
+        else:
+            operand = bind_operand(plan, driver, driver['value'], params)
+            cells = iter(()) if operand is None else index_order_cells(fname, plan['order_index'], col, False, False, driver['op'], operand)
+        residual = True
+    elif driver is not None:
+        operand = bind_operand(plan, driver, driver['value'], params)
+        if operand is None:
+            cells = iter(())
+        elif driver['col']==0:
+            cells = rowid_range_cells(fname, driver['op'], operand)
+        else:
+            cells = index_scan_cells(fname, driver['index_fname'], driver['op'], operand)
+    elif np is not None and BATCH_SCAN and plan['batch_driver'] is not None:
+        node = plan['batch_driver']
+        operand = bind_operand(plan, node, node['value'], params)
+        if operand is None:
+            cells = iter(())
+        else:
+            cells = batch_scan_cells(fname, node['col']-1, datatype_to_int(plan['schema'][node['col']-1]), node['op'], operand)
+            residual = node is not plan['predicate']
+    else:
+        cells = mmap_scan_cells(fname)
+    if plan['predicate'] is not None and residual:
+        predicate = compile_predicate(plan, plan['predicate'], params)
+        cells = (cell for cell in cells if predicate(cell))
+    if plan['aggregates'] is not None:
+        rows = aggregate_rows(plan, cells)
+    else:
+        rows = None
+    limit = bind_value(plan['limit'], params)
+    offset = bind_value(plan['offset'], params)
+    if plan['order_by'] and plan['order_index'] is None:
+        rows = sort_rows(plan, cells if rows is None else rows, None if limit is None else int(offset or 0)+int(limit))
+    if limit is not None or offset:
+        offset = int(offset or 0)
+        if rows is None:
+            cells = itertools.islice(cells, offset, None if limit is None else offset+int(limit))
+        else:
+            rows = itertools.islice(rows, offset, None if limit is None else offset+int(limit))
+    if rows is None:
+        fields = plan_fields(plan)
+        rows = (fields(cell, plan['projection']) for cell in cells)
+    return plan['tab_name'], plan['columns'], rows
+
+def plan_fields(plan):
+    if plan['joins']:
+        return row_fields
+    return tab_cell_fields
+
+def row_fields(row, cols):
+    return [row[col] for col in cols]
+
+def join_rows(plan):
+    fname = plan['tab_name']+'.tbl'
+    cols = list(range(len(get_col_names_from_catalog(plan['tab_name']))))
+    rows = (tab_cell_fields(cell, cols) for cell in mmap_scan_cells(fname))
+    left_rows = tab_row_count(fname)
+    for join in plan['joins']:
+        if choose_join_method(join, left_rows)=='index':
+            rows = index_join_rows(rows, join)
+        else:
+            rows = hash_join_rows(rows, join, left_rows)
+    return rows
+
+def choose_join_method(join, left_rows):
+    if join['probe'] is None:
+        return 'hash'
+    fname = join['table']+'.tbl'
+    probe_pgs = tree_depth(fname)
+    if join['probe']!='rowid':
+        probe_pgs += tree_depth(join['probe'])
+    if left_rows*probe_pgs<count_pgs(fname):
+        return 'index'
+    return 'hash'
+
+def tree_depth(fname):
+    depth = 1
+    pg = get_pg(fname, 0)
+    while pg[0] in [2,5]:
+        pg = get_pg(fname, struct.unpack(endian+'i', pg[6:10])[0])
+        depth += 1
+    return depth
+
+def tab_row_count(fname):
+    return sum(struct.unpack(endian+'h', pg[2:4])[0] for pg in mmap_scan_leaf_pgs(fname))
+
+def index_join_rows(rows, join):
+    JOIN_STATS['index']+=1
+    fname = join['table']+'.tbl'
+    cols = list(range(join['width']))
+    nulls = [None]*join['width']
+    for row in rows:
+        key = row[join['left_col']]
+        if key is None:
+            cells = []
+        elif join['probe']=='rowid':
+            cells = [cell for cell in [tab_cell_given_rowid(fname, key)] if cell is not None]
+        else:
+            cells = index_scan_cells(fname, join['probe'], '=', key)
+        matched = False
+        for cell in cells:
+            matched = True
+            yield row+tab_cell_fields(cell, cols)
+        if not matched and join['kind']=='left':
+            yield row+nulls
+
+def hash_join_rows(rows, join, left_rows):
+    fname = join['table']+'.tbl'
+    cols = list(range(join['width']))
+    right = ((row[join['right_col']], row) for row in (tab_cell_fields(cell, cols) for cell in mmap_scan_cells(fname)))
+    left = ((row[join['left_col']], row) for row in rows)
+    right_rows = tab_row_count(fname)
+    build_left = join['kind']=='inner' and left_rows<right_rows
+    partitions = min(left_rows, right_rows)//JOIN_BUFFER_ITEMS+1
+    if partitions==1:
+        JOIN_STATS['hash']+=1
+        left_parts, right_parts = [left], [right]
+    else:
+        JOIN_STATS['grace']+=1
+        right_parts = partition_rows(right, partitions)
+        left_parts = partition_rows(left, partitions)
+    for left_part, right_part in zip(left_parts, right_parts):
+        if partitions>1:
+            left_part, right_part = read_sorted_run(left_part), read_sorted_run(right_part)
+        if build_left:
+            table = build_hash_table(left_part)
+            for key, row in right_part:
+                for match in table.get(key, []) if key is not None else []:
+                    yield match+row
+        else:
+            for row in probe_hash_table(left_part, build_hash_table(right_part), join):
+                yield row
+
+def build_hash_table(entries):
+    table = {}
+    for key, row in entries:
+        if key is not None:
+            table.setdefault(key, []).append(row)
+    return table
+
+def probe_hash_table(entries, table, join):
+    nulls = [None]*join['width']
+    for key, row in entries:
+        matches = None if key is None else table.get(key)
+        if matches:
+            for match in matches:
+                yield row+match
+        elif join['kind']=='left':
+            yield row+nulls
+
+def partition_rows(entries, partitions):
+    runs = [tempfile.TemporaryFile() for i in range(partitions)]
+    buffers = [[] for i in range(partitions)]
+    for entry in entries:
+        part = hash(entry[0])%partitions
+        buffers[part].append(entry)
+        if len(buffers[part])>=SORT_RUN_CHUNK:
+            pickle.dump(buffers[part], runs[part], pickle.HIGHEST_PROTOCOL)
+            buffers[part] = []
+    for run, buffer in zip(runs, buffers):
+        if len(buffer)!=0:
+            pickle.dump(buffer, run, pickle.HIGHEST_PROTOCOL)
+        run.seek(0)
+    return runs
+
+def sort_rows(plan, rows, limit):
+    keys = [pos for pos, descending in plan['order_by']]
+    directions = [descending for pos, descending in plan['order_by']]
+    fields = plan_fields(plan)
+    if plan['aggregates'] is None:
+        if not plan['joins']:
+            rows = (bytes(cell) for cell in rows)
+        items = ((sort_key(fields(row, keys), directions), seq, row) for seq, row in enumerate(rows))
+    else:
+        items = ((sort_key([row[pos] for pos in keys], directions), seq, row) for seq, row in enumerate(rows))
+    if limit is not None and limit<=SORT_BUFFER_ITEMS:
+        items = heapq.nsmallest(limit, items)
+    else:
+        items = external_sort(items)
+    if plan['aggregates'] is None:
+        return (fields(item[2], plan['projection']) for item in items)
+    return (item[2] for item in items)
+
+def sort_key(values, directions):
+    key = []
+    for value, descending in zip(values, directions):
+        if descending:
+            key.append(SortDescending((value is None, value)))
+        else:
+            key.append((value is None, value))
+    return tuple(key)
+
+class SortDescending(object):
+    __slots__ = ['value']
+
+    def __init__(self, value):
+        self.value = value
+
+    def __getstate__(self):
+        return self.value
+
+    def __setstate__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value<self.value
+
+    def __eq__(self, other):
+        return self.value==other.value
+
+def index_order_cells(fname, index_fname, col, descending, nulls, oper=None, operand=None):
+    if descending:
+        index_tuples = index_tuples_descending(index_fname)
+    else:
+        index_tuples = index_range_tuples(index_fname, oper, operand)
+    if nulls and descending:
+        for cell in mmap_scan_cells(fname):
+            if tab_cell_column(cell, col-1) is None:
+                yield cell
+    for index_tuple in index_tuples:
+        for rowid in sorted(index_tuple['assoc_rowids'], reverse=descending):
+            cell = tab_cell_given_rowid(fname, rowid)
+            if cell is not None:
+                yield cell
+    if nulls and not descending:
+        for cell in mmap_scan_cells(fname):
+            if tab_cell_column(cell, col-1) is None:
+                yield cell
+
+def index_tuples_descending(fname, pg_num=0):
+    pg = get_pg(fname, pg_num)
+    is_interior = pg[0]==2
+    number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
+    if is_interior:
+        for tuple in index_tuples_descending(fname, struct.unpack(endian+'i', pg[6:10])[0]):
+            yield tuple
+    for cell_ind in reversed(range(number_tuples)):
+        cell_top_idx, cell_bot_idx = get_tuple_indices(pg, cell_ind)
+        yield index_read_tuple(pg[cell_top_idx:cell_bot_idx], is_interior)
+        if is_interior:
+            for tuple in index_tuples_descending(fname, pg_tuple_left_child(pg, cell_ind)):
+                yield tuple
+
+def aggregate_rows(plan, cells):
+    if plan['predicate'] is None and not plan['group_cols'] and not plan['joins']:
+        values = [aggregate_from_metadata(plan, func, col) for func, col in plan['aggregates']]
+        if None not in values:
+            yield [values[ind][0] for kind, ind in plan['outputs']]
+            return
+    cols = sorted(set(plan['group_cols']+[col for func, col in plan['aggregates'] if col is not None]))
+    group_pos = [cols.index(col) for col in plan['group_cols']]
+    aggregates = [(func, None if col is None else cols.index(col)) for func, col in plan['aggregates']]
+    groups = OrderedDict()
+    if not group_pos:
+        groups[()] = new_aggregate_states(aggregates)
+    fields = plan_fields(plan)
+    for cell in cells:
+        values = fields(cell, cols)
+        key = tuple(values[pos] for pos in group_pos)
+        states = groups.get(key)
+        if states is None:
+            states = groups[key] = new_aggregate_states(aggregates)
+        for j, (func, pos) in enumerate(aggregates):
+            if pos is None:
+                states[j]+=1
+                continue
+            value = values[pos]
+            if value is None:
+                continue
+            if func=='COUNT':
+                states[j]+=1
+            elif func in ['SUM', 'AVG']:
+                states[j][0]+=1
+                states[j][1]+=value
+            elif states[j] is None or (func=='MIN' and value<states[j]) or (func=='MAX' and value>states[j]):
+                states[j] = value
+    for key, states in groups.items():
+        results = []
+        for (func, pos), state in zip(aggregates, states):
+            if func=='SUM':
+                results.append(state[1] if state[0] else None)
+            elif func=='AVG':
+                results.append(state[1]/state[0] if state[0] else None)
+            else:
+                results.append(state)
+        yield [key[ind] if kind=='group' else results[ind] for kind, ind in plan['outputs']]
+
+def new_aggregate_states(aggregates):
+    states = []
+    for func, pos in aggregates:
+        if func=='COUNT':
+            states.append(0)
+        elif func in ['SUM', 'AVG']:
+            states.append([0, 0])
+        else:
+            states.append(None)
+    return states
+
+def aggregate_from_metadata(plan, func, col):
+    fname = plan['tab_name']+'.tbl'
+    if func=='COUNT' and col is None:
+        return (tab_row_count(fname),)
+    index_fname = '{}_{}.ndx'.format(plan['tab_name'], plan['schema_columns'][col-1]) if col else None
+    if func in ['MIN', 'MAX'] and index_fname in get_indexes(plan['tab_name']):
+        return index_extreme_value(index_fname, func=='MAX')
+    return None
+
+def index_extreme_value(fname, largest):
+    pg_num = 0
+    pg = get_pg(fname, pg_num)
+    while pg[0]==2:
+        if largest:
+            pg_num = struct.unpack(endian+'i', pg[6:10])[0]
+        else:
+            pg_num = pg_tuple_left_child(pg, 0)
+        pg = get_pg(fname, pg_num)
+    number_tuples = struct.unpack(endian+'h', pg[2:4])[0]
+    if number_tuples==0:
+        return (None,) if pg_num==0 else None
+    return (pg_tuple_key(pg, number_tuples-1 if largest else 0),)
+
+def bind_value(spec, params):
+    kind, value = spec
+    if kind=='param':
+        return params[value]
+    return value
+
+def bind_operand(plan, node, spec, params):
+    kind, value = spec
+    if kind=='const':
+        return value
+    value = params[value]
+    if node['col']==0:
+        return None if value is None else int(value)
+    return bind_param(value, plan['schema_columns'], plan['schema'], node['column'])
+
+def compile_predicate(plan, node, params):
+    kind = node['type']
+    if kind in ['and', 'or']:
+        args = [compile_predicate(plan, arg, params) for arg in node['args']]
+        stop = kind=='or'
+        def predicate(cell):
+            result = not stop
+            for arg in args:
+                value = arg(cell)
+                if value is stop:
+                    return stop
+                elif value is None:
+                    result = None
+            return result
+        return predicate
+    elif kind=='not':
+        arg = compile_predicate(plan, node['arg'], params)
+        def predicate(cell):
+            value = arg(cell)
+            return None if value is None else not value
+        return predicate
+    col = node['col']
+    if plan['joins']:
+        getter = operator.itemgetter(col)
+    elif col==0:
+        getter = tab_cell_rowid
+    else:
+        getter = lambda cell: tab_cell_column(cell, col-1)
+    if kind=='is_null':
+        negated = node['negated']
+        return lambda cell: (getter(cell) is None) is not negated
+    elif kind=='compare':
+        operator_fn = get_operator_fn(node['op'])
+        operand = bind_operand(plan, node, node['value'], params)
+        if operand is None:
+            return lambda cell: None
+        def predicate(cell):
+            value = getter(cell)
+            if value is None:
+                return None
+            return operator_fn(value, operand)
+        return predicate
+    elif kind=='in':
+        operands = [bind_operand(plan, node, spec, params) for spec in node['values']]
+        has_null = None in operands
+        operands = set(operand for operand in operands if operand is not None)
+        negated = node['negated']
+        def predicate(cell):
+            value = getter(cell)
+            if value is None:
+                return None
+            if value in operands:
+                return not negated
+            return None if has_null else negated
+        return predicate
+    elif kind=='between':
+        low = bind_operand(plan, node, node['low'], params)
+        high = bind_operand(plan, node, node['high'], params)
+        negated = node['negated']
+        if low is None or high is None:
+            return lambda cell: None
+        def predicate(cell):
+            value = getter(cell)
+            if value is None:
+                return None
+            return (low<=value<=high) is not negated
+        return predicate
+    raise ValueError("unknown predicate {}".format(kind))
+
+def bind_param(val, schema_columns, schema, column):
+    if isinstance(val, str) and datatype_to_python(schema[schema_columns.index(column)]) is not str:
+        return to_python(schema_columns, schema, column, val)
+    return val
+
+def tab_cell_fields(cell, cols):
+    if 0 not in cols:
+        return tab_cell_columns(cell, [col-1 for col in cols])
+    rowid = tab_cell_rowid(cell)
+    data = iter(tab_cell_columns(cell, [col-1 for col in cols if col>0]))
+    return [rowid if col==0 else next(data) for col in cols]
+
+def index_scan_cells(fname, index_fname, oper, operand):
+    rowids = []
+    for index_tuple in index_range_tuples(index_fname, oper, operand):
+        rowids.extend(index_tuple['assoc_rowids'])
+    for rowid in sorted(rowids):
+        cell = tab_cell_given_rowid(fname, rowid)
+        if cell is not None:
+            yield cell
+
+class EngineLock(object):
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.local = threading.local()
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.local.depth = getattr(self.local, 'depth', 0)+1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.local.depth -= 1
+        self.lock.release()
+        if self.local.depth==0:
+            lsn = getattr(self.local, 'sync_lsn', 0)
+            self.local.sync_lsn = 0
+            wait_for_wal_sync(lsn)
+        return False
+
+    def defer_sync(self, lsn):
+        if getattr(self.local, 'depth', 0)==0:
+            return False
+        self.local.sync_lsn = max(getattr(self.local, 'sync_lsn', 0), lsn)
+        return True
+
+ENGINE_LOCK = EngineLock()
+
+class Cursor(object):
+    def __init__(self, connection=None):
+        self.connection = connection
+        self.columns = None
+        self.arraysize = 1
+        self.rowcount = -1
+        self.lastrowid = None
+        self.rows = iter(())
+        CURSORS.add(self)
+
+    def execute(self, SQL, params=()):
+        with ENGINE_LOCK:
+            begin_statement()
+            try:
+                execute_plan(self, prepare(SQL), params)
+            except:
+                rollback_statement()
+                raise
+            end_statement()
+            if not TRANSACTION['active']:
+                flush_pgs()
+        return self
+
+    def executemany(self, SQL, seq_of_params):
+        with ENGINE_LOCK:
+            plan = prepare(SQL)
+            rowcount = 0
+            begin_statement()
+            try:
+                for params in seq_of_params:
+                    execute_plan(self, plan, params)
+                    rowcount += max(self.rowcount, 0)
+            except:
+                rollback_statement()
+                raise
+            end_statement()
+            self.rowcount = rowcount
+            if not TRANSACTION['active']:
+                flush_pgs()
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with ENGINE_LOCK:
+            return next(self.rows)
+
+    def fetchone(self):
+        return next(self, None)
+
+    def fetchmany(self, size=None):
+        with ENGINE_LOCK:
+            return list(itertools.islice(self.rows, self.arraysize if size is None else size))
+
+    def fetchall(self):
+        with ENGINE_LOCK:
+            return list(self.rows)
+
+    def close(self):
+        self.rows = iter(())
+
+class Connection(object):
+    def __init__(self, path):
+        self.path = path
+
+    def cursor(self):
+        return Cursor(self)
+
+    def execute(self, SQL, params=()):
+        return self.cursor().execute(SQL, params)
+
+    def executemany(self, SQL, seq_of_params):
+        return self.cursor().executemany(SQL, seq_of_params)
+
+    def commit(self):
+        with ENGINE_LOCK:
+            if TRANSACTION['active']:
+                commit_transaction()
+            else:
+                flush_pgs()
+
+    def rollback(self):
+        with ENGINE_LOCK:
+            if TRANSACTION['active']:
+                rollback_transaction()
+            else:
+                discard_uncommitted({})
+
+    def close(self):
+        with ENGINE_LOCK:
+            close_all_files()
+
+    def __enter__(self):
+        with ENGINE_LOCK:
+            if not TRANSACTION['active']:
+                begin_transaction()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+def connect(path, page_size=None):
+    path = os.path.abspath(path)
+    with ENGINE_LOCK:
+        close_all_files()
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        os.chdir(path)
+        init(page_size)
+    return Connection(path)
+
+def select_cursor(SQL):
+    cursor = Cursor()
+    execute_plan(cursor, prepare(SQL), ())
+    if cursor.columns is None:
+        return None
+    return cursor
+
+def prepare(SQL):
+    plan = cached_plan(SQL)
+    if plan is not None:
+        return plan
+    try:
+        tokens = tokenize_sql(SQL)
+    except ValueError as e:
+        raise ProgrammingError("Syntax error: {}".format(e))
+    key = tuple(tokens)
+    plan = cached_plan(key)
+    if plan is None:
+        PLAN_STATS['misses']+=1
+        catalog_version = CATALOG_VERSION
+        try:
+            stmt = parse_sql(tokens)
+        except ValueError as e:
+            raise ProgrammingError("Syntax error: {}".format(e))
+        try:
+            if stmt['type']=='select':
+                plan = plan_select(stmt)
+            elif stmt['type']=='insert':
+                plan = plan_insert(stmt)
+            else:
+                plan = {'kind':stmt['type'], 'statement':stmt, 'num_params':0}
+        except ValueError as e:
+            raise ProgrammingError("Invalid value: {}".format(e))
+        plan['catalog_version'] = catalog_version
+        cache_plan(key, plan)
+    cache_plan(SQL, plan)
+    return plan
+
+def cached_plan(key):
+    plan = PLAN_CACHE.get(key)
+    if plan is None or plan['catalog_version']!=CATALOG_VERSION:
+        return None
+    PLAN_CACHE.move_to_end(key)
+    PLAN_STATS['hits']+=1
+    return plan
+
+def cache_plan(key, plan):
+    PLAN_CACHE[key] = plan
+    PLAN_CACHE.move_to_end(key)
+    if len(PLAN_CACHE)>PLAN_CACHE_SIZE:
+        PLAN_CACHE.popitem(last=False)
+
+def execute_plan(cursor, plan, params):
+    if len(params)!=plan['num_params']:
+        raise ProgrammingError("Statement takes {} parameters, {} supplied".format(plan['num_params'], len(params)))
+    cursor.columns = None
+    cursor.rows = iter(())
+    cursor.rowcount = -1
+    if plan['kind']=='select':
+        tab_name, cursor.columns, cursor.rows = run_select(plan, params)
+    elif plan['kind']=='insert':
+        rows = []
+        for row in plan['rows']:
+            values = []
+            for spec, column in zip(row, plan['schema_columns']):
+                if spec[0]=='param':
+                    values.append(bind_param(params[spec[1]], plan['schema_columns'], plan['schema'], column))
                 else:
-                    operand2 = to_python(column_list[1:], schema, operand_where.lower(), value_where)
-                    operand1 = data[index - 1]
-                if get_operator_fn(oper)(operand1, operand2):
-                    matched_tuples.append(tuple)
-    return tab_name, matched_tuples
+                    values.append(spec[1])
+            rows.append(values)
+        cursor.lastrowid = insert_rows(plan['tab_name'], rows)
+        cursor.rowcount = len(rows)
+    elif plan['kind']=='help':
+        print_help()
+    elif plan['kind']=='show_tables':
+        show_tabs()
+    elif plan['kind']=='begin':
+        begin_transaction()
+    elif plan['kind']=='commit':
+        commit_transaction()
+    elif plan['kind']=='rollback':
+        rollback_transaction()
+    elif plan['kind'] in ['drop_table', 'create_table', 'create_index', 'vacuum']:
+        if TRANSACTION['active']:
+            commit_transaction()
+        {'drop_table':drop_tab, 'create_table':create_tab, 'create_index':create_index, 'vacuum':vacuum}[plan['kind']](plan['statement'])
+    return cursor
+
+def select_projection(column_list, columns):
+    projection = []
+    for column in columns:
+        column = column.strip().lower()
+        if column=='*':
+            projection.extend(range(len(column_list)))
+        elif column in column_list:
+            projection.append(column_list.index(column))
+        else:
+            raise ProgrammingError("Column {} does not exist.".format(column))
+    return projection
 
 def validate(fname, pgs=None, pg_num=0, is_tab=None):
     if pg_num==0:
@@ -1775,7 +3880,7 @@ def validate(fname, pgs=None, pg_num=0, is_tab=None):
                 c_max = max([i[key] for i in pgs[tuple['left_child_pg']]['cells']])
                 c_min = min([i[key] for i in pgs[tuple['left_child_pg']]['cells']])
                 try:
-                    assert((pg['cells'][i-1][key]<=c_min) and (c_max<tuple[key]))
+                    assert((pg['cells'][i-1][key]<=c_min) and (c_max<tuple[key] or (not is_tab and c_max==tuple[key])))
                 except:
                     print("pg_num incorrect ordering", pg_num, 'child',tuple['left_child_pg'])
                     assert(False)
@@ -1793,21 +3898,18 @@ def validate(fname, pgs=None, pg_num=0, is_tab=None):
     else:
         return
 
-def tuple_print(tab_name, cells):
-    schema, _ = catalog_schema(tab_name)
-    columns = get_col_names_from_catalog(tab_name)
-    str_f1 = '{:^12}|'
-    for s in schema:
-        if s.lower()=='text':
+def tuple_print(columns, schema, rows):
+    str_f1 = ''
+    for st in schema:
+        if st.lower()=='text':
             str_f1 += '{:^25}|'
         else:
             str_f1 += '{:^12}|'
     str_f1 = str_f1[:-1]
     print(str_f1.format(*columns))
-    cells = sorted(cells, key=lambda x: x['rowid'])
-    for tuple in cells:
+    for row in rows:
         data =[]
-        for d, st in zip(tuple['data'], schema):
+        for d, st in zip(row, schema):
             if d==None:
                 data.append('NULL')
             elif st.lower()=='date':
@@ -1822,9 +3924,11 @@ def tuple_print(tab_name, cells):
                 data.append(round(d,4))
             else:
                 data.append(d)
-        print(str_f1.format(tuple['rowid'], *data))
+        print(str_f1.format(*data))
     return None
 
+atexit.register(stop_wal_writer)
+
 if __name__== "__main__":
     init()
     print("DavisBase : version 1.0")
@@ -1847,3 +3951,4 @@ if __name__== "__main__":
             cmd_input=''
         else:
             continue
+    close_all_files()
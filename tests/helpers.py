@@ -0,0 +1,24 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import davisbase
+
+
+class DatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.path = tempfile.mkdtemp(prefix='davisbase_test_')
+        self.conn = davisbase.connect(self.path)
+
+    def tearDown(self):
+        self.conn.close()
+        davisbase.close_all_files()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.path, True)
+
+    def query(self, SQL, params=()):
+        return self.conn.execute(SQL, params).fetchall()
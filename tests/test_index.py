@@ -0,0 +1,52 @@
+import os
+import unittest
+
+from helpers import DatabaseTestCase, davisbase
+
+
+class IndexInsertTest(DatabaseTestCase):
+    def check_index(self, page_size, n):
+        self.conn.close()
+        self.conn = davisbase.connect(os.path.join(self.path, str(page_size)), page_size)
+        self.conn.execute("CREATE TABLE t (a INT, b TEXT);")
+        self.conn.execute("CREATE INDEX ON t (a);")
+        self.conn.executemany("INSERT INTO t (a, b) VALUES (?, ?);", [((i*7919)%n, 'v{}'.format(i%5)) for i in range(n)])
+        self.conn.commit()
+        for a in (0, 1, n//2, n-1):
+            self.assertEqual(len(self.query("SELECT b FROM t WHERE a = ?;", (a,))), 1)
+        self.assertEqual(self.query("SELECT b FROM t WHERE a = ?;", (n,)), [])
+
+    def test_small_pages(self):
+        self.check_index(512, 3000)
+
+    def test_large_pages(self):
+        self.check_index(65536, 3000)
+
+
+class BulkBuildTest(DatabaseTestCase):
+    def test_failed_build_leaves_no_file(self):
+        self.conn.execute("CREATE TABLE t (a INT, b TEXT);")
+        self.conn.executemany("INSERT INTO t (a, b) VALUES (?, ?);", [(i, 'v{}'.format(i)) for i in range(2000)])
+        self.conn.commit()
+        new_pg_bytes = davisbase.new_pg_bytes
+        calls = []
+        def failing_new_pg_bytes(*args):
+            calls.append(None)
+            if len(calls)==5:
+                raise OSError("disk full")
+            return new_pg_bytes(*args)
+        davisbase.new_pg_bytes = failing_new_pg_bytes
+        try:
+            with self.assertRaises(OSError):
+                self.conn.execute("CREATE INDEX ON t (a);")
+        finally:
+            davisbase.new_pg_bytes = new_pg_bytes
+        self.assertEqual(sorted(name for name in os.listdir(self.path) if name.startswith('t_a')), [])
+        self.assertEqual(self.query("SELECT b FROM t WHERE a = ?;", (1234,)), [['v1234']])
+        self.conn.execute("CREATE INDEX ON t (a);")
+        self.assertEqual(sorted(name for name in os.listdir(self.path) if name.startswith('t_a')), ['t_a.ndx'])
+        self.assertEqual(self.query("SELECT b FROM t WHERE a = ?;", (1234,)), [['v1234']])
+
+
+if __name__ == '__main__':
+    unittest.main()
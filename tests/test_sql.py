@@ -0,0 +1,114 @@
+import os
+import io
+import contextlib
+import unittest
+
+from helpers import DatabaseTestCase
+import davisbase
+
+
+class NullLiteralTest(DatabaseTestCase):
+    def setUp(self):
+        DatabaseTestCase.setUp(self)
+        self.conn.execute("CREATE TABLE t (a INT, b TEXT);")
+
+    def test_lowercase_null_is_sql_null(self):
+        self.conn.execute("insert into t (a, b) values (1, null);")
+        self.conn.execute("insert into t (a, b) values (null, 'x');")
+        self.assertEqual(self.query("SELECT a, b FROM t;"), [[1, None], [None, 'x']])
+        self.assertEqual(self.query("SELECT a FROM t WHERE b IS NULL;"), [[1]])
+
+    def test_quoted_null_is_a_string(self):
+        self.conn.execute("INSERT INTO t (a, b) VALUES (1, 'NULL');")
+        self.conn.execute("INSERT INTO t (a, b) VALUES (2, NULL);")
+        self.assertEqual(self.query("SELECT a FROM t WHERE b = 'NULL';"), [[1]])
+        self.assertEqual(self.query("SELECT a FROM t WHERE b IS NULL;"), [[2]])
+
+    def test_not_in_with_null(self):
+        self.conn.executemany("INSERT INTO t (a, b) VALUES (?, ?);", [(1, 'a'), (2, 'b'), (3, None)])
+        self.assertEqual(self.query("SELECT a FROM t WHERE b NOT IN ('a', null);"), [])
+        self.assertEqual(self.query("SELECT a FROM t WHERE b IN ('a', NULL);"), [[1]])
+        self.assertEqual(self.query("SELECT a FROM t WHERE b NOT IN ('a', 'NULL');"), [[2]])
+
+    def test_invalid_literal_is_reported(self):
+        with self.assertRaisesRegex(davisbase.ProgrammingError, "Invalid value"):
+            self.conn.execute("INSERT INTO t (a, b) VALUES (abc, 'x');")
+        self.assertEqual(self.query("SELECT * FROM t;"), [])
+
+
+class ErrorTest(DatabaseTestCase):
+    def setUp(self):
+        DatabaseTestCase.setUp(self)
+        self.conn.execute("CREATE TABLE t (a INT, b TEXT);")
+
+    def test_syntax_error_raises(self):
+        with self.assertRaisesRegex(davisbase.ProgrammingError, "Syntax error: .*FORM"):
+            self.conn.execute("SELECT a FORM t;")
+
+    def test_executemany_reports_the_real_error(self):
+        with self.assertRaisesRegex(davisbase.ProgrammingError, "Syntax error"):
+            self.conn.executemany("INSERT INTO t (a, b) VALUS (?, ?);", [(1, 'x'), (2, 'y')])
+        with self.assertRaisesRegex(davisbase.ProgrammingError, "Column c does not exist"):
+            self.conn.executemany("INSERT INTO t (a, c) VALUES (?, ?);", [(1, 'x')])
+
+    def test_planning_errors_raise(self):
+        with self.assertRaisesRegex(davisbase.ProgrammingError, "Table missing does not exist"):
+            self.conn.execute("SELECT * FROM missing;")
+        with self.assertRaisesRegex(davisbase.ProgrammingError, "Column c does not exist"):
+            self.conn.execute("SELECT a FROM t WHERE c = 1;")
+        with self.assertRaises(davisbase.DatabaseError):
+            self.conn.execute("CREATE TABLE t (a INT);")
+        with self.assertRaises(davisbase.OperationalError):
+            self.conn.execute("COMMIT;")
+
+    def test_repl_prints_errors(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.assertIsNone(davisbase.read_input("SELECT * FROM missing;"))
+        self.assertEqual(out.getvalue(), "Table missing does not exist.\n")
+
+
+@unittest.skipIf(davisbase.np is None, "numpy is not installed")
+class BatchScanTest(DatabaseTestCase):
+    def tearDown(self):
+        davisbase.BATCH_SCAN = True
+        davisbase.BATCH_MIN_ROWS = 8
+        DatabaseTestCase.tearDown(self)
+
+    def test_sparse_and_dense_pages_agree(self):
+        self.conn.execute("CREATE TABLE t (a INT, b DOUBLE, c TEXT);")
+        self.conn.executemany("INSERT INTO t (a, b, c) VALUES (?, ?, ?);", [(i%50, i/4.0, 'x'*(i%200)) for i in range(1000)])
+        results = []
+        for batch_scan, min_rows in [(False, 8), (True, 0), (True, 8), (True, 1000)]:
+            davisbase.BATCH_SCAN = batch_scan
+            davisbase.BATCH_MIN_ROWS = min_rows
+            results.append(self.query("SELECT ROWID FROM t WHERE a < 10;"))
+            results.append(self.query("SELECT ROWID FROM t WHERE b >= 120.5;"))
+        self.assertEqual(results[0::2], [results[0]]*4)
+        self.assertEqual(results[1::2], [results[1]]*4)
+        self.assertEqual(len(results[0]), 200)
+
+
+class LargeRecordTest(DatabaseTestCase):
+    def setUp(self):
+        DatabaseTestCase.setUp(self)
+        self.page_size = davisbase.SIZE_OF_PAGE
+
+    def tearDown(self):
+        DatabaseTestCase.tearDown(self)
+        davisbase.set_page_size(self.page_size)
+
+    def test_record_larger_than_32k(self):
+        self.conn.close()
+        self.conn = davisbase.connect(os.path.join(self.path, 'large'), 65536)
+        columns = ['c{}'.format(i) for i in range(140)]
+        self.conn.execute("CREATE TABLE t (a INT, {});".format(', '.join(column+' TEXT' for column in columns)))
+        rows = [[i]+[chr(97+(i+j)%26)*240 for j in range(len(columns))] for i in range(5)]
+        self.conn.executemany("INSERT INTO t (a, {}) VALUES (?{});".format(', '.join(columns), ', ?'*len(columns)), rows)
+        self.conn.commit()
+        self.assertEqual([row[1:] for row in self.query("SELECT * FROM t;")], rows)
+        self.assertEqual(self.query("SELECT c3 FROM t WHERE a = ?;", (3,)), [['g'*240]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from helpers import DatabaseTestCase
+import davisbase
+
+
+class StatementRollbackTest(DatabaseTestCase):
+    def setUp(self):
+        DatabaseTestCase.setUp(self)
+        self.conn.execute("CREATE TABLE t (a INT, b TEXT);")
+
+    def test_failed_autocommit_statement_is_undone(self):
+        with self.assertRaises(ValueError):
+            self.conn.execute("INSERT INTO t (a, b) VALUES (1, 'ok'), (2, ?);", ('x'*300,))
+        self.assertEqual(self.query("SELECT * FROM t;"), [])
+        self.conn.execute("INSERT INTO t (a, b) VALUES (3, 'next');")
+        self.conn.close()
+        self.conn = davisbase.connect(self.path)
+        self.assertEqual(self.query("SELECT * FROM t;"), [[1, 3, 'next']])
+
+    def test_failed_statement_inside_transaction_keeps_earlier_statements(self):
+        self.conn.execute("BEGIN;")
+        self.conn.execute("INSERT INTO t (a, b) VALUES (1, 'kept');")
+        with self.assertRaises(ValueError):
+            self.conn.executemany("INSERT INTO t (a, b) VALUES (?, ?);", [(i, 'y'*50) for i in range(2, 400)]+[(0, 'x'*300)])
+        self.conn.execute("INSERT INTO t (a, b) VALUES (2, 'after');")
+        self.conn.execute("COMMIT;")
+        self.conn.close()
+        self.conn = davisbase.connect(self.path)
+        self.assertEqual(self.query("SELECT a, b FROM t;"), [[1, 'kept'], [2, 'after']])
+        self.assertEqual(davisbase.count_pgs('t.tbl'), 1)
+
+
+class ConnectionContextTest(DatabaseTestCase):
+    def setUp(self):
+        DatabaseTestCase.setUp(self)
+        self.conn.execute("CREATE TABLE t (a INT, b TEXT);")
+
+    def test_failed_block_is_rolled_back(self):
+        with self.assertRaises(ValueError):
+            with self.conn:
+                self.conn.execute("INSERT INTO t (a, b) VALUES (1, 'first');")
+                self.conn.execute("INSERT INTO t (a, b) VALUES (2, 'ok'), (3, ?);", ('x'*300,))
+        self.assertEqual(self.query("SELECT * FROM t;"), [])
+        self.conn.close()
+        self.conn = davisbase.connect(self.path)
+        self.assertEqual(self.query("SELECT * FROM t;"), [])
+
+    def test_successful_block_is_committed(self):
+        with self.conn:
+            self.conn.execute("INSERT INTO t (a, b) VALUES (1, 'first');")
+            self.conn.execute("INSERT INTO t (a, b) VALUES (2, 'second');")
+        self.assertFalse(davisbase.TRANSACTION['active'])
+        self.conn.close()
+        self.conn = davisbase.connect(self.path)
+        self.assertEqual(self.query("SELECT a FROM t;"), [[1], [2]])
+
+    def test_rollback_discards_uncommitted_pages(self):
+        schema, _ = davisbase.catalog_schema('t')
+        davisbase.tab_append_tuple('t', schema, [1, 'unflushed'])
+        self.conn.rollback()
+        self.assertEqual(self.query("SELECT * FROM t;"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
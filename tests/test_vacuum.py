@@ -0,0 +1,51 @@
+import os
+import unittest
+
+from helpers import DatabaseTestCase
+import davisbase
+
+
+class OpenCursorTest(DatabaseTestCase):
+    def setUp(self):
+        DatabaseTestCase.setUp(self)
+        self.conn.execute("CREATE TABLE t (a INT, b TEXT);")
+        self.conn.executemany("INSERT INTO t (a, b) VALUES (?, ?);", [(i, 'x'*50) for i in range(3000)])
+
+    def test_vacuum_under_open_cursor(self):
+        davisbase.tab_delete('t.tbl', list(range(1, 2800)))
+        self.conn.commit()
+        size = os.path.getsize('t.tbl')
+        cur = self.conn.execute("SELECT a FROM t;")
+        self.assertEqual(cur.fetchone(), [2799])
+        self.conn.execute("VACUUM t;")
+        self.assertLess(os.path.getsize('t.tbl'), size)
+        self.assertEqual(cur.fetchall(), [[a] for a in range(2800, 3000)])
+
+    def test_vacuum_waits_for_raw_scan(self):
+        davisbase.tab_delete('t.tbl', list(range(1, 2800)))
+        self.conn.commit()
+        size = os.path.getsize('t.tbl')
+        scan = davisbase.mmap_scan_tuples('t.tbl')
+        next(scan)
+        self.conn.execute("VACUUM t;")
+        self.assertEqual(os.path.getsize('t.tbl'), size)
+        self.assertEqual(sum(1 for tuple in scan), 200)
+        del scan
+        self.conn.execute("VACUUM t;")
+        self.assertLess(os.path.getsize('t.tbl'), size)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM t;"), [[201]])
+
+    def test_rollback_under_open_cursor(self):
+        size = os.path.getsize('t.tbl')
+        self.conn.execute("BEGIN;")
+        self.conn.executemany("INSERT INTO t (a, b) VALUES (?, ?);", [(i, 'y'*50) for i in range(3000)])
+        cur = self.conn.execute("SELECT a FROM t;")
+        cur.fetchone()
+        self.conn.rollback()
+        self.assertEqual(os.path.getsize('t.tbl'), size)
+        self.assertEqual(len(cur.fetchall()), 5999)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM t;"), [[3000]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import stat
+import threading
+import unittest
+
+from helpers import DatabaseTestCase
+import davisbase
+
+
+class DurableCommitTest(DatabaseTestCase):
+    def setUp(self):
+        DatabaseTestCase.setUp(self)
+        self.conn.execute("CREATE TABLE t (a INT, b TEXT);")
+
+    def test_commit_waits_for_fsync(self):
+        for i in range(20):
+            syncs = davisbase.BUFFER_STATS['syncs']
+            self.conn.execute("INSERT INTO t (a, b) VALUES (?, 'row');", (i,))
+            self.assertGreaterEqual(davisbase.WAL_STATE['synced_lsn'], davisbase.WAL_STATE['lsn'])
+            self.assertGreater(davisbase.BUFFER_STATS['syncs'], syncs)
+
+    def test_transaction_commit_waits_for_fsync(self):
+        self.conn.execute("BEGIN;")
+        self.conn.executemany("INSERT INTO t (a, b) VALUES (?, 'row');", [(i,) for i in range(100)])
+        self.conn.execute("COMMIT;")
+        self.assertGreaterEqual(davisbase.WAL_STATE['synced_lsn'], davisbase.WAL_STATE['lsn'])
+
+    def test_concurrent_commits_are_durable(self):
+        def insert(keys):
+            for i in keys:
+                self.conn.execute("INSERT INTO t (a, b) VALUES (?, 'row');", (i,))
+        workers = [threading.Thread(target=insert, args=(range(t, 200, 4),)) for t in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertGreaterEqual(davisbase.WAL_STATE['synced_lsn'], davisbase.WAL_STATE['lsn'])
+        self.assertEqual(self.query("SELECT COUNT(*), MIN(a), MAX(a) FROM t;"), [[200, 0, 199]])
+
+    def test_wal_file_is_not_executable(self):
+        self.conn.execute("INSERT INTO t (a, b) VALUES (1, 'row');")
+        mode = stat.S_IMODE(os.stat(davisbase.WAL_FNAME).st_mode)
+        self.assertEqual(mode & 0o111, 0)
+
+
+class OrphanPageTest(DatabaseTestCase):
+    def test_vacuum_reclaims_pages_outside_the_tree(self):
+        self.conn.execute("CREATE TABLE t (a INT, b TEXT);")
+        self.conn.executemany("INSERT INTO t (a, b) VALUES (?, ?);", [(i, 'row {}'.format(i)) for i in range(300)])
+        live = davisbase.count_pgs('t.tbl')
+        davisbase.checkpoint_wal()
+        for i in range(5):
+            davisbase.pager_write('t.tbl', davisbase.FILE_HEADER_SIZE+(live+i)*davisbase.SIZE_OF_PAGE, bytes(davisbase.SIZE_OF_PAGE))
+        self.assertEqual(davisbase.count_pgs('t.tbl'), live+5)
+        self.conn.execute("VACUUM t;")
+        self.assertEqual(davisbase.count_pgs('t.tbl'), live)
+        self.assertEqual(self.query("SELECT COUNT(*), MIN(a), MAX(a) FROM t;"), [[300, 0, 299]])
+        self.conn.execute("INSERT INTO t (a, b) VALUES (300, 'after');")
+        self.assertEqual(self.query("SELECT a FROM t WHERE ROWID = 301;"), [[300]])
+
+
+class SpillTest(DatabaseTestCase):
+    def setUp(self):
+        DatabaseTestCase.setUp(self)
+        self.pool_bytes = davisbase.BUFFER_POOL_BYTES
+        self.conn.execute("CREATE TABLE t (a INT PRIMARY KEY, b TEXT);")
+        davisbase.set_buffer_pool_size(16*davisbase.SIZE_OF_PAGE)
+
+    def tearDown(self):
+        davisbase.set_buffer_pool_size(self.pool_bytes)
+        DatabaseTestCase.tearDown(self)
+
+    def test_evicted_pages_are_spilled(self):
+        self.conn.execute("BEGIN;")
+        self.conn.executemany("INSERT INTO t (a, b) VALUES (?, ?);", [(i, 'x'*60) for i in range(3000)])
+        stats = davisbase.buffer_pool_stats()
+        self.assertLessEqual(stats['cached_pgs'], 16)
+        self.assertGreater(stats['spilled_pgs'], 100)
+        self.assertTrue(all(isinstance(offset, int) for offset in davisbase.WAL_PENDING.values()))
+        self.conn.execute("COMMIT;")
+        self.assertEqual(davisbase.buffer_pool_stats()['spilled_pgs'], 0)
+        self.assertEqual(self.query("SELECT COUNT(*), MAX(a) FROM t;"), [[3000, 2999]])
+        self.assertEqual(self.query("SELECT b FROM t WHERE a = 1234;"), [['x'*60]])
+
+    def test_rollback_of_spilled_pages(self):
+        self.conn.executemany("INSERT INTO t (a, b) VALUES (?, ?);", [(i, 'x'*60) for i in range(1000)])
+        self.conn.execute("BEGIN;")
+        self.conn.executemany("INSERT INTO t (a, b) VALUES (?, ?);", [(i, 'y'*60) for i in range(1000, 2000)])
+        with self.assertRaises(ValueError):
+            self.conn.executemany("INSERT INTO t (a, b) VALUES (?, ?);", [(i, 'z') for i in range(2000, 3000)]+[('bad', 'z')])
+        self.assertEqual(self.query("SELECT COUNT(*), MAX(a) FROM t;"), [[2000, 1999]])
+        self.conn.execute("ROLLBACK;")
+        self.assertEqual(self.query("SELECT COUNT(*), MAX(a) FROM t;"), [[1000, 999]])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM t WHERE a >= 500;"), [[500]])
+
+
+if __name__ == '__main__':
+    unittest.main()